@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+入群申请审核插件 - 性能基准
+用法: python benchmark_entry_review.py [基准名 ...]，不带参数时运行全部基准
+"""
+
+import sys
+import os
+import time
+import asyncio
+import random
+import tracemalloc
+from collections import Counter
+from types import SimpleNamespace
+from datetime import datetime
+
+# 添加插件路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# 模拟AstrBot环境，仅用于导入 main
+class MockModule:
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+class MockLogger:
+    def info(self, msg):
+        pass
+
+    debug = warning = error = info
+
+class MockFilter:
+    class EventMessageType:
+        GROUP_MESSAGE = "group_message"
+
+    def command(self, command_name):
+        return lambda func: func
+
+    def event_message_type(self, message_type):
+        return lambda func: func
+
+class MockStar:
+    def __init__(self, context):
+        self.context = context
+
+sys.modules['astrbot'] = MockModule()
+sys.modules['astrbot.api'] = MockModule(logger=MockLogger())
+sys.modules['astrbot.api.event'] = MockModule(AstrMessageEvent=object, MessageEventResult=object, filter=MockFilter())
+sys.modules['astrbot.api.star'] = MockModule(Context=object, Star=MockStar, register=lambda *a, **k: (lambda cls: cls))
+
+import main
+
+BENCHMARKS = {}
+
+def benchmark(func):
+    BENCHMARKS[func.__name__] = func
+    return func
+
+def measure_bytes(build, count):
+    """构建 count 条记录，返回每条记录占用的平均字节数"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = build(count)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(records) == count
+    return (after - before) / count
+
+def sample_event(i):
+    group_id = 100000 + i % 20
+    user_id = 200000000 + i
+    return {
+        'post_type': 'request', 'request_type': 'group', 'sub_type': 'add',
+        'user_id': user_id, 'group_id': group_id, 'comment': '想加入交流学习',
+        'flag': f'{1700000000 + i}_{user_id}', 'time': 1700000000 + i, 'self_id': 10000,
+    }
+
+@benchmark
+def memory_per_request(count=100_000):
+    """每条待处理申请的内存占用：旧版字典 vs JoinRequest"""
+    def v2_dicts(n):
+        # main_v2_fixed.py: 时间戳字符串键 + ISO 时间 + 完整原始事件
+        records = {}
+        for i in range(n):
+            event = sample_event(i)
+            request_id = f"{event['group_id']}_{event['user_id']}_{datetime.now().timestamp()}"
+            records[request_id] = {
+                'group_id': event['group_id'], 'user_id': event['user_id'], 'comment': event['comment'],
+                'time': datetime.now().isoformat(), 'flag': event['flag'], 'seq': i,
+                'invitor_uin': None, 'raw_data': event,
+            }
+        return records
+
+    def v1_dicts(n):
+        # 早期 main.py: 字符串ID + 字符串键字典
+        records = {}
+        for i in range(n):
+            event = sample_event(i)
+            user_id = str(event['user_id'])
+            records[user_id] = {
+                'user_id': user_id, 'group_id': str(event['group_id']), 'nickname': f'用户{user_id}',
+                'comment': event['comment'], 'flag': event['flag'], 'timestamp': int(time.time()),
+                'risk_score': 0, 'status': 'pending', 'message_id': str(5000000 + i),
+            }
+        return records
+
+    def slotted(n):
+        records = {}
+        for i in range(n):
+            event = sample_event(i)
+            record = main.JoinRequest(
+                event['user_id'], event['group_id'], comment=event['comment'], flag=event['flag'],
+                timestamp=int(time.time()), message_id=5000000 + i
+            )
+            records[record.user_id] = record
+        return records
+
+    print(f"== 每条申请内存占用 ({count} 条)")
+    results = {}
+    for name, build in (("v2 字典 + raw_data", v2_dicts), ("v1 字典", v1_dicts), ("JoinRequest __slots__", slotted)):
+        results[name] = measure_bytes(build, count)
+        print(f"  {name:<24} {results[name]:8.1f} 字节/条")
+    return results
+
+class SimulatedPlatform:
+    """模拟平台：记录接口调用次数和每个申请的审核卡片发送时间"""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.handlers = {}
+        self.join_requests = []
+        self.card_times = {}
+
+    async def register_event_handler(self, event_type, handler):
+        self.handlers[event_type] = handler
+
+    async def get_stranger_info(self, user_id):
+        self.calls['get_stranger_info'] += 1
+        return {'nickname': f'昵称{user_id}'}
+
+    async def send_group_msg(self, group_id, message):
+        self.calls['send_group_msg'] += 1
+        self.card_times.setdefault(int(message), time.monotonic())
+        return {'message_id': len(self.card_times)}
+
+    async def get_group_system_msg(self):
+        self.calls['get_group_system_msg'] += 1
+        return {'join_requests': list(self.join_requests)}
+
+@benchmark
+def intake_modes(count=200, duration=2.0, push_loss=0.1, poll_interval=1):
+    """各接收方式的申请延迟和接口调用次数（推送按 push_loss 比例丢失）"""
+    async def run(intake_mode):
+        platform = SimulatedPlatform()
+        plugin = main.EntryReviewPluginFixed(SimpleNamespace(platform_manager=SimpleNamespace(platform_insts=[platform])))
+        # 只比较接收路径本身，不计入状态文件写入
+        plugin.load_config = plugin.save_state = lambda: None
+        plugin.config = main.ConfigSnapshot.build({
+            'source_group_id': '', 'target_group_id': '1', 'auto_approve_timeout': 0, 'debug_mode': False,
+            'intake_mode': intake_mode, 'poll_interval': poll_interval, 'gap_check_interval': poll_interval,
+            # hybrid 只在发现缺口时对账；模拟按群连续编号 seq 的平台
+            'hybrid_poll_interval': 3600, 'gap_seq_step': 1,
+            'outbound_rate': 0, 'member_check': False,
+            'notification_template': {'new_request': '{user_id}'},
+        })
+        rng = random.Random(0)
+        await plugin.initialize()
+        arrivals = {}
+        for i in range(count):
+            await asyncio.sleep(duration / count)
+            event = dict(sample_event(i), seq=i // 20 + 1)
+            arrivals[event['user_id']] = time.monotonic()
+            platform.join_requests.append({
+                'request_id': i, 'requester_uin': event['user_id'], 'group_id': event['group_id'],
+                'message': event['comment'], 'checked': False,
+            })
+            handler = platform.handlers.get('request')
+            if handler is not None and rng.random() >= push_loss:
+                await handler(event)
+        # 留出一个轮询周期让轮询补录
+        await asyncio.sleep(poll_interval + 0.2)
+        await plugin._drain(1)
+        latencies = sorted(
+            (platform.card_times[user_id] - arrived) * 1000
+            for user_id, arrived in arrivals.items() if user_id in platform.card_times
+        )
+        return latencies, platform.calls
+
+    print(f"== 申请接收方式 ({count} 条, 推送丢失 {push_loss:.0%}, 轮询间隔 {poll_interval}s)")
+    results = {}
+    for intake_mode in main.INTAKE_MODES:
+        latencies, calls = asyncio.run(run(intake_mode))
+        results[intake_mode] = (latencies, calls)
+        mean = sum(latencies) / len(latencies) if latencies else 0
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+        print(
+            f"  {intake_mode:<7} 送达 {len(latencies):3d}/{count}  平均 {mean:7.1f} ms  P95 {p95:7.1f} ms  "
+            f"接口调用 {sum(calls.values()):4d} 次 (轮询 {calls['get_group_system_msg']} 次)"
+        )
+    return results
+
+class DecisionPlatform:
+    """只记录审核决定的模拟平台"""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.decisions = []
+
+    async def get_stranger_info(self, user_id):
+        self.calls['get_stranger_info'] += 1
+        return {'nickname': f'昵称{user_id}'}
+
+    async def send_group_msg(self, group_id, message):
+        self.calls['send_group_msg'] += 1
+        return {'message_id': self.calls['send_group_msg']}
+
+    async def set_group_add_request(self, **params):
+        self.calls['set_group_add_request'] += 1
+        self.decisions.append(params['flag'])
+        return {'status': 'ok'}
+
+@benchmark
+def virtual_deadlines(count=100_000, timeout=3600):
+    """虚拟时钟下一小时内到达 count 个申请、各自一小时后自动通过的实际耗时"""
+    async def run():
+        platform = DecisionPlatform()
+        plugin = main.EntryReviewPluginFixed(SimpleNamespace(platform_manager=SimpleNamespace(platform_insts=[platform])))
+        plugin.save_state = lambda: None
+        plugin.config = main.ConfigSnapshot.build({
+            'source_group_id': '', 'target_group_id': '1', 'auto_approve_timeout': timeout, 'debug_mode': False,
+            'outbound_rate': 0, 'member_check': False, 'aggregate_window': 0,
+            'pending_max_count': 0, 'pending_max_bytes': 0, 'decision_log': False,
+            'notification_template': {'new_request': '{user_id}', 'auto_approved': ''},
+        })
+        # 样例事件集中在 20 个群，关闭突增检测
+        plugin.raid_detector = main.RaidDetector(threshold=0)
+        clock = plugin.clock = main.VirtualClock()
+        started = time.monotonic()
+        flags = []
+        for i in range(count):
+            event = sample_event(i)
+            flags.append(event['flag'])
+            await plugin._process_group_request_new(event)
+            await clock.advance(timeout / count)
+        intake = time.monotonic() - started
+        await clock.advance(timeout)
+        elapsed = time.monotonic() - started
+        await plugin._drain(1)
+        assert platform.decisions == flags and not plugin.store
+        return intake, elapsed
+
+    print(f"== 虚拟时钟 ({count} 个申请, 超时 {timeout}s, 虚拟时间 {2 * timeout}s)")
+    intake, elapsed = asyncio.run(run())
+    print(f"  接收 {intake:6.2f} s  全部超时通过 {elapsed:6.2f} s（实际耗时，按到达顺序通过）")
+    return intake, elapsed
+
+@benchmark
+def group_message_overhead(count=200_000, groups=500):
+    """非审核消息经过群消息处理器的平均开销（扣除空协程调用本身）"""
+    plugin = main.EntryReviewPluginFixed(SimpleNamespace(platform_manager=None))
+    plugin.config = main.ConfigSnapshot.build({'target_group_id': '987654321', 'debug_mode': False})
+
+    def make_event(group_id, text):
+        message_obj = SimpleNamespace(group_id=group_id, sender=SimpleNamespace(user_id=1), message=[])
+        return SimpleNamespace(message_str=text, message_obj=message_obj, raw_message={})
+
+    async def noop(event):
+        return None
+
+    async def run(handler, events):
+        started = time.perf_counter()
+        for event in events:
+            await handler(event)
+        return (time.perf_counter() - started) / len(events) * 1e9
+
+    cases = {
+        "其他群的消息": [make_event(100000 + i % groups, "今天吃什么") for i in range(count)],
+        "审核群的闲聊": [make_event(987654321, "收到，谢谢") for _ in range(count)],
+    }
+    print(f"== 群消息处理器开销 ({count} 条, {groups} 个群)")
+    results = {}
+    for name, events in cases.items():
+        baseline = asyncio.run(run(noop, events))
+        results[name] = asyncio.run(run(plugin.handle_group_request_events, events)) - baseline
+        print(f"  {name:<8} {results[name]:7.0f} ns/条 (空协程 {baseline:.0f} ns)")
+    return results
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    for name in selected:
+        BENCHMARKS[name]()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+入群申请审核插件 - 录制回放工具
+用法: python entry_review_replay.py 录制文件 [--speed 倍速] [--tail 秒]
+
+录制文件由配置项 record_path 生成。回放时使用模拟平台，按录制的时间间隔重新
+发送申请事件、轮询结果和审核指令；插件使用虚拟时钟，时间只在两条记录之间
+直接跳到下一条的时刻，一小时的自动通过超时不需要真实等待，结果与机器快慢无关。
+指定 --speed 时按该倍速等待真实时间后再推进虚拟时钟，便于边回放边观察，
+回放结果与不指定时相同。
+"""
+
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+from collections import Counter
+from types import SimpleNamespace
+
+# entry_review_tool 负责模拟 AstrBot 环境并导入 main
+from entry_review_tool import main
+
+class ReplayReply:
+    def __init__(self, message_id):
+        self.id = message_id
+        self.type = "Reply"
+
+class ReplayPlatform:
+    """回放用的模拟平台，轮询结果取最近一次录制的返回值"""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.system_messages = {'join_requests': []}
+        self.sent_messages = []
+        self.decisions = []
+
+    async def register_event_handler(self, event_type, handler):
+        pass
+
+    async def get_stranger_info(self, user_id):
+        self.calls['get_stranger_info'] += 1
+        return {'nickname': f'用户{user_id}'}
+
+    async def send_group_msg(self, group_id, message):
+        self.calls['send_group_msg'] += 1
+        self.sent_messages.append(message)
+        return {'message_id': len(self.sent_messages)}
+
+    async def delete_msg(self, message_id):
+        self.calls['delete_msg'] += 1
+        return {}
+
+    async def set_group_add_request(self, **params):
+        self.calls['set_group_add_request'] += 1
+        self.decisions.append(params)
+        return {'status': 'ok'}
+
+    async def get_group_system_msg(self):
+        self.calls['get_group_system_msg'] += 1
+        return self.system_messages
+
+    async def get_group_member_list(self, group_id):
+        self.calls['get_group_member_list'] += 1
+        return []
+
+def command_event(payload, group_id, reply_id=None):
+    """构造回放的审核群消息事件"""
+    message_obj = SimpleNamespace(
+        group_id=group_id,
+        sender=SimpleNamespace(user_id=payload.get('sender', '')),
+        message=[ReplayReply(reply_id)] if reply_id is not None else []
+    )
+    return SimpleNamespace(message_str=payload.get('text', ''), message_obj=message_obj, raw_message={})
+
+async def replay_recording(records, state_dir, tail=None, speed=None):
+    """在虚拟时钟上回放录制内容，返回统计；speed 为 None 时不等待真实时间"""
+    clock = main.VirtualClock()
+
+    async def advance(seconds):
+        """推进虚拟时间，指定 speed 时在每个到期的定时器之间按倍速等待真实时间"""
+        target = clock.monotonic() + seconds
+        while speed and clock.monotonic() < target:
+            deadline = clock.next_deadline()
+            step = target - clock.monotonic() if deadline is None else min(target, deadline) - clock.monotonic()
+            await asyncio.sleep(max(0.0, step) / speed)
+            await clock.advance(step)
+        await clock.advance(target - clock.monotonic())
+
+    platform = ReplayPlatform()
+    plugin = main.EntryReviewPluginFixed(SimpleNamespace(platform_manager=SimpleNamespace(platform_insts=[platform])))
+    plugin.clock = clock
+    plugin.state_path = os.path.join(state_dir, "pending_requests.json")
+    plugin.load_config = lambda: None
+    plugin.config = main.ConfigSnapshot.build({'debug_mode': False})
+    stats = Counter()
+
+    started = None
+    for offset, kind, payload in records:
+        if kind == 'meta':
+            if started is not None:
+                # 同一文件中的下一次录制，从当前时间接着回放
+                started = clock.monotonic() - offset
+                continue
+            # 使用录制时的配置，但不再录制、不启动接口和多实例协调
+            plugin.config = main.ConfigSnapshot.build(payload, {
+                'record_path': '', 'review_api_enabled': False, 'lease_store_path': '', 'debug_mode': False,
+            })
+            continue
+        if started is None:
+            await plugin.initialize()
+            started = clock.monotonic() - offset
+        delay = started + offset - clock.monotonic()
+        if delay > 0:
+            await advance(delay)
+        stats[kind] += 1
+        if kind == 'request':
+            await plugin._handle_request_event(payload)
+        elif kind == 'poll':
+            platform.system_messages = payload
+        elif kind == 'command':
+            # 审核员发出指令时已经看到了之前的审核卡片，先等之前的申请处理完
+            await clock.settle()
+            reply_id = None
+            if 'reply_to' in payload:
+                request_info = plugin.store.get(tuple(payload['reply_to']))
+                if request_info is None or request_info.message_id is None:
+                    stats['command_skipped'] += 1
+                    continue
+                reply_id = request_info.message_id
+            await plugin.handle_group_request_events(command_event(payload, plugin.config.target_group_id, reply_id))
+    if started is None:
+        await plugin.initialize()
+        started = clock.monotonic()
+
+    # 录制结束后虚拟时间继续前进一段，让自动通过等定时器触发
+    if tail is None:
+        tail = plugin.config.auto_approve_timeout + 5
+    await advance(tail)
+    stats['virtual_seconds'] = int(clock.monotonic() - started)
+    await plugin._drain(1)
+
+    stats['cards'] = platform.calls['send_group_msg']
+    stats['approved'] = sum(1 for decision in platform.decisions if decision.get('approve'))
+    stats['rejected'] = sum(1 for decision in platform.decisions if not decision.get('approve'))
+    stats['pending'] = len(plugin.store)
+    return stats
+
+def replay(path, tail=None, speed=None):
+    """回放录制文件，返回统计"""
+    with tempfile.TemporaryDirectory() as state_dir:
+        return asyncio.run(replay_recording(main.iter_recording(path), state_dir, tail, speed))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="回放入群申请审核插件的录制文件")
+    parser.add_argument('recording')
+    parser.add_argument('--speed', type=float, help="按倍速等待真实时间 (1-1000)，默认不等待")
+    parser.add_argument('--tail', type=float, help="录制结束后继续运行的虚拟秒数，默认为自动通过超时 + 5")
+    args = parser.parse_args()
+    if args.speed is not None and not 1 <= args.speed <= 1000:
+        parser.error("--speed 须在 1 到 1000 之间")
+    real_started = time.monotonic()
+    stats = replay(args.recording, args.tail, args.speed)
+    print(
+        f"回放 {stats['request']} 个申请事件 / {stats['poll']} 次轮询 / {stats['command']} 条指令"
+        f"（跳过 {stats['command_skipped']} 条）"
+    )
+    print(
+        f"审核卡片 {stats['cards']} 条, 通过 {stats['approved']}, 拒绝 {stats['rejected']}, 剩余待处理 {stats['pending']}"
+    )
+    print(f"虚拟时间 {stats['virtual_seconds']} 秒, 实际耗时 {time.monotonic() - real_started:.1f} 秒")
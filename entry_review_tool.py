@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+入群申请审核插件 - 离线导出/导入工具
+用法:
+  python entry_review_tool.py export [--state 状态文件] [--kind pending|decision|all] [--format csv|jsonl] [-o 输出文件]
+  python entry_review_tool.py import 导入文件 [--state 状态文件] [--format csv|jsonl]
+审核记录文件 decision_log.jsonl 位于状态文件所在目录。导入时请先停止插件，避免状态文件被覆盖。
+"""
+
+import sys
+import os
+import argparse
+from types import SimpleNamespace
+
+# 添加插件路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# 模拟AstrBot环境，仅用于导入 main
+class MockModule:
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+class MockLogger:
+    def info(self, msg):
+        pass
+
+    debug = warning = info
+
+    def error(self, msg):
+        print(msg, file=sys.stderr)
+
+class MockFilter:
+    class EventMessageType:
+        GROUP_MESSAGE = "group_message"
+
+    def command(self, command_name):
+        return lambda func: func
+
+    def event_message_type(self, message_type):
+        return lambda func: func
+
+class MockStar:
+    def __init__(self, context):
+        self.context = context
+
+if 'astrbot' not in sys.modules:
+    sys.modules['astrbot'] = MockModule()
+    sys.modules['astrbot.api'] = MockModule(logger=MockLogger())
+    sys.modules['astrbot.api.event'] = MockModule(AstrMessageEvent=object, MessageEventResult=object, filter=MockFilter())
+    sys.modules['astrbot.api.star'] = MockModule(Context=object, Star=MockStar, register=lambda *a, **k: (lambda cls: cls))
+
+import main
+
+def open_plugin(state_path):
+    """创建只用于读写状态文件的插件实例"""
+    plugin = main.EntryReviewPluginFixed(SimpleNamespace(platform_manager=SimpleNamespace(platform_insts=[])))
+    plugin.debug_mode = False
+    plugin.state_path = os.path.abspath(state_path)
+    plugin.load_state()
+    return plugin
+
+def export_command(args):
+    plugin = open_plugin(args.state)
+    records = plugin.iter_records(args.kind)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as f:
+            for chunk in main.iter_export_chunks(records, args.format):
+                f.write(chunk)
+    else:
+        for chunk in main.iter_export_chunks(records, args.format):
+            sys.stdout.write(chunk)
+    return 0
+
+def import_command(args):
+    fmt = args.format or os.path.splitext(args.file)[1].lstrip('.').lower()
+    if fmt not in main.EXPORT_FORMATS:
+        print(f"无法识别文件格式，请使用 --format 指定: {args.file}", file=sys.stderr)
+        return 2
+    plugin = open_plugin(args.state)
+    with open(args.file, 'r', encoding='utf-8', newline='') as f:
+        counts = plugin.import_records(main.iter_import_records(f, fmt))
+    print(f"待处理申请 {counts['pending']} 条, 审核记录 {counts['decision']} 条, 跳过 {counts['skipped']} 条")
+    return 0
+
+def build_parser():
+    default_state = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pending_requests.json")
+    parser = argparse.ArgumentParser(description="入群申请审核插件离线导出/导入工具")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help="导出待处理申请和审核记录")
+    export_parser.add_argument('--state', default=default_state, help="状态文件路径")
+    export_parser.add_argument('--kind', choices=('pending', 'decision', 'all'), default='all')
+    export_parser.add_argument('--format', choices=main.EXPORT_FORMATS, default='csv')
+    export_parser.add_argument('-o', '--output', help="输出文件，默认写到标准输出")
+    export_parser.set_defaults(handler=export_command)
+
+    import_parser = subparsers.add_parser('import', help="导入 export 生成的文件")
+    import_parser.add_argument('file')
+    import_parser.add_argument('--state', default=default_state, help="状态文件路径")
+    import_parser.add_argument('--format', choices=main.EXPORT_FORMATS, help="默认按扩展名判断")
+    import_parser.set_defaults(handler=import_command)
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    sys.exit(args.handler(args))
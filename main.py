@@ -1,206 +1,3051 @@
 import asyncio
+import bisect
+import heapq
+import hmac
+import csv
+import io
+import random
+import secrets
 import time
-import re
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, Callable, Tuple, Iterable, Iterator
 from astrbot.api.event import filter, AstrMessageEvent, MessageEventResult
 from astrbot.api.star import Context, Star, register
 from astrbot.api import logger
 import json
+import math
 import os
+import socket
+import sqlite3
+import sys
+import threading
+from collections import Counter, OrderedDict, deque
+from types import MappingProxyType
+from urllib.parse import urlsplit
+
+
+# 大量申请共享少数几个群号，复用同一个 int 对象
+_GROUP_ID_POOL: Dict[int, int] = {}
+
+
+def intern_group_id(group_id: Any) -> int:
+    group_id = int(group_id)
+    return _GROUP_ID_POOL.setdefault(group_id, group_id)
+
+
+def normalize_id(value: Any) -> Any:
+    """将平台返回的ID统一为 int，无法转换时保留字符串"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+class SystemClock:
+    """时钟接口的默认实现：墙上时间、单调时间和休眠均使用系统时间
+
+    插件中所有定时器和时间戳都通过 plugin.clock 获取，测试和基准可替换为 VirtualClock。
+    """
+
+    def time(self) -> float:
+        return time.time()
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds)
+
+    def watch(self, task: asyncio.Task) -> asyncio.Task:
+        """登记插件创建的任务，VirtualClock 据此判断是否已静止"""
+        return task
+
+    async def shield(self, task: asyncio.Task) -> Any:
+        """等待另一个任务的结果，当前任务被取消时不取消该任务"""
+        return await asyncio.shield(task)
+
+    async def gather(self, *coros) -> List[Any]:
+        """并发运行多个协程并按顺序返回结果，与 asyncio.gather 相同"""
+        return await asyncio.gather(*coros)
+
+
+SYSTEM_CLOCK = SystemClock()
+
+
+class VirtualClock(SystemClock):
+    """虚拟时钟：时间只在 advance() 时前进
+
+    sleep() 登记到期时间后挂起，advance() 按到期时间从早到晚依次唤醒，
+    每唤醒一批都等 watch() 登记的任务全部结束或挂起在本时钟上再继续，
+    因此结果与机器快慢无关。一小时的超时只需一次 advance(3600)，不需要真实等待。
+    登记的任务只能等待本时钟的 sleep()、shield()、gather() 或会自行完成的操作
+    （如 asyncio.to_thread），跨任务等待不经过时钟时 settle() 会一直等下去。
+    """
+
+    def __init__(self, start: float = 1700000000.0):
+        # 墙上时间从 start 开始，单调时间从 0 开始，两者同步前进
+        self._now = 0.0
+        self._wall_offset = start
+        self._sleepers: List[Tuple[float, int, asyncio.Future, Optional[asyncio.Task]]] = []
+        self._seq = 0
+        # 登记的任务中正在运行的和挂起在本时钟上的，settle() 只需等前者
+        self._awake: set = set()
+        self._suspended: set = set()
+        # settle() 等待中时，任务挂起到本时钟上会完成这个 future
+        self._idle_waiter: Optional[asyncio.Future] = None
+
+    def time(self) -> float:
+        return self._wall_offset + self._now
+
+    def monotonic(self) -> float:
+        return self._now
+
+    async def sleep(self, seconds: float):
+        if seconds <= 0:
+            await asyncio.sleep(0)
+            return
+        future = asyncio.get_running_loop().create_future()
+        task = asyncio.current_task()
+        self._seq += 1
+        heapq.heappush(self._sleepers, (self._now + seconds, self._seq, future, task))
+        self._suspend(task)
+        try:
+            await future
+        finally:
+            self._resume(task)
+
+    def watch(self, task: asyncio.Task) -> asyncio.Task:
+        self._awake.add(task)
+        task.add_done_callback(self._forget)
+        return task
+
+    async def shield(self, task: asyncio.Task) -> Any:
+        """等待期间当前任务视为挂起，由被等待的任务决定是否静止"""
+        return await self._wait_for(asyncio.shield(task))
+
+    async def gather(self, *coros) -> List[Any]:
+        """每个协程在登记的任务中运行，等待期间当前任务视为挂起"""
+        tasks = [self.watch(asyncio.ensure_future(coro)) for coro in coros]
+        return await self._wait_for(asyncio.gather(*tasks))
+
+    async def _wait_for(self, future: asyncio.Future) -> Any:
+        current = asyncio.current_task()
+        future.add_done_callback(lambda _: self._resume(current))
+        self._suspend(current)
+        try:
+            return await future
+        finally:
+            self._resume(current)
+
+    def _forget(self, task: asyncio.Task):
+        self._awake.discard(task)
+        self._suspended.discard(task)
+
+    def _suspend(self, task: Optional[asyncio.Task]):
+        if task in self._awake:
+            self._awake.discard(task)
+            self._suspended.add(task)
+            if self._idle_waiter is not None and not self._idle_waiter.done():
+                self._idle_waiter.set_result(None)
+
+    def _resume(self, task: Optional[asyncio.Task]):
+        if task in self._suspended:
+            self._suspended.discard(task)
+            if not task.done():
+                self._awake.add(task)
+
+    def pending(self) -> int:
+        """仍在等待的 sleep 数（含已取消但尚未出堆的）"""
+        return len(self._sleepers)
+
+    def next_deadline(self) -> Optional[float]:
+        while self._sleepers and self._sleepers[0][2].done():
+            heapq.heappop(self._sleepers)
+        return self._sleepers[0][0] if self._sleepers else None
+
+    async def settle(self):
+        """等待登记的任务全部结束或挂起在本时钟上"""
+        await asyncio.sleep(0)
+        while self._awake:
+            self._idle_waiter = asyncio.get_running_loop().create_future()
+            try:
+                await asyncio.wait(self._awake | {self._idle_waiter}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                self._idle_waiter.cancel()
+                self._idle_waiter = None
+
+    async def advance(self, seconds: float) -> int:
+        """时间前进 seconds 秒，唤醒期间到期的 sleep，返回唤醒次数"""
+        target = self._now + max(0.0, seconds)
+        woken = 0
+        await self.settle()
+        while True:
+            deadline = self.next_deadline()
+            if deadline is None or deadline > target:
+                break
+            self._now = max(self._now, deadline)
+            # 同一时刻到期的 sleep 按登记顺序一起唤醒
+            while self._sleepers and self._sleepers[0][0] <= self._now:
+                _, _, future, task = heapq.heappop(self._sleepers)
+                if not future.done():
+                    # 唤醒后任务重新算作运行中，settle() 会等它下一次挂起或结束
+                    self._resume(task)
+                    future.set_result(None)
+                    woken += 1
+            await self.settle()
+        self._now = target
+        return woken
+
+
+class JoinRequest:
+    """入群申请记录
+
+    使用 __slots__ 和整数ID、整数时间戳保持单条记录尽量紧凑，
+    昵称未知时不单独存储，原始事件仅在开启 keep_raw_payload 时保留。
+    held 记录申请被暂存的原因（如锁定期间的 raid、从其他实例导入的 import），暂存的申请不会自动通过，
+    该标记随申请持久化，重启后同样不会为其恢复自动通过定时器。
+    """
+    
+    __slots__ = (
+        'user_id', 'group_id', '_nickname', 'comment', 'flag', 'timestamp', 'risk_score',
+        'status', 'message_id', 'operator', 'reject_reason', 'processed_time', 'raw',
+        'assignee', 'assigned_at', 'held',
+    )
+    
+    def __init__(self, user_id: Any, group_id: Any, nickname: str = '', comment: str = '',
+                 flag: str = '', timestamp: int = 0, risk_score: int = 0, status: str = 'pending',
+                 message_id: Any = None, raw: Optional[dict] = None):
+        self.user_id = int(user_id)
+        self.group_id = intern_group_id(group_id)
+        self._nickname = nickname or None
+        self.comment = comment or ''
+        self.flag = str(flag) if flag is not None else ''
+        self.timestamp = int(timestamp)
+        self.risk_score = risk_score
+        self.status = status
+        self.message_id = message_id
+        self.operator = None
+        self.reject_reason = None
+        self.processed_time = 0
+        self.raw = raw
+        self.assignee: Optional[str] = None
+        self.assigned_at = 0
+        self.held: Optional[str] = None
+    
+    @property
+    def nickname(self) -> str:
+        return self._nickname or f'用户{self.user_id}'
+    
+    @property
+    def key(self) -> Tuple[int, int]:
+        return (self.group_id, self.user_id)
+    
+    def approx_size(self) -> int:
+        """估算记录及其字符串字段占用的字节数，用于待处理存储的内存预算"""
+        size = sys.getsizeof(self)
+        for value in (self._nickname, self.comment, self.flag, self.operator, self.reject_reason):
+            if value:
+                size += sys.getsizeof(value)
+        if self.raw is not None:
+            size += sys.getsizeof(json.dumps(self.raw, ensure_ascii=False))
+        return size
+    
+    def to_dict(self) -> dict:
+        data = {
+            'user_id': self.user_id,
+            'group_id': self.group_id,
+            'nickname': self._nickname or '',
+            'comment': self.comment,
+            'flag': self.flag,
+            'timestamp': self.timestamp,
+            'risk_score': self.risk_score,
+            'status': self.status,
+            'message_id': self.message_id,
+        }
+        if self.raw is not None:
+            data['raw'] = self.raw
+        if self.assignee is not None:
+            data['assignee'] = self.assignee
+            data['assigned_at'] = self.assigned_at
+        if self.held is not None:
+            data['held'] = self.held
+        return data
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> 'JoinRequest':
+        """从持久化数据（包括旧版以字符串保存的记录）恢复"""
+        nickname = data.get('nickname', '')
+        if nickname == f"用户{data['user_id']}":
+            nickname = ''
+        message_id = data.get('message_id')
+        request = cls(
+            data['user_id'], data['group_id'], nickname, data.get('comment', ''),
+            data.get('flag', ''), data.get('timestamp', 0), data.get('risk_score', 0),
+            data.get('status', 'pending'),
+            normalize_id(message_id) if message_id is not None else None,
+            data.get('raw')
+        )
+        if data.get('assignee') is not None:
+            request.assignee = str(data['assignee'])
+            request.assigned_at = int(data.get('assigned_at', 0))
+        if data.get('held'):
+            request.held = str(data['held'])
+        return request
+    
+    def __repr__(self) -> str:
+        return f"JoinRequest(user_id={self.user_id}, group_id={self.group_id}, status={self.status})"
+
+
+class SortedIndex:
+    """有序键列表实现的排序索引
+
+    插入和删除通过二分查找定位，按页读取只切片所需的部分，
+    因此列出任意一页的开销只与页大小相关。
+    """
+    
+    def __init__(self, key_func: Callable[[Any], Tuple]):
+        self._key_func = key_func
+        self._keys: List[Tuple] = []
+    
+    def add(self, item: Any):
+        bisect.insort(self._keys, self._key_func(item))
+    
+    def remove(self, item: Any):
+        key = self._key_func(item)
+        i = bisect.bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+    
+    def clear(self):
+        self._keys.clear()
+    
+    def page(self, offset: int, limit: int) -> List[Tuple]:
+        return self._keys[offset:offset + limit]
+    
+    def first_from(self, key: Tuple) -> Optional[Tuple]:
+        """不小于 key 的第一个键，key 可以是排序键的前缀"""
+        i = bisect.bisect_left(self._keys, key)
+        return self._keys[i] if i < len(self._keys) else None
+    
+    def __iter__(self):
+        return iter(self._keys)
+    
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class LeaseStore:
+    """多实例共享的 SQLite 协调存储
+
+    leases 表记录每个资源（源群、审核群）当前的持有实例和租约到期时间，
+    持有者需在到期前续约，过期后其他实例即可接管。decisions 表记录已经
+    做出审核决定的申请，保证同一申请只会被一个实例处理。
+    """
+    
+    def __init__(self, path: str, owner: str, ttl: float):
+        self.path = path
+        self.owner = owner
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS leases ("
+            "resource TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS decisions ("
+            "request_key TEXT PRIMARY KEY, owner TEXT NOT NULL, decided_at REAL NOT NULL)"
+        )
+    
+    def try_acquire(self, resource: str) -> Tuple[bool, Optional[str]]:
+        """获取或续约租约，返回 (是否持有, 之前的持有者)"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT owner, expires_at FROM leases WHERE resource = ?", (resource,)
+                ).fetchone()
+                if row and row[0] != self.owner and row[1] > now:
+                    self._conn.execute("COMMIT")
+                    return False, row[0]
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO leases (resource, owner, expires_at) VALUES (?, ?, ?)",
+                    (resource, self.owner, now + self.ttl)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return True, row[0] if row else None
+    
+    def release_all(self):
+        """释放本实例持有的全部租约，便于其他实例立即接管"""
+        with self._lock:
+            # 保留持有者记录只将租约置为过期，接管的实例据此得知需要对账
+            self._conn.execute("UPDATE leases SET expires_at = 0 WHERE owner = ?", (self.owner,))
+    
+    def claim_decision(self, request_key: str) -> bool:
+        """登记审核决定，已被其他实例登记时返回 False"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO decisions (request_key, owner, decided_at) VALUES (?, ?, ?)",
+                (request_key, self.owner, time.time())
+            )
+            return cursor.rowcount == 1
+    
+    def release_decision(self, request_key: str):
+        """审核调用失败时撤销登记，允许重试"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM decisions WHERE request_key = ? AND owner = ?", (request_key, self.owner)
+            )
+    
+    def held_by_others(self, prefix: str) -> bool:
+        """是否有其他实例持有以 prefix 开头且未过期的租约"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM leases WHERE resource LIKE ? AND owner != ? AND expires_at > ? LIMIT 1",
+                (prefix + '%', self.owner, time.time())
+            ).fetchone()
+        return row is not None
+    
+    def prune_decisions(self, max_age: float):
+        with self._lock:
+            self._conn.execute("DELETE FROM decisions WHERE decided_at < ?", (time.time() - max_age,))
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开期间调用平台接口时抛出，表示快速失败"""
+
+
+class CircuitBreaker:
+    """平台适配器熔断器
+
+    连续出现 failure_threshold 次临时性故障后打开，打开期间直接拒绝调用；
+    经过 reset_timeout 秒进入半开状态，只放行一次探测调用，成功则关闭，
+    失败则重新打开。
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, failure_threshold: int, reset_timeout: float,
+                 on_transition: Optional[Callable[[str, str], None]] = None, clock: SystemClock = SYSTEM_CLOCK):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.on_transition = on_transition
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+    
+    def _transition(self, state: str):
+        previous, self.state = self.state, state
+        if self.on_transition:
+            self.on_transition(previous, state)
+    
+    def allow(self) -> bool:
+        if self.state == self.OPEN:
+            if self.clock.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self._transition(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+        return True
+    
+    def record_success(self):
+        self.failures = 0
+        self._probe_in_flight = False
+        if self.state != self.CLOSED:
+            self._transition(self.CLOSED)
+    
+    def release_probe(self):
+        """探测调用未得出结果（如被取消）时释放探测名额，状态保持不变"""
+        self._probe_in_flight = False
+    
+    def record_failure(self):
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+            self.opened_at = self.clock.monotonic()
+            self._transition(self.OPEN)
+
+
+class _GroupSequence:
+    """单个群的推送事件跟踪状态"""
+    
+    __slots__ = ('last_seq', 'last_seen', 'interval', 'gap', 'silence_reported')
+    
+    def __init__(self, seq: Optional[int], now: float):
+        self.last_seq = seq
+        self.last_seen = now
+        self.interval: Optional[float] = None
+        self.gap = False
+        self.silence_reported = False
+
+
+class SequenceTracker:
+    """按群跟踪推送的入群申请事件，发现可能丢失事件的缺口或异常静默
+
+    序号向前跳跃超过 seq_step 时记为缺口（seq_step 为 0 时不按序号判断，默认只检测静默；
+    NapCat 的 flag 和 seq 是全局递增的，只有平台按群连续编号时才应开启）；
+    某个群距上次事件的时间超过平均到达间隔的 silence_factor 倍（且不少于
+    min_silence 秒）时记为静默，每段静默只报告一次。
+    """
+    
+    def __init__(self, seq_step: int = 0, silence_factor: float = 4.0, min_silence: float = 60.0):
+        self.seq_step = seq_step
+        self.silence_factor = silence_factor
+        self.min_silence = min_silence
+        self._groups: Dict[int, _GroupSequence] = {}
+    
+    @staticmethod
+    def parse_sequence(event_data: dict) -> Optional[int]:
+        """取事件中显式给出的按群 seq 字段，flag 不作为序号"""
+        seq = event_data.get('seq')
+        try:
+            return int(seq) if seq is not None else None
+        except (TypeError, ValueError):
+            return None
+    
+    def observe(self, group_id: int, seq: Optional[int], now: float) -> bool:
+        """记录一次推送事件，返回是否发现序号缺口"""
+        state = self._groups.get(group_id)
+        if state is None:
+            self._groups[group_id] = _GroupSequence(seq, now)
+            return False
+        elapsed = now - state.last_seen
+        # 到达间隔的指数加权平均
+        state.interval = elapsed if state.interval is None else state.interval * 0.8 + elapsed * 0.2
+        state.last_seen = now
+        state.silence_reported = False
+        gap = False
+        if seq is not None:
+            if state.last_seq is not None and self.seq_step and seq > state.last_seq + self.seq_step:
+                gap = state.gap = True
+            if state.last_seq is None or seq > state.last_seq:
+                state.last_seq = seq
+        return gap
+    
+    def suspects(self, now: float) -> Dict[int, str]:
+        """返回需要对账的群及原因（gap 或 silence）"""
+        suspects = {}
+        for group_id, state in self._groups.items():
+            if state.gap:
+                suspects[group_id] = 'gap'
+            elif state.interval is not None and not state.silence_reported:
+                if now - state.last_seen > max(self.min_silence, state.interval * self.silence_factor):
+                    state.silence_reported = True
+                    suspects[group_id] = 'silence'
+        return suspects
+    
+    def resolve(self, groups: Optional[set] = None):
+        """对账完成后清除缺口标记，groups 为 None 时清除全部"""
+        for group_id, state in self._groups.items():
+            if groups is None or group_id in groups:
+                state.gap = False
+
+
+class ReviewerAssigner:
+    """审核员指派调度
+
+    维护每个审核员未处理的指派数，least_outstanding 策略选择指派数最少的
+    审核员，round_robin 策略按顺序轮流指派。指派数相同的审核员按计数分桶，
+    选择、指派和释放都是 O(1)。指派记录按指派时间排序，便于找出超时的指派。
+    """
+    
+    STRATEGIES = ('least_outstanding', 'round_robin')
+    
+    def __init__(self, reviewers: List[str], strategy: str = 'least_outstanding'):
+        self.strategy = strategy
+        self.reviewers: List[str] = []
+        self.outstanding: Dict[str, int] = {}
+        # 未处理指派数 -> 该计数下的审核员（有序，先进入的优先）
+        self._buckets: Dict[int, "OrderedDict[str, None]"] = {}
+        self._min_count = 0
+        self._next = 0
+        # 申请键 -> (审核员, 指派时间)，按指派时间先后排列
+        self._assignments: "OrderedDict[Tuple[int, int], Tuple[str, int]]" = OrderedDict()
+        self.set_reviewers(reviewers)
+    
+    def set_reviewers(self, reviewers: List[str]):
+        """更新审核员列表，保留仍在列表中的审核员的未处理计数"""
+        self.reviewers = [str(reviewer) for reviewer in reviewers]
+        counts = Counter(reviewer for reviewer, _ in self._assignments.values())
+        self.outstanding = {reviewer: counts.get(reviewer, 0) for reviewer in self.reviewers}
+        self._buckets = {}
+        for reviewer, count in self.outstanding.items():
+            self._buckets.setdefault(count, OrderedDict())[reviewer] = None
+        self._min_count = min(self._buckets) if self._buckets else 0
+        self._next = 0
+    
+    def _move(self, reviewer: str, delta: int):
+        count = self.outstanding.get(reviewer)
+        if count is None:
+            # 已移除的审核员不再参与指派
+            return
+        bucket = self._buckets[count]
+        del bucket[reviewer]
+        if not bucket:
+            del self._buckets[count]
+            if self._min_count == count and delta > 0:
+                self._min_count = count + delta
+        count += delta
+        self.outstanding[reviewer] = count
+        self._buckets.setdefault(count, OrderedDict())[reviewer] = None
+        if count < self._min_count:
+            self._min_count = count
+    
+    def _pick(self, exclude: Optional[str]) -> Optional[str]:
+        if not self.reviewers or (len(self.reviewers) == 1 and self.reviewers[0] == exclude):
+            return None
+        if self.strategy == 'round_robin':
+            reviewer = self.reviewers[self._next % len(self.reviewers)]
+            self._next += 1
+            if reviewer == exclude:
+                reviewer = self.reviewers[self._next % len(self.reviewers)]
+                self._next += 1
+            return reviewer
+        bucket = self._buckets[self._min_count]
+        reviewer = next(iter(bucket))
+        if reviewer == exclude:
+            # 排除的审核员恰好最空闲时，取同一计数的下一位或下一个计数桶的第一位
+            if len(bucket) > 1:
+                iterator = iter(bucket)
+                next(iterator)
+                return next(iterator)
+            return next(iter(self._buckets[min(c for c in self._buckets if c != self._min_count)]))
+        return reviewer
+    
+    def assign(self, key: Tuple[int, int], now: int, exclude: Optional[str] = None) -> Optional[str]:
+        """为申请指派审核员，没有可用的审核员时返回 None"""
+        reviewer = self._pick(exclude)
+        if reviewer is None:
+            return None
+        self.release(key)
+        self._assignments[key] = (reviewer, now)
+        self._move(reviewer, 1)
+        return reviewer
+    
+    def restore(self, key: Tuple[int, int], reviewer: str, assigned_at: int):
+        """恢复持久化的指派"""
+        self._assignments[key] = (reviewer, assigned_at)
+        self._move(reviewer, 1)
+    
+    def release(self, key: Tuple[int, int]) -> Optional[str]:
+        """申请处理完成或被移除时释放指派"""
+        assignment = self._assignments.pop(key, None)
+        if assignment is None:
+            return None
+        self._move(assignment[0], -1)
+        return assignment[0]
+    
+    def expired(self, now: int, timeout: int) -> List[Tuple[Tuple[int, int], str]]:
+        """超过 timeout 秒仍未处理的指派，按指派时间从早到晚"""
+        expired = []
+        for key, (reviewer, assigned_at) in self._assignments.items():
+            if now - assigned_at < timeout:
+                break
+            expired.append((key, reviewer))
+        return expired
+
+
+class TokenBucket:
+    """令牌桶限流器，rate 为每秒补充的令牌数，burst 为桶容量，rate 为 0 时不限流"""
+    
+    def __init__(self, rate: float, burst: int, clock: SystemClock = SYSTEM_CLOCK):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.clock = clock
+        self.tokens = float(self.burst)
+        self.updated_at = clock.monotonic()
+    
+    def _refill(self):
+        now = self.clock.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+    
+    def available(self) -> float:
+        """当前可用的令牌数，不限流时为无穷大"""
+        if self.rate <= 0:
+            return float('inf')
+        self._refill()
+        return self.tokens
+    
+    def try_acquire(self) -> bool:
+        """有可用令牌时立即取走并返回 True，否则不等待直接返回 False"""
+        if self.rate <= 0:
+            return True
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+    
+    async def acquire(self) -> float:
+        """等待直到取得令牌，返回等待的秒数"""
+        waited = 0.0
+        while not self.try_acquire():
+            delay = (1 - self.tokens) / self.rate
+            waited += delay
+            await self.clock.sleep(delay)
+        return waited
+
+
+class SlidingWindowCounter:
+    """按键统计最近 window 秒内的事件数
+
+    窗口切分为 buckets 个时间桶，每个键只保存非空桶的 [桶序号, 计数]，
+    过期的桶在访问或 prune 时丢弃，计数误差不超过一个桶的宽度。
+    """
+    
+    def __init__(self, window: float, buckets: int = 12):
+        self.window = window
+        self.buckets = max(1, buckets)
+        self.width = max(window, 1e-9) / self.buckets
+        self._buckets: Dict[Any, deque] = {}
+        self._totals: Dict[Any, int] = {}
+    
+    def _expire(self, key: Any, current: int) -> int:
+        slots = self._buckets[key]
+        total = self._totals[key]
+        while slots and slots[0][0] <= current - self.buckets:
+            total -= slots.popleft()[1]
+        self._totals[key] = total
+        return total
+    
+    def hit(self, key: Any, now: float) -> int:
+        """记录一次事件，返回包括本次在内窗口内的事件数"""
+        current = int(now // self.width)
+        if key not in self._buckets:
+            self._buckets[key] = deque()
+            self._totals[key] = 0
+        self._expire(key, current)
+        slots = self._buckets[key]
+        if slots and slots[-1][0] == current:
+            slots[-1][1] += 1
+        else:
+            slots.append([current, 1])
+        self._totals[key] += 1
+        return self._totals[key]
+    
+    def count(self, key: Any, now: float) -> int:
+        """窗口内的事件数"""
+        if key not in self._buckets:
+            return 0
+        return self._expire(key, int(now // self.width))
+    
+    def prune(self, now: float) -> int:
+        """丢弃窗口内已没有事件的键，返回丢弃的数量"""
+        current = int(now // self.width)
+        idle = [key for key in self._buckets if not self._expire(key, current)]
+        for key in idle:
+            del self._buckets[key]
+            del self._totals[key]
+        return len(idle)
+    
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RaidDetector:
+    """按源群检测入群申请突增
+
+    每个群维护一个按 baseline_period 指数衰减的长期到达率（EWMA）和 window 秒的
+    滑动窗口计数。窗口内申请数达到 threshold 且超过长期到达率预期的 ratio 倍时
+    判定为突增，窗口计数回落到 threshold 的一半以下时解除。突增期间不更新长期
+    到达率，避免突增本身抬高基线。每个事件的开销为 O(1)。
+    """
+    
+    def __init__(self, window: float = 60, threshold: int = 20, ratio: float = 3.0,
+                 baseline_period: float = 3600):
+        self.window = window
+        self.threshold = threshold
+        self.ratio = ratio
+        self.baseline_period = max(baseline_period, 1e-9)
+        self.counter = SlidingWindowCounter(window)
+        # 群号 -> [长期到达率（次/秒）, 更新时间]
+        self._rates: Dict[int, List[float]] = {}
+        # 处于突增状态的群 -> 开始时间
+        self.active: Dict[int, float] = {}
+    
+    def baseline(self, group_id: int, now: float) -> float:
+        """群的长期到达率（次/秒）"""
+        rate = self._rates.get(group_id)
+        if rate is None:
+            return 0.0
+        return rate[0] * math.exp(-(now - rate[1]) / self.baseline_period)
+    
+    def observe(self, group_id: int, now: float) -> bool:
+        """记录一个申请，本次申请触发突增时返回 True"""
+        count = self.counter.hit(group_id, now)
+        if group_id in self.active:
+            return False
+        baseline = self.baseline(group_id, now)
+        if self.threshold > 0 and count >= self.threshold and count >= self.ratio * baseline * self.window:
+            self.active[group_id] = now
+            return True
+        self._rates[group_id] = [baseline + 1 / self.baseline_period, now]
+        return False
+    
+    def calmed(self, now: float) -> List[int]:
+        """到达率已回落的突增群，返回时即解除其突增状态"""
+        calmed = [
+            group_id for group_id in self.active
+            if self.counter.count(group_id, now) * 2 < self.threshold
+        ]
+        for group_id in calmed:
+            del self.active[group_id]
+        return calmed
+
+
+# 各平台接口的重试策略，可通过配置项 retry_policies 按接口覆盖
+DEFAULT_RETRY_POLICY = {'max_attempts': 3, 'base_delay': 0.5, 'max_delay': 10.0}
+RETRY_POLICIES = {
+    'set_group_add_request': {'max_attempts': 4, 'base_delay': 1.0, 'max_delay': 15.0},
+    'send_group_msg': {'max_attempts': 3, 'base_delay': 0.5, 'max_delay': 5.0},
+    'get_stranger_info': {'max_attempts': 2, 'base_delay': 0.2, 'max_delay': 1.0},
+    'get_group_system_msg': {'max_attempts': 3, 'base_delay': 1.0, 'max_delay': 10.0},
+    'delete_msg': {'max_attempts': 2, 'base_delay': 0.5, 'max_delay': 2.0},
+}
+
+# 向群内发出消息的接口，共用出站限流预算以免触发平台风控
+OUTBOUND_APIS = {'send_group_msg', 'delete_msg'}
+
+# 表示连接层面临时故障的异常类型名（如 aiocqhttp 的 NetworkError），值得重试
+TRANSIENT_ERROR_NAMES = {
+    'NetworkError', 'ApiNotAvailable', 'TimeoutError',
+    'ClientConnectorError', 'ServerDisconnectedError', 'ClientOSError',
+}
+
+# 非幂等的接口：超时、连接中断等失败时请求可能已被平台执行，重试会重复发送审核卡片
+NON_IDEMPOTENT_APIS = {'send_group_msg'}
+
+# 确定请求没有到达平台的异常类型名，非幂等接口只在这些情况下重试
+UNSENT_ERROR_NAMES = {'ApiNotAvailable', 'ClientConnectorError'}
+
+
+# 申请状态机: pending -> deciding -> approved / rejected / auto_approved / failed，
+# failed 的申请可由审核员重新决定
+REQUEST_TRANSITIONS: Dict[str, set] = {
+    'pending': {'deciding'},
+    'deciding': {'approved', 'rejected', 'auto_approved', 'failed'},
+    'failed': {'deciding'},
+    'approved': set(),
+    'rejected': set(),
+    'auto_approved': set(),
+}
+
+
+# 排序方式 -> 排序键，同一时间的申请按用户ID排列，键的最后一项始终为申请的 (群号, 用户ID)
+LIST_SORT_KEYS: Dict[str, Callable[[JoinRequest], Tuple]] = {
+    'age': lambda r: (r.timestamp, r.user_id, r.key),
+    'group': lambda r: (r.group_id, r.timestamp, r.user_id, r.key),
+    'risk': lambda r: (-r.risk_score, r.timestamp, r.user_id, r.key),
+}
+
+class RequestStore:
+    """待处理申请存储
+
+    主键为 (群号, 用户ID)，同一用户申请多个群时互不覆盖。同时维护按用户、
+    按群、按 flag、按审核卡片 message_id 的二级索引以及 /列表 使用的排序索引，
+    所有查找都是 O(1)。卡片索引有容量上限，超出时淘汰最早的卡片。
+    total_bytes 为全部记录的估算内存占用，随增删增量维护。
+    """
+    
+    def __init__(self, message_index_max_size: int = 1000):
+        self.message_index_max_size = message_index_max_size
+        self._requests: Dict[Tuple[int, int], JoinRequest] = {}
+        self._by_user: Dict[int, Dict[int, JoinRequest]] = {}
+        self._by_group: Dict[int, Dict[int, JoinRequest]] = {}
+        self._by_flag: Dict[str, JoinRequest] = {}
+        self._by_message: "OrderedDict[Any, Tuple[int, int]]" = OrderedDict()
+        self._sizes: Dict[Tuple[int, int], int] = {}
+        self.total_bytes = 0
+        self.sorted_indexes: Dict[str, SortedIndex] = {
+            name: SortedIndex(key_func) for name, key_func in LIST_SORT_KEYS.items()
+        }
+    
+    def __len__(self) -> int:
+        return len(self._requests)
+    
+    def __contains__(self, key: Tuple[int, int]) -> bool:
+        return key in self._requests
+    
+    def __iter__(self):
+        return iter(list(self._requests.values()))
+    
+    def get(self, key: Tuple[int, int]) -> Optional[JoinRequest]:
+        return self._requests.get(key)
+    
+    def add(self, request: JoinRequest) -> Optional[JoinRequest]:
+        """登记申请，返回被替换的旧申请（同一用户再次申请同一个群）
+
+        卡片索引需另行调用 index_message 登记，以便恢复状态时保留淘汰顺序。
+        """
+        previous = self._requests.get(request.key)
+        if previous is not None:
+            self.remove(previous)
+        self._requests[request.key] = request
+        self._sizes[request.key] = request.approx_size()
+        self.total_bytes += self._sizes[request.key]
+        self._by_user.setdefault(request.user_id, {})[request.group_id] = request
+        self._by_group.setdefault(request.group_id, {})[request.user_id] = request
+        if request.flag:
+            self._by_flag[request.flag] = request
+        for index in self.sorted_indexes.values():
+            index.add(request)
+        return previous
+    
+    def remove(self, request: JoinRequest) -> bool:
+        """移除申请及其全部索引，只有当前登记的正是该对象时才会移除"""
+        if self._requests.get(request.key) is not request:
+            return False
+        del self._requests[request.key]
+        self.total_bytes -= self._sizes.pop(request.key)
+        user_bucket = self._by_user[request.user_id]
+        del user_bucket[request.group_id]
+        if not user_bucket:
+            del self._by_user[request.user_id]
+        group_bucket = self._by_group[request.group_id]
+        del group_bucket[request.user_id]
+        if not group_bucket:
+            del self._by_group[request.group_id]
+        if self._by_flag.get(request.flag) is request:
+            del self._by_flag[request.flag]
+        if request.message_id is not None and self._by_message.get(request.message_id) == request.key:
+            # 合并卡片由同一申请人的多个申请共用，改为指向其中仍待处理的申请
+            sibling = next((
+                r for r in self._by_user.get(request.user_id, {}).values() if r.message_id == request.message_id
+            ), None)
+            if sibling is not None:
+                self._by_message[request.message_id] = sibling.key
+            else:
+                del self._by_message[request.message_id]
+        for index in self.sorted_indexes.values():
+            index.remove(request)
+        return True
+    
+    def by_user(self, user_id: int) -> List[JoinRequest]:
+        return list(self._by_user.get(user_id, {}).values())
+    
+    def by_group(self, group_id: int) -> List[JoinRequest]:
+        return list(self._by_group.get(group_id, {}).values())
+    
+    def by_flag(self, flag: str) -> Optional[JoinRequest]:
+        return self._by_flag.get(flag)
+    
+    def by_message(self, message_id: Any) -> Optional[JoinRequest]:
+        key = self._by_message.get(message_id)
+        return self._requests.get(key) if key is not None else None
+    
+    def group_sizes(self) -> Dict[int, int]:
+        return {group_id: len(bucket) for group_id, bucket in self._by_group.items()}
+    
+    def oldest(self, group_id: Optional[int] = None) -> Optional[JoinRequest]:
+        """申请时间最早的待处理申请，指定群时只在该群中查找
+
+        按群查找时在按 (群号, 申请时间) 排序的索引中二分定位，导入或恢复的
+        申请即使登记顺序较晚也按申请时间计算。
+        """
+        if group_id is None:
+            for sort_key in self.sorted_indexes['age']:
+                return self._requests[sort_key[-1]]
+            return None
+        sort_key = self.sorted_indexes['group'].first_from((group_id,))
+        if sort_key is None or sort_key[0] != group_id:
+            return None
+        return self._requests[sort_key[-1]]
+    
+    def index_message(self, message_id: Any, request: JoinRequest) -> List[Tuple[Any, Tuple[int, int]]]:
+        """记录审核卡片与申请的对应关系，返回因超出上限被淘汰的卡片"""
+        request.message_id = message_id
+        self._by_message[message_id] = request.key
+        self._by_message.move_to_end(message_id)
+        evicted = []
+        while len(self._by_message) > self.message_index_max_size:
+            evicted.append(self._by_message.popitem(last=False))
+        return evicted
+    
+    def unindex_message(self, message_id: Any):
+        """移除已被取代的审核卡片的索引"""
+        self._by_message.pop(message_id, None)
+    
+    def message_index_items(self) -> List[Tuple[Any, Tuple[int, int]]]:
+        return list(self._by_message.items())
+    
+    def eviction_candidates(self, now: int, max_age: int = 0, max_count: int = 0,
+                            max_bytes: int = 0) -> List[Tuple[JoinRequest, str]]:
+        """按申请时间从旧到新选出需要淘汰的申请，返回 (申请, 原因) 列表
+
+        超过 max_age 秒的申请原因为 expired；之后若数量或估算内存仍超出预算，
+        继续淘汰最早的申请，原因为 over_budget。上限为 0 表示不限制。正在
+        决定中的申请不会被选中。
+        """
+        count, total_bytes = len(self._requests), self.total_bytes
+        candidates = []
+        for sort_key in self.sorted_indexes['age']:
+            request = self._requests[sort_key[-1]]
+            if request.status == 'deciding':
+                continue
+            if max_age and now - request.timestamp > max_age:
+                reason = 'expired'
+            elif (max_count and count > max_count) or (max_bytes and total_bytes > max_bytes):
+                reason = 'over_budget'
+            else:
+                break
+            candidates.append((request, reason))
+            count -= 1
+            total_bytes -= self._sizes[request.key]
+        return candidates
+    
+    def clear(self):
+        self._requests.clear()
+        self._by_user.clear()
+        self._by_group.clear()
+        self._by_flag.clear()
+        self._by_message.clear()
+        self._sizes.clear()
+        self.total_bytes = 0
+        for index in self.sorted_indexes.values():
+            index.clear()
+
+
+LIST_SORT_LABELS = {'age': '申请时间', 'group': '群号', 'risk': '风险分'}
+
+LIST_SORT_ALIASES = {
+    '时间': 'age', 'age': 'age',
+    '群': 'group', '群号': 'group', 'group': 'group',
+    '风险': 'risk', 'risk': 'risk',
+}
+
+# 反复申请的处理方式：queue 静默保存不发卡片，reject 直接拒绝
+REAPPLY_ACTIONS = ('queue', 'reject')
+
+# 审核群中以这些前缀开头的消息按审核指令处理
+REVIEW_COMMAND_PREFIXES = ('/通过', '/拒绝', '/全部通过', '/全部拒绝', '/查看', '/列表', '/审核状态', '/导出', '/导入')
+
+# 同一申请人短时间内申请多个群时的合并卡片
+DEFAULT_AGGREGATED_TEMPLATE = (
+    "🚨 同一申请人短时间内申请了 {count} 个群\n\n👤 申请人: {nickname} ({user_id})\n🏠 申请群: {groups}\n"
+    "💬 申请理由: {comment}\n⏰ 时间: {timestamp}\n\n✅ /全部通过 {user_id}\n❌ /全部拒绝 {user_id} [理由]\n"
+    "💡 回复本消息「通过」或「拒绝 理由」将处理全部申请，单个群可使用 /通过 {user_id}:群号"
+)
+
+# 申请接收方式：push 只依赖平台推送的请求事件，poll 定期拉取群系统消息，
+# hybrid 以推送为主，并以较长间隔轮询补录推送丢失的申请
+INTAKE_MODES = ('push', 'poll', 'hybrid')
+
+# 配置项及默认值，load_config 据此补全缺省项并校验类型
+DEFAULT_CONFIG: Dict[str, Any] = {
+    "source_group_id": "",
+    "target_group_id": "",
+    "reviewers": [],
+    "auto_approve_timeout": 300,
+    "intake_mode": "push",
+    "poll_interval": 30,
+    "hybrid_poll_interval": 300,
+    "gap_check_interval": 5,
+    "gap_seq_step": 0,
+    "gap_silence_factor": 4.0,
+    "gap_min_silence": 60,
+    "message_index_max_size": 1000,
+    "pending_max_count": 5000,
+    "pending_max_bytes": 8 * 1024 * 1024,
+    "pending_max_age": 7 * 24 * 3600,
+    "pending_sweep_interval": 300,
+    "evict_notify": False,
+    "slo_check_interval": 10,
+    "slo_max_wait": 1800,
+    "slo_max_depth": 50,
+    "slo_escalation_cooldown": 900,
+    "assignment_strategy": "none",
+    "assignment_timeout": 600,
+    "reapply_limit": 3,
+    "reapply_window": 3600,
+    "reapply_action": "queue",
+    "reapply_reject_reason": "申请过于频繁，请稍后再试",
+    "raid_threshold": 20,
+    "raid_window": 60,
+    "raid_ratio": 3.0,
+    "raid_baseline_period": 3600,
+    "raid_reject_new_accounts": False,
+    "raid_reject_reason": "群组暂时关闭新成员申请，请稍后再试",
+    "decision_log": True,
+    "record_path": "",
+    "review_api_enabled": False,
+    "review_api_host": "127.0.0.1",
+    "review_api_port": 8765,
+    "review_api_token": "",
+    "aggregate_window": 60,
+    "aggregate_quiet": 5,
+    "member_check": True,
+    "member_check_groups": [],
+    "member_action": "annotate",
+    "outbound_rate": 5,
+    "outbound_burst": 10,
+    "card_cleanup": "none",
+    "card_cleanup_interval": 10,
+    "keep_raw_payload": False,
+    "list_page_size": 10,
+    "startup_reconcile": True,
+    "shutdown_drain_timeout": 10,
+    "instance_id": "",
+    "lease_store_path": "",
+    "lease_ttl": 30,
+    "circuit_failure_threshold": 5,
+    "circuit_reset_timeout": 30,
+    "retry_policies": {},
+    "max_message_length": 3000,
+    "debug_mode": True,
+    "debug_log_events": True,
+    "debug_log_api_calls": True,
+    "notification_template": {
+        "new_request": "🔔 新的入群申请\n\n👤 申请人: {nickname} ({user_id})\n🏠 申请群: {group_id}\n💬 申请理由: {comment}\n⏰ 申请时间: {timestamp}\n\n请使用以下指令进行审核:\n✅ /通过 {user_id}\n❌ /拒绝 {user_id} [理由]\n📋 /查看 {user_id}\n💡 也可直接回复本消息「通过」或「拒绝 理由」\n\n申请将在 {timeout} 秒后自动通过",
+        "approved": "✅ 入群申请已通过\n\n👤 申请人: {nickname} ({user_id})\n🏠 申请群: {group_id}\n👨‍💼 操作员: {operator}\n⏰ 处理时间: {timestamp}",
+        "rejected": "❌ 入群申请已拒绝\n\n👤 申请人: {nickname} ({user_id})\n🏠 申请群: {group_id}\n👨‍💼 操作员: {operator}\n📝 拒绝理由: {reason}\n⏰ 处理时间: {timestamp}",
+        "aggregated": DEFAULT_AGGREGATED_TEMPLATE,
+        "auto_approved": "⏰ 入群申请已自动通过\n\n👤 申请人: {nickname} ({user_id})\n🏠 申请群: {group_id}\n⏰ 处理时间: {timestamp}\n\n原因: 超时自动通过"
+    }
+}
+
+# _conf_schema.json（AstrBot 管理界面）中的键名 -> 配置项
+SCHEMA_KEY_ALIASES = {'source_group': 'source_group_id', 'target_group': 'target_group_id'}
+# _conf_schema.json 中的消息模板 -> notification_template 中的模板名
+SCHEMA_TEMPLATE_ALIASES = {
+    'request_message_template': 'new_request',
+    'approve_message_template': 'approved',
+    'reject_message_template': 'rejected',
+    'auto_approve_message_template': 'auto_approved',
+    'error_message_template': 'error',
+}
+# 取值受限的配置项
+CONFIG_CHOICES: Dict[str, Tuple[str, ...]] = {
+    'intake_mode': INTAKE_MODES,
+    'reapply_action': REAPPLY_ACTIONS,
+    'card_cleanup': ('none', 'recall', 'summary'),
+    'member_action': ('annotate', 'approve'),
+    'assignment_strategy': ('none',) + ReviewerAssigner.STRATEGIES,
+}
+# _conf_schema.json 的类型名 -> 对应默认值，用于校验只在 schema 中声明的配置项
+SCHEMA_TYPE_SAMPLES = {'string': '', 'int': 0, 'float': 0.0, 'bool': False, 'list': [], 'object': {}}
+
+def load_config_schema(path: Optional[str] = None) -> Dict[str, dict]:
+    """读取 _conf_schema.json，文件缺失或无法解析时返回空字典"""
+    path = path or os.path.join(os.path.dirname(os.path.abspath(__file__)), "_conf_schema.json")
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            schema = json.load(f)
+        return schema if isinstance(schema, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def _coerce_config_value(value: Any, sample: Any) -> Tuple[bool, Any]:
+    """按默认值的类型校验并转换配置值，返回 (是否有效, 转换后的值)"""
+    if isinstance(sample, bool):
+        if isinstance(value, bool):
+            return True, value
+        if isinstance(value, str) and value.strip().lower() in ('true', 'false', '1', '0'):
+            return True, value.strip().lower() in ('true', '1')
+        return False, None
+    if isinstance(sample, (int, float)):
+        # 数值项允许小数（测试和基准使用亚秒级的间隔）
+        if isinstance(value, bool):
+            return False, None
+        if isinstance(value, (int, float)):
+            return True, value
+        if isinstance(value, str):
+            try:
+                number = float(value)
+            except ValueError:
+                return False, None
+            return True, int(number) if number.is_integer() else number
+        return False, None
+    if isinstance(sample, str):
+        if isinstance(value, str):
+            return True, value
+        if isinstance(value, int) and not isinstance(value, bool):
+            # 群号常被写成数字
+            return True, str(value)
+        return False, None
+    if isinstance(sample, list):
+        return (True, tuple(value)) if isinstance(value, (list, tuple)) else (False, None)
+    if isinstance(sample, dict):
+        return (True, MappingProxyType(dict(value))) if isinstance(value, dict) else (False, None)
+    return True, value
+
+class ConfigSnapshot:
+    """校验后的只读配置快照
+
+    DEFAULT_CONFIG 中的每个配置项都是同名的只读属性，列表转换为元组、字典
+    转换为只读映射。修改配置时用 replace 生成新快照整体替换，不会出现读到
+    一半新一半旧的配置。其他配置项原样保存在 extra 中，保存时写回。
+    """
+    
+    __slots__ = tuple(DEFAULT_CONFIG) + ('extra', 'warnings')
+    
+    def __init__(self, values: Dict[str, Any], extra: Optional[Dict[str, Any]] = None, warnings: Tuple[str, ...] = ()):
+        for key in DEFAULT_CONFIG:
+            object.__setattr__(self, key, values[key])
+        object.__setattr__(self, 'extra', MappingProxyType(dict(extra or {})))
+        object.__setattr__(self, 'warnings', tuple(warnings))
+    
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError("配置快照是只读的，请使用 replace 生成新快照")
+    
+    def __delattr__(self, name: str):
+        raise AttributeError("配置快照是只读的，请使用 replace 生成新快照")
+    
+    @staticmethod
+    def _is_schema_default(schema: Dict[str, dict], key: str, value: Any) -> bool:
+        """值等于 _conf_schema.json 声明的默认值时视为未设置"""
+        entry = schema.get(key)
+        return value in ('', None) or (isinstance(entry, dict) and entry.get('default') == value)
+    
+    @classmethod
+    def build(cls, *sources: Optional[dict], schema: Optional[Dict[str, dict]] = None) -> 'ConfigSnapshot':
+        """按顺序合并配置来源（后者优先），迁移 _conf_schema.json 的键名并校验类型
+
+        无效的值保留默认值并记录在 warnings 中。
+        """
+        schema = schema or {}
+        values = {key: _coerce_config_value(value, value)[1] for key, value in DEFAULT_CONFIG.items()}
+        templates = dict(DEFAULT_CONFIG['notification_template'])
+        extra: Dict[str, Any] = {}
+        warnings: List[str] = []
+        for source in sources:
+            if not source:
+                continue
+            source = dict(source)
+            # 旧键名只在同一来源没有新键名且不是 schema 默认值时生效
+            for legacy, key in SCHEMA_KEY_ALIASES.items():
+                if legacy in source:
+                    value = source.pop(legacy)
+                    if key not in source and not cls._is_schema_default(schema, legacy, value):
+                        source[key] = value
+            for legacy, name in SCHEMA_TEMPLATE_ALIASES.items():
+                if legacy in source:
+                    value = source.pop(legacy)
+                    if isinstance(value, str) and not cls._is_schema_default(schema, legacy, value):
+                        templates[name] = value
+            for key, value in source.items():
+                if key == 'notification_template':
+                    if isinstance(value, dict):
+                        templates.update((name, text) for name, text in value.items() if isinstance(text, str))
+                    else:
+                        warnings.append(f"{key}={value!r}")
+                    continue
+                sample = DEFAULT_CONFIG.get(key)
+                if sample is None and isinstance(schema.get(key), dict):
+                    sample = SCHEMA_TYPE_SAMPLES.get(schema[key].get('type'))
+                valid, converted = _coerce_config_value(value, sample) if sample is not None else (True, value)
+                if not valid or (key in CONFIG_CHOICES and converted not in CONFIG_CHOICES[key]):
+                    warnings.append(f"{key}={value!r}")
+                elif key in DEFAULT_CONFIG:
+                    values[key] = converted
+                else:
+                    extra[key] = value
+        values['reviewers'] = tuple(str(reviewer) for reviewer in values['reviewers'])
+        values['notification_template'] = MappingProxyType(templates)
+        return cls(values, extra, tuple(warnings))
+    
+    def replace(self, **changes: Any) -> 'ConfigSnapshot':
+        """返回应用了修改的新快照"""
+        return ConfigSnapshot.build(self.to_dict(), changes)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可写入 config.json 的字典"""
+        result = dict(self.extra)
+        for key in DEFAULT_CONFIG:
+            value = getattr(self, key)
+            if isinstance(value, tuple):
+                value = list(value)
+            elif isinstance(value, MappingProxyType):
+                value = dict(value)
+            result[key] = value
+        return result
+
+# 导出和导入的记录字段，kind 为 pending（待处理申请）或 decision（审核记录）
+EXPORT_FIELDS = (
+    'kind', 'user_id', 'group_id', 'nickname', 'comment', 'flag', 'timestamp',
+    'risk_score', 'status', 'operator', 'reason', 'processed_time',
+)
+EXPORT_FORMATS = ('csv', 'jsonl')
+EXPORT_INT_FIELDS = {'user_id', 'group_id', 'timestamp', 'risk_score', 'processed_time'}
+
+def request_record(request_info: JoinRequest, kind: str = 'pending') -> dict:
+    """申请转换为导出记录"""
+    return {
+        'kind': kind,
+        'user_id': request_info.user_id,
+        'group_id': request_info.group_id,
+        'nickname': request_info.nickname,
+        'comment': request_info.comment,
+        'flag': request_info.flag,
+        'timestamp': request_info.timestamp,
+        'risk_score': request_info.risk_score,
+        'status': request_info.status,
+        'operator': request_info.operator or '',
+        'reason': request_info.reject_reason or '',
+        'processed_time': request_info.processed_time,
+    }
+
+def iter_decision_log(path: str) -> Iterator[dict]:
+    """逐行读取审核记录文件，跳过损坏的行"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict):
+                yield record
+
+def iter_export_chunks(records: Iterable[dict], fmt: str, chunk_size: int = 500) -> Iterator[str]:
+    """把记录逐块编码为 CSV 或 JSONL 文本，每块最多 chunk_size 条，不在内存中保留全部记录"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的格式: {fmt}")
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, EXPORT_FIELDS, extrasaction='ignore') if fmt == 'csv' else None
+    if writer is not None:
+        writer.writeheader()
+    pending = 0
+    for record in records:
+        if writer is not None:
+            writer.writerow(record)
+        else:
+            buffer.write(json.dumps({field: record.get(field) for field in EXPORT_FIELDS}, ensure_ascii=False))
+            buffer.write('\n')
+        pending += 1
+        if pending >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def iter_import_records(lines: Iterable[str], fmt: str) -> Iterator[dict]:
+    """逐条解析 CSV 或 JSONL 导出文件，整数字段转换回整数，无法解析的记录被跳过"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的格式: {fmt}")
+    rows = csv.DictReader(lines) if fmt == 'csv' else (line for line in lines if line.strip())
+    for row in rows:
+        if fmt == 'jsonl':
+            try:
+                row = json.loads(row)
+            except ValueError:
+                continue
+            if not isinstance(row, dict):
+                continue
+        try:
+            yield {
+                field: (int(row[field] or 0) if field in EXPORT_INT_FIELDS else (row.get(field) or ''))
+                for field in EXPORT_FIELDS if field in row
+            }
+        except (KeyError, TypeError, ValueError):
+            continue
+
+class EventRecorder:
+    """把接收到的申请事件、轮询结果和审核指令追加到 JSONL 录制文件
+
+    每行为 [相对录制开始的秒数, 类型, 内容]，类型为 meta / request / poll / command。
+    录制文件可由 entry_review_replay.py 按原有时间间隔在虚拟时钟上回放。
+    """
+    
+    # 录制文件中不保存的敏感配置项
+    SECRET_KEYS = ('review_api_token',)
+    
+    def __init__(self, path: str, config: Dict[str, Any], clock: SystemClock = SYSTEM_CLOCK):
+        self.path = path
+        self.clock = clock
+        self.started_at = clock.monotonic()
+        self._file = open(path, 'a', encoding='utf-8', buffering=1)
+        self.record('meta', {key: value for key, value in config.items() if key not in self.SECRET_KEYS})
+    
+    def record(self, kind: str, payload: Any):
+        if self._file is None:
+            return
+        offset = round(self.clock.monotonic() - self.started_at, 3)
+        self._file.write(json.dumps([offset, kind, payload], ensure_ascii=False, separators=(',', ':'), default=str))
+        self._file.write('\n')
+    
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def iter_recording(path: str) -> Iterator[Tuple[float, str, Any]]:
+    """逐行读取录制文件，跳过损坏的行"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                offset, kind, payload = json.loads(line)
+            except ValueError:
+                continue
+            yield float(offset), kind, payload
+
+class ReviewApi:
+    """本机 HTTP 审核接口（可选，需要 aiohttp）
+
+    GET  /api/pending?page=&size=&sort=  待处理申请分页（sort 为 age / group / risk）
+    GET  /api/requests/<QQ号>[:群号]     申请详情
+    POST /api/decisions                 批量决定 {"action": "approve"|"reject", "targets": [...], "reason", "operator"}
+    GET  /api/events                    以 SSE 推送 new / decided 事件
+
+    与聊天指令共用存储和 _decide 决定路径。请求须携带 Authorization: Bearer <token>，
+    POST 须为 application/json；监听本机地址时还校验 Host 和 Origin，防止网页跨站提交和 DNS 重绑定。
+    """
+    
+    SUBSCRIBER_QUEUE_SIZE = 256
+    KEEPALIVE_INTERVAL = 15
+    LOOPBACK_HOSTS = ('127.0.0.1', '::1', 'localhost')
+    
+    def __init__(self, plugin: 'EntryReviewPluginFixed', token: str = '', host: str = '127.0.0.1'):
+        self.plugin = plugin
+        self.token = token
+        # 监听 0.0.0.0 等地址时无法确定合法的主机名，只依靠 token
+        self.allowed_hosts = set(self.LOOPBACK_HOSTS) | {host} if host in self.LOOPBACK_HOSTS else None
+        self._subscribers: set = set()
+        self._runner = None
+    
+    # ---- 事件推送 ----
+    
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(self.SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        return queue
+    
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+    
+    def _close(self, queue: asyncio.Queue):
+        """断开订阅者：丢弃积压的事件并放入结束标记"""
+        self._subscribers.discard(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+    
+    def publish(self, event_type: str, request_info: JoinRequest):
+        """向所有订阅者推送事件，跟不上的订阅者被断开而不是阻塞审核流程"""
+        if not self._subscribers:
+            return
+        payload = (event_type, self.describe(request_info))
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                # 客户端重连后应重新拉取 /api/pending
+                self._close(queue)
+    
+    # ---- 与传输无关的接口逻辑 ----
+    
+    @staticmethod
+    def _hostname(value: str) -> str:
+        """从 Host 头中去掉端口，IPv6 地址去掉方括号"""
+        value = value.strip().lower()
+        if value.startswith('['):
+            return value[1:value.find(']')]
+        return value.rsplit(':', 1)[0] if value.count(':') == 1 else value
+    
+    def check_request(self, method: str, headers) -> Optional[Tuple[int, dict]]:
+        """校验请求头，拒绝时返回 (HTTP 状态码, 内容)，通过时返回 None"""
+        if self.allowed_hosts is not None:
+            if self._hostname(headers.get('Host', '')) not in self.allowed_hosts:
+                return 403, {'error': 'forbidden_host'}
+            origin = headers.get('Origin')
+            if origin is not None and (urlsplit(origin).hostname or '') not in self.allowed_hosts:
+                return 403, {'error': 'forbidden_origin'}
+        authorization = headers.get('Authorization', '').encode()
+        if not self.token or not hmac.compare_digest(authorization, f"Bearer {self.token}".encode()):
+            return 401, {'error': 'unauthorized'}
+        if method == 'POST':
+            content_type = headers.get('Content-Type', '').split(';', 1)[0].strip().lower()
+            if content_type != 'application/json':
+                return 415, {'error': 'content_type_must_be_json'}
+        return None
+    
+    def describe(self, request_info: JoinRequest) -> dict:
+        data = request_info.to_dict()
+        data.pop('raw', None)
+        data['waited'] = max(0, int(self.plugin.clock.time()) - request_info.timestamp)
+        return data
+    
+    def pending_page(self, page: int = 1, size: int = 50, sort: str = 'age') -> dict:
+        """待处理申请分页，sort 支持 /列表 的全部排序方式及别名"""
+        sort_by = LIST_SORT_ALIASES.get(sort, sort)
+        if sort_by not in LIST_SORT_KEYS:
+            raise ValueError(f"未知的排序方式: {sort}")
+        size = min(max(1, size), 500)
+        index = self.plugin.store.sorted_indexes[sort_by]
+        total = len(index)
+        page = max(1, page)
+        items = [self.describe(self.plugin.store.get(key[-1])) for key in index.page((page - 1) * size, size)]
+        return {'page': page, 'size': size, 'total': total, 'sort': sort_by, 'items': items}
+    
+    def request_detail(self, target: str) -> Tuple[int, dict]:
+        """返回 (HTTP 状态码, 内容)"""
+        request_info, candidates = self.plugin._resolve_request(target)
+        if request_info is not None:
+            return 200, self.describe(request_info)
+        if len(candidates) > 1:
+            return 409, {'error': 'ambiguous', 'candidates': [self.describe(r) for r in candidates]}
+        return 404, {'error': 'not_found'}
+    
+    async def decide_many(self, approve: bool, targets: List[Any], operator: str = 'api', reason: str = '') -> dict:
+        """并发决定多个申请，返回每个目标的结果"""
+        if not approve and not reason:
+            reason = "申请被拒绝"
+        outcomes = await self.plugin.clock.gather(*(
+            self.plugin._decide(str(target), approve=approve, operator=operator, reason=reason)
+            for target in targets
+        ))
+        return {'results': [
+            {'target': str(target), 'outcome': outcome}
+            for target, (outcome, _) in zip(targets, outcomes)
+        ]}
+    
+    # ---- aiohttp 服务 ----
+    
+    async def start(self, host: str, port: int):
+        from aiohttp import web
+        
+        @web.middleware
+        async def auth(request, handler):
+            rejected = self.check_request(request.method, request.headers)
+            if rejected is not None:
+                status, body = rejected
+                return web.json_response(body, status=status)
+            return await handler(request)
+        
+        app = web.Application(middlewares=[auth])
+        app.router.add_get('/api/pending', self._handle_pending)
+        app.router.add_get('/api/requests/{target}', self._handle_detail)
+        app.router.add_post('/api/decisions', self._handle_decisions)
+        app.router.add_get('/api/events', self._handle_events)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+    
+    async def stop(self):
+        for queue in list(self._subscribers):
+            self._close(queue)
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+    
+    async def _handle_pending(self, request):
+        from aiohttp import web
+        try:
+            page = int(request.query.get('page', 1))
+            size = int(request.query.get('size', 50))
+            return web.json_response(self.pending_page(page, size, request.query.get('sort', 'age')))
+        except ValueError as e:
+            return web.json_response({'error': str(e)}, status=400)
+    
+    async def _handle_detail(self, request):
+        from aiohttp import web
+        status, body = self.request_detail(request.match_info['target'])
+        return web.json_response(body, status=status)
+    
+    async def _handle_decisions(self, request):
+        from aiohttp import web
+        try:
+            body = await request.json()
+        except ValueError:
+            return web.json_response({'error': 'invalid json'}, status=400)
+        action = body.get('action') if isinstance(body, dict) else None
+        targets = body.get('targets') if isinstance(body, dict) else None
+        if action not in ('approve', 'reject') or not isinstance(targets, list) or not targets:
+            return web.json_response({'error': 'action 须为 approve/reject，targets 须为非空列表'}, status=400)
+        result = await self.decide_many(
+            action == 'approve', targets, str(body.get('operator') or 'api'), str(body.get('reason') or '')
+        )
+        return web.json_response(result)
+    
+    async def _handle_events(self, request):
+        from aiohttp import web
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache'})
+        await response.prepare(request)
+        queue = self.subscribe()
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), self.KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    await response.write(b": keepalive\n\n")
+                    continue
+                if item is None:
+                    break
+                event_type, data = item
+                await response.write(
+                    f"event: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8')
+                )
+        except (ConnectionResetError, asyncio.CancelledError):
+            pass
+        finally:
+            self.unsubscribe(queue)
+        return response
 
 @register("astrbot_plugin_entry_review_fixed", "Developer", "入群申请审核插件（修复版），自动转发入群申请到指定群聊进行审核", "1.1.0")
 class EntryReviewPluginFixed(Star):
-    def __init__(self, context: Context):
+    def __init__(self, context: Context, config: Optional[dict] = None):
         super().__init__(context)
-        self.pending_requests: Dict[str, Dict[str, Any]] = {}
-        self.config = {}
+        # AstrBot 按 _conf_schema.json 提供的配置，与 config.json 合并为只读快照
+        self._astrbot_config = config
+        # 待处理申请，按 (群号, 用户ID) 存储并维护各类索引
+        self.store = RequestStore()
+        self.state_path = os.path.join(os.path.dirname(__file__), "pending_requests.json")
+        # 只保存通过指令修改过的配置项，其余配置项以 AstrBot 管理界面为准
+        self.config_path = os.path.join(os.path.dirname(__file__), "config.json")
+        # 是否继续接收新的申请，终止时关闭
+        self._accepting = True
+        # 必须执行完的后台任务（申请处理、对账、已触发的自动通过）
+        self._active_tasks: set = set()
+        # 仍在等待中的自动通过定时器，按 (群号, 用户ID) 索引
+        self._timer_tasks: Dict[Tuple[int, int], asyncio.Task] = {}
+        # 多实例协调：共享租约存储及本实例持有的资源 -> 本地记录的到期时间
+        self.lease_store: Optional[LeaseStore] = None
+        self._owned_leases: Dict[str, float] = {}
+        self._lease_task: Optional[asyncio.Task] = None
+        # 待处理存储的定期清理任务、淘汰统计及最近一小时的淘汰时间
+        self._sweep_task: Optional[asyncio.Task] = None
+        # 轮询群系统消息的任务及申请接收统计
+        self._poll_task: Optional[asyncio.Task] = None
+        self.intake_metrics: Dict[str, int] = {
+            'pushed': 0, 'polls': 0, 'poll_recovered': 0, 'gap_checks': 0, 'silence_checks': 0
+        }
+        # hybrid 模式下根据推送事件的序号和到达间隔决定何时对账
+        self.sequence_tracker = SequenceTracker()
+        self.store_metrics: Dict[str, int] = {'evicted_expired': 0, 'evicted_over_budget': 0}
+        self._eviction_times: deque = deque()
+        # 审核积压 SLO 巡检任务、各群的告警状态（群号 -> [告警级别, 上次告警时间]）及统计
+        self._slo_task: Optional[asyncio.Task] = None
+        self._slo_state: Dict[int, list] = {}
+        self.slo_metrics: Dict[str, int] = {'breaches': 0, 'escalations': 0}
+        # 出站消息限流器；已处理申请待撤回或汇总的审核卡片及清理任务
+        self._outbound_limiter: Optional[TokenBucket] = None
+        self._stale_cards: deque = deque()
+        self._card_cleanup_task: Optional[asyncio.Task] = None
+        self.card_metrics: Dict[str, int] = {'recalled': 0, 'recall_failed': 0, 'summarized': 0}
+        # 按 (群号, 申请人) 统计最近的申请次数，同一群超过 reapply_limit 的申请不再查询资料和发送卡片；
+        # 申请多个不同的群不计为反复申请，由合并卡片处理
+        self.reapply_counter = SlidingWindowCounter(3600)
+        self.reapply_metrics: Dict[str, int] = {'queued': 0, 'rejected': 0}
+        # 申请突增检测及锁定中的群：群号 -> {'count': 触发时窗口内申请数, 'held': 暂存的申请, 'rejected': 自动拒绝数}
+        self.raid_detector = RaidDetector()
+        self._lockdowns: Dict[int, dict] = {}
+        # 事件录制，record_path 非空时启用
+        self.recorder: Optional[EventRecorder] = None
+        # 本机 HTTP 审核接口，review_api_enabled 为 True 时启动
+        self.review_api: Optional[ReviewApi] = None
+        # 待发送的合并卡片任务，按申请人ID索引
+        self._aggregate_tasks: Dict[int, asyncio.Task] = {}
+        # 群成员缓存：群号 -> 成员ID集合，首次使用时加载，之后由入群/退群通知增量维护
+        self.member_sets: Dict[int, set] = {}
+        self._member_loads: Dict[int, asyncio.Task] = {}
+        self._member_notices: Dict[int, List[Tuple[str, int]]] = {}
+        # 审核员指派调度，assignment_strategy 为 none 时不指派
+        self.assigner = ReviewerAssigner([])
+        # 平台接口熔断器（按适配器区分）及调用统计
+        self._circuit_breakers: Dict[int, CircuitBreaker] = {}
+        self.api_metrics: Dict[str, int] = {
+            'throttled': 0,
+            'retries': 0,
+            'fast_failures': 0,
+            'ambiguous_failures': 0,
+            'circuit_open': 0,
+            'circuit_half_open': 0,
+            'circuit_closed': 0,
+        }
+        self.config = ConfigSnapshot.build()
+        # 定时器和时间戳使用的时钟，测试和基准中可替换为 VirtualClock
+        self.clock: SystemClock = SYSTEM_CLOCK
         self.debug_mode = False
         self.debug_log_events = True
         self.debug_log_api_calls = True
     
+    @property
+    def config(self) -> ConfigSnapshot:
+        return self._config
+    
+    @config.setter
+    def config(self, config: ConfigSnapshot):
+        """替换配置快照，并重建群消息预过滤使用的审核群号集合"""
+        self._config = config
+        review_group_ids = set()
+        target_group_id = config.target_group_id
+        if target_group_id:
+            # 平台给出的群号可能是 int 也可能是 str，两种形式都放入集合
+            review_group_ids.add(target_group_id)
+            if target_group_id.isdigit() and str(int(target_group_id)) == target_group_id:
+                review_group_ids.add(int(target_group_id))
+        self._review_group_ids = frozenset(review_group_ids)
+        # 无效的接收方式按 push 处理，同样接受原始事件备用方案
+        self._raw_request_fallback = config.intake_mode != 'poll'
+    
     async def initialize(self):
         """初始化插件"""
         self.load_config()
         self._init_debug_mode()
+        self.load_state()
+        self._init_assigner()
+        self._init_lease_store()
+        self._init_recorder()
+        await self._enforce_store_budget()
+        self._sweep_task = self._create_task(self._store_sweep_loop())
+        self._slo_task = self._create_task(self._slo_watchdog_loop())
+        if self.config.card_cleanup in ('recall', 'summary'):
+            self._card_cleanup_task = self._create_task(self._card_cleanup_loop())
+        
+        self.reapply_counter = SlidingWindowCounter(self.config.reapply_window)
+        self.raid_detector = RaidDetector(
+            self.config.raid_window,
+            self.config.raid_threshold,
+            self.config.raid_ratio,
+            self.config.raid_baseline_period
+        )
+        intake_mode = self._intake_mode()
+        self.sequence_tracker = SequenceTracker(
+            self.config.gap_seq_step,
+            self.config.gap_silence_factor,
+            self.config.gap_min_silence
+        )
+        if intake_mode in ('push', 'hybrid'):
+            # 注册事件监听器 - 使用正确的事件类型
+            try:
+                # 尝试注册请求事件监听器
+                platform_adapter = self._get_platform_adapter()
+                if platform_adapter and hasattr(platform_adapter, 'register_event_handler'):
+                    await platform_adapter.register_event_handler('request', self._handle_request_event)
+                    self._debug_log("已注册请求事件监听器", "INFO")
+                else:
+                    self._debug_log("平台适配器不支持事件监听器注册，将使用消息监听方式", "WARNING")
+            except Exception as e:
+                self._debug_log(f"注册事件监听器失败: {e}", "ERROR")
         
-        # 注册事件监听器 - 使用正确的事件类型
+        if self.config.member_check:
+            try:
+                platform_adapter = self._get_platform_adapter()
+                if platform_adapter and hasattr(platform_adapter, 'register_event_handler'):
+                    await platform_adapter.register_event_handler('notice', self._handle_notice_event)
+            except Exception as e:
+                self._debug_log(f"注册通知事件监听器失败: {e}", "ERROR")
+        
+        self._restore_auto_approve_timers()
+        
+        # 对账在后台进行，不阻塞正常的申请接收；轮询模式下首次轮询即完成对账
+        if intake_mode in ('poll', 'hybrid'):
+            self._poll_task = self._create_task(self._poll_loop(intake_mode))
+        elif self.config.startup_reconcile:
+            self._spawn(self._reconcile_system_messages())
+        self._debug_log(f"申请接收方式: {intake_mode}", "INFO")
+        
+        if self.config.review_api_enabled:
+            await self._start_review_api()
+        
+        logger.info("入群申请审核插件（修复版）已初始化")
+    
+    async def _start_review_api(self):
+        """启动本机 HTTP 审核接口，未设置 review_api_token 时生成一个并写入 config.json"""
+        host, port = self.config.review_api_host, self.config.review_api_port
+        if not self.config.review_api_token:
+            self.config = self.config.replace(review_api_token=secrets.token_urlsafe(24))
+            self.save_config('review_api_token')
+            logger.info("未设置 review_api_token，已生成访问令牌并写入 config.json")
+        review_api = ReviewApi(self, self.config.review_api_token, host)
         try:
-            # 尝试注册请求事件监听器
-            # 获取第一个可用的平台适配器
-            platform_adapter = None
-            if self.context.platform_manager and self.context.platform_manager.platform_insts:
-                platform_adapter = self.context.platform_manager.platform_insts[0]
-            if platform_adapter and hasattr(platform_adapter, 'register_event_handler'):
-                await platform_adapter.register_event_handler('request', self._handle_request_event)
-                self._debug_log("已注册请求事件监听器", "INFO")
-            else:
-                self._debug_log("平台适配器不支持事件监听器注册，将使用消息监听方式", "WARNING")
+            await review_api.start(host, port)
+        except ImportError:
+            logger.error("审核接口需要 aiohttp，请先安装: pip install aiohttp")
+            return
+        except OSError as e:
+            logger.error(f"审核接口启动失败: {e}")
+            return
+        self.review_api = review_api
+        self._debug_log(f"审核接口已启动: http://{host}:{port}/api/pending", "INFO")
+    
+    @property
+    def decision_log_path(self) -> str:
+        """审核记录文件，与待处理申请的状态文件放在同一目录"""
+        return os.path.join(os.path.dirname(self.state_path), "decision_log.jsonl")
+    
+    def _record_decision(self, request_info: JoinRequest):
+        """追加一条审核记录"""
+        if not self.config.decision_log:
+            return
+        try:
+            with open(self.decision_log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(request_record(request_info, 'decision'), ensure_ascii=False) + '\n')
         except Exception as e:
-            self._debug_log(f"注册事件监听器失败: {e}", "ERROR")
+            logger.error(f"写入审核记录失败: {e}")
+    
+    def iter_records(self, kind: str = 'all', pending: Optional[List[JoinRequest]] = None) -> Iterator[dict]:
+        """按需生成导出记录，kind 为 pending / decision / all
+
+        pending 为事先复制的待处理申请列表（只复制引用），在其他线程中导出时
+        避免存储变化导致迭代出错。
+        """
+        if kind in ('pending', 'all'):
+            for request_info in (pending if pending is not None else list(self.store)):
+                yield request_record(request_info)
+        if kind in ('decision', 'all'):
+            yield from iter_decision_log(self.decision_log_path)
+    
+    def export_to(self, path: str, kind: str = 'all', fmt: str = 'csv',
+                  pending: Optional[List[JoinRequest]] = None) -> int:
+        """流式导出到文件，返回写入的记录数"""
+        count = 0
         
-        logger.info("入群申请审核插件（修复版）已初始化")
+        def counted():
+            nonlocal count
+            for record in self.iter_records(kind, pending):
+                count += 1
+                yield record
+        
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            for chunk in iter_export_chunks(counted(), fmt):
+                f.write(chunk)
+        return count
     
-    def load_config(self):
-        """加载配置"""
+    def import_records(self, records: Iterable[dict]) -> Dict[str, int]:
+        """导入记录：待处理申请加入存储（已存在的不覆盖），审核记录追加到审核记录文件"""
+        pending, counts = self._import_decisions(records)
+        self._import_pending(pending, counts)
+        return counts
+    
+    def _import_decisions(self, records: Iterable[dict]) -> Tuple[List[dict], Dict[str, int]]:
+        """把审核记录追加到审核记录文件，返回待加入存储的待处理申请；不访问存储，可在后台线程中执行"""
+        counts = {'pending': 0, 'decision': 0, 'skipped': 0}
+        pending = []
+        log_file = None
         try:
-            config_path = os.path.join(os.path.dirname(__file__), "config.json")
-            if os.path.exists(config_path):
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    self.config = json.load(f)
+            for record in records:
+                kind = record.get('kind')
+                if kind == 'pending' and record.get('user_id') and record.get('group_id'):
+                    pending.append(record)
+                elif kind == 'decision':
+                    if log_file is None:
+                        log_file = open(self.decision_log_path, 'a', encoding='utf-8')
+                    log_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    counts['decision'] += 1
+                else:
+                    counts['skipped'] += 1
+        finally:
+            if log_file is not None:
+                log_file.close()
+        return pending, counts
+    
+    def _import_pending(self, records: List[dict], counts: Dict[str, int]):
+        """把导入的待处理申请加入存储
+
+        导入的申请来自另一个实例，其 flag 在本实例可能无效，因此标记为 held='import'，
+        不设置自动通过定时器，等待人工审核或由 pending_max_age 清理。
+        """
+        for record in records:
+            key = (record['group_id'], record['user_id'])
+            if key in self.store:
+                counts['skipped'] += 1
+                continue
+            request_info = JoinRequest(
+                record['user_id'], intern_group_id(record['group_id']),
+                nickname=record.get('nickname', ''),
+                comment=record.get('comment', ''),
+                flag=record.get('flag', ''),
+                timestamp=record.get('timestamp') or int(self.clock.time()),
+                risk_score=record.get('risk_score', 0)
+            )
+            request_info.held = 'import'
+            self.store.add(request_info)
+            self._publish('new', request_info)
+            counts['pending'] += 1
+        if counts['pending']:
+            self.save_state()
+    
+    @property
+    def exports_dir(self) -> str:
+        return os.path.join(os.path.dirname(self.state_path), "exports")
+    
+    async def _export_command(self, args: List[str]):
+        """/导出 [待处理|记录|全部] [csv|jsonl]，在后台线程中写入 exports 目录"""
+        kinds = {'待处理': 'pending', '记录': 'decision', '全部': 'all'}
+        kind, fmt = 'all', 'csv'
+        for arg in args:
+            if arg in kinds:
+                kind = kinds[arg]
+            elif arg.lower() in EXPORT_FORMATS:
+                fmt = arg.lower()
             else:
-                # 默认配置
-                self.config = {
-                    "source_group_id": "",
-                    "target_group_id": "",
-                    "reviewers": [],
-                    "auto_approve_timeout": 300,
-                    "debug_mode": True,
-                    "debug_log_events": True,
-                    "debug_log_api_calls": True,
-                    "notification_template": {
-                        "new_request": "🔔 新的入群申请\n\n👤 申请人: {nickname} ({user_id})\n🏠 申请群: {group_id}\n💬 申请理由: {comment}\n⏰ 申请时间: {timestamp}\n\n请使用以下指令进行审核:\n✅ /通过 {user_id}\n❌ /拒绝 {user_id} [理由]\n📋 /查看 {user_id}\n\n申请将在 {timeout} 秒后自动通过",
-                        "approved": "✅ 入群申请已通过\n\n👤 申请人: {nickname} ({user_id})\n🏠 申请群: {group_id}\n👨‍💼 操作员: {operator}\n⏰ 处理时间: {timestamp}",
-                        "rejected": "❌ 入群申请已拒绝\n\n👤 申请人: {nickname} ({user_id})\n🏠 申请群: {group_id}\n👨‍💼 操作员: {operator}\n📝 拒绝理由: {reason}\n⏰ 处理时间: {timestamp}",
-                        "auto_approved": "⏰ 入群申请已自动通过\n\n👤 申请人: {nickname} ({user_id})\n🏠 申请群: {group_id}\n⏰ 处理时间: {timestamp}\n\n原因: 超时自动通过"
-                    }
-                }
-                self.save_config()
+                return MessageEventResult().message("❌ 用法: /导出 [待处理|记录|全部] [csv|jsonl]")
+        os.makedirs(self.exports_dir, exist_ok=True)
+        path = os.path.join(self.exports_dir, f"entry_review_{kind}_{time.strftime('%Y%m%d_%H%M%S', time.localtime(self.clock.time()))}.{fmt}")
+        count = await asyncio.to_thread(self.export_to, path, kind, fmt, list(self.store))
+        return MessageEventResult().message(f"📤 已导出 {count} 条记录到 {path}")
+    
+    async def _import_command(self, args: List[str]):
+        """/导入 <文件名>，只读取 exports 目录中的文件，在后台线程中解析"""
+        if len(args) != 1:
+            return MessageEventResult().message("❌ 用法: /导入 <exports 目录中的文件名>")
+        name = os.path.basename(args[0])
+        fmt = os.path.splitext(name)[1].lstrip('.').lower()
+        path = os.path.join(self.exports_dir, name)
+        if fmt not in EXPORT_FORMATS or not os.path.isfile(path):
+            return MessageEventResult().message(f"❌ 找不到可导入的 csv/jsonl 文件: {name}")
+        pending, counts = await asyncio.to_thread(self._read_import, path, fmt)
+        self._import_pending(pending, counts)
+        return MessageEventResult().message(
+            f"📥 已导入待处理申请 {counts['pending']} 条、审核记录 {counts['decision']} 条，跳过 {counts['skipped']} 条"
+        )
+    
+    def _read_import(self, path: str, fmt: str) -> Tuple[List[dict], Dict[str, int]]:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            return self._import_decisions(iter_import_records(f, fmt))
+    
+    def _init_recorder(self):
+        """按 record_path 开始录制，相对路径相对于状态文件所在目录"""
+        if not self.config.record_path:
+            return
+        path = os.path.join(os.path.dirname(self.state_path), self.config.record_path)
+        try:
+            self.recorder = EventRecorder(path, self.config.to_dict(), self.clock)
+            self._debug_log(f"正在录制事件到 {path}", "INFO")
+        except OSError as e:
+            logger.error(f"打开录制文件失败: {e}")
+    
+    def _record(self, kind: str, payload: Any):
+        if self.recorder is not None:
+            self.recorder.record(kind, payload)
+    
+    def _record_command(self, event: AstrMessageEvent, message_text: str, reply_to: Optional[JoinRequest] = None):
+        """录制审核指令；回复卡片的指令记录所回复的申请，回放时卡片的 message_id 会不同"""
+        if self.recorder is None:
+            return
+        payload = {'text': message_text, 'sender': str(event.message_obj.sender.user_id)}
+        if reply_to is not None:
+            payload['reply_to'] = [reply_to.group_id, reply_to.user_id]
+        self.recorder.record('command', payload)
+    
+    def _publish(self, event_type: str, request_info: JoinRequest):
+        """向审核接口的 SSE 订阅者推送申请事件"""
+        if self.review_api is not None:
+            self.review_api.publish(event_type, request_info)
+    
+    def load_config(self):
+        """加载配置
+
+        合并 AstrBot 按 _conf_schema.json 提供的配置和 config.json（后者优先），
+        校验后生成只读快照并整体替换 self.config，处理中的事件继续使用旧快照。
+        config.json 不存在时不会自动创建，其中只有手动填写或通过指令修改的配置项。
+        """
+        try:
+            file_config = None
+            if os.path.exists(self.config_path):
+                with open(self.config_path, 'r', encoding='utf-8') as f:
+                    file_config = json.load(f)
+            snapshot = ConfigSnapshot.build(self._astrbot_config, file_config, schema=load_config_schema())
+            for warning in snapshot.warnings:
+                logger.warning(f"配置项无效，已使用默认值: {warning}")
+            self.config = snapshot
         except Exception as e:
             logger.error(f"加载配置失败: {e}")
-            self.config = {}
+            self.config = ConfigSnapshot.build()
+    
+    async def reload_config(self):
+        """重新加载配置并应用到运行中的组件
+
+        调试日志、审核员与指派、出站限流、卡片清理、事件录制和审核接口立即生效；
+        接收方式、突增检测、反复申请统计窗口和序号跟踪的参数在插件重启后生效。
+        """
+        previous = self.config
+        self.load_config()
+        self._init_debug_mode()
+        strategy = self.config.assignment_strategy
+        self.assigner.strategy = strategy if strategy in ReviewerAssigner.STRATEGIES else 'least_outstanding'
+        self.assigner.set_reviewers(self.config.reviewers)
+        self._outbound_limiter = None
+        
+        # 卡片清理循环每轮读取 card_cleanup，这里只需按是否启用启停
+        if self.config.card_cleanup in ('recall', 'summary'):
+            if self._card_cleanup_task is None and self._accepting:
+                self._card_cleanup_task = self._create_task(self._card_cleanup_loop())
+        elif self._card_cleanup_task is not None:
+            self._card_cleanup_task.cancel()
+            self._card_cleanup_task = None
+        
+        if self.config.record_path != previous.record_path:
+            if self.recorder is not None:
+                self.recorder.close()
+                self.recorder = None
+            self._init_recorder()
+        
+        api_keys = ('review_api_enabled', 'review_api_host', 'review_api_port', 'review_api_token')
+        if any(getattr(self.config, key) != getattr(previous, key) for key in api_keys):
+            if self.review_api is not None:
+                await self.review_api.stop()
+                self.review_api = None
+            if self.config.review_api_enabled and self._accepting:
+                await self._start_review_api()
+    
+    def _init_debug_mode(self):
+        """初始化调试模式"""
+        self.debug_mode = self.config.debug_mode
+        self.debug_log_events = self.config.debug_log_events
+        self.debug_log_api_calls = self.config.debug_log_api_calls
+        
+        if self.debug_mode:
+            logger.info("调试模式已启用")
+            logger.info(f"事件日志: {self.debug_log_events}")
+            logger.info(f"API调用日志: {self.debug_log_api_calls}")
+    
+    def _debug_log(self, message: str, level: str = "DEBUG"):
+        """调试日志"""
+        if self.debug_mode:
+            if level == "INFO":
+                logger.info(f"[入群审核] {message}")
+            elif level == "WARNING":
+                logger.warning(f"[入群审核] {message}")
+            elif level == "ERROR":
+                logger.error(f"[入群审核] {message}")
+            else:
+                logger.debug(f"[入群审核] {message}")
+    
+    def _debug_log_event(self, event_data: dict, action: str):
+        """调试事件日志"""
+        if self.debug_mode and self.debug_log_events:
+            logger.debug(f"[入群审核-事件] {action}: {event_data}")
+    
+    def _debug_log_api_call(self, api_name: str, params: dict, result: Any = None, error: Exception = None):
+        """调试API调用日志"""
+        if self.debug_mode and self.debug_log_api_calls:
+            if error:
+                logger.error(f"[入群审核-API] {api_name} 失败: {error}, 参数: {params}")
+            else:
+                logger.debug(f"[入群审核-API] {api_name} 成功: 参数={params}, 结果={result}")
+    
+    def _get_platform_adapter(self):
+        """获取第一个可用的平台适配器"""
+        if self.context.platform_manager and self.context.platform_manager.platform_insts:
+            return self.context.platform_manager.platform_insts[0]
+        return None
+    
+    def _get_outbound_limiter(self) -> TokenBucket:
+        """获取出站消息限流器，首次使用时按配置创建"""
+        if self._outbound_limiter is None:
+            self._outbound_limiter = TokenBucket(
+                self.config.outbound_rate,
+                self.config.outbound_burst,
+                self.clock
+            )
+        return self._outbound_limiter
+    
+    def _get_circuit_breaker(self, platform_adapter) -> CircuitBreaker:
+        """获取适配器对应的熔断器"""
+        breaker = self._circuit_breakers.get(id(platform_adapter))
+        if breaker is None:
+            def on_transition(previous: str, state: str):
+                self.api_metrics[f'circuit_{state}'] += 1
+                level = "INFO" if state == CircuitBreaker.CLOSED else "WARNING"
+                self._debug_log(f"平台接口熔断器状态变化: {previous} -> {state}", level)
+            breaker = CircuitBreaker(
+                self.config.circuit_failure_threshold,
+                self.config.circuit_reset_timeout,
+                on_transition,
+                self.clock
+            )
+            self._circuit_breakers[id(platform_adapter)] = breaker
+        return breaker
+    
+    @staticmethod
+    def _is_transient_error(error: Exception) -> bool:
+        """判断是否为连接层面的临时故障；平台已返回的业务错误不重试"""
+        if hasattr(error, 'retcode'):
+            return False
+        return (isinstance(error, (ConnectionError, OSError, asyncio.TimeoutError))
+                or type(error).__name__ in TRANSIENT_ERROR_NAMES)
+    
+    @staticmethod
+    def _is_unsent_error(error: Exception) -> bool:
+        """判断请求是否确定没有到达平台（如连接被拒绝），此时重试不会重复执行"""
+        return isinstance(error, ConnectionRefusedError) or type(error).__name__ in UNSENT_ERROR_NAMES
+    
+    async def _call_platform_api(self, api_name: str, **params) -> Any:
+        """带退避重试和熔断保护的平台接口调用"""
+        platform_adapter = self._get_platform_adapter()
+        if platform_adapter is None:
+            raise RuntimeError("没有可用的平台适配器")
+        breaker = self._get_circuit_breaker(platform_adapter)
+        policy = {
+            **DEFAULT_RETRY_POLICY,
+            **RETRY_POLICIES.get(api_name, {}),
+            **self.config.retry_policies.get(api_name, {})
+        }
+        
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                self.api_metrics['fast_failures'] += 1
+                raise CircuitOpenError(f"{api_name} 调用被熔断，平台暂不可用")
+            try:
+                if api_name in OUTBOUND_APIS and await self._get_outbound_limiter().acquire() > 0:
+                    self.api_metrics['throttled'] += 1
+                result = await getattr(platform_adapter, api_name)(**params)
+            except asyncio.CancelledError:
+                # 半开状态下的探测被取消时必须释放名额，否则熔断器会一直拒绝调用
+                breaker.release_probe()
+                raise
+            except Exception as e:
+                if not self._is_transient_error(e):
+                    # 平台能正常响应，说明连接本身是健康的
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                if api_name in NON_IDEMPOTENT_APIS and not self._is_unsent_error(e):
+                    # 结果不确定时不重试，由调用方按失败处理
+                    self.api_metrics['ambiguous_failures'] += 1
+                    self._debug_log(f"{api_name} 调用结果不确定，为避免重复发送不再重试: {e}", "WARNING")
+                    raise
+                attempt += 1
+                if attempt >= policy['max_attempts']:
+                    raise
+                # 带完全抖动的指数退避，避免大量待处理决定同时重试
+                delay = random.uniform(0, min(policy['max_delay'], policy['base_delay'] * 2 ** (attempt - 1)))
+                self.api_metrics['retries'] += 1
+                self._debug_log(f"{api_name} 第 {attempt} 次调用失败: {e}，{delay:.2f} 秒后重试", "WARNING")
+                await self.clock.sleep(delay)
+            else:
+                breaker.record_success()
+                return result
+    
+    def save_config(self, *keys):
+        """把通过指令修改的配置项写入 config.json
+
+        只写入指定的配置项并保留文件中已有的其他项，
+        未写入的配置项继续以 AstrBot 管理界面的设置为准。
+        """
+        try:
+            file_config = {}
+            if os.path.exists(self.config_path):
+                with open(self.config_path, 'r', encoding='utf-8') as f:
+                    file_config = json.load(f)
+            current = self.config.to_dict()
+            for key in keys:
+                file_config[key] = current[key]
+            with open(self.config_path, 'w', encoding='utf-8') as f:
+                json.dump(file_config, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            logger.error(f"保存配置失败: {e}")
+    
+    def load_state(self):
+        """加载持久化的待处理申请和审核卡片索引"""
+        try:
+            if not os.path.exists(self.state_path):
+                return
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.store.clear()
+            self.store.message_index_max_size = self.config.message_index_max_size
+            saved_requests = state.get('pending_requests', [])
+            # 兼容旧格式：{用户ID: 申请}
+            if isinstance(saved_requests, dict):
+                saved_requests = list(saved_requests.values())
+            for data in saved_requests:
+                request_info = JoinRequest.from_dict(data)
+                # 决定过程中被中断的申请无法确认结果，恢复为待处理，由对账和重复审核保护兜底
+                if request_info.status == 'deciding':
+                    request_info.status = 'pending'
+                self.store.add(request_info)
+            for entry in state.get('message_index', []):
+                message_id = normalize_id(entry[0])
+                if len(entry) >= 3:
+                    request_info = self.store.get((int(entry[1]), int(entry[2])))
+                else:
+                    # 兼容旧格式：[message_id, 用户ID]
+                    candidates = self.store.by_user(int(entry[1]))
+                    request_info = candidates[0] if len(candidates) == 1 else None
+                if request_info is not None:
+                    self.store.index_message(message_id, request_info)
+            self._debug_log(f"已恢复 {len(self.store)} 条待处理申请, {len(self.store.message_index_items())} 条卡片索引")
+        except Exception as e:
+            logger.error(f"加载申请状态失败: {e}")
+    
+    def save_state(self):
+        """持久化待处理申请和审核卡片索引"""
+        try:
+            state = {
+                'pending_requests': [request_info.to_dict() for request_info in self.store],
+                # 以列表保存以保留插入顺序，恢复后淘汰顺序不变
+                'message_index': [
+                    [message_id, group_id, user_id] for message_id, (group_id, user_id) in self.store.message_index_items()
+                ]
+            }
+            with open(self.state_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False)
+        except Exception as e:
+            logger.error(f"保存申请状态失败: {e}")
+    
+    def _init_assigner(self):
+        """根据配置创建指派调度，并恢复已持久化的指派"""
+        strategy = self.config.assignment_strategy
+        self.assigner = ReviewerAssigner(
+            self.config.reviewers,
+            strategy if strategy in ReviewerAssigner.STRATEGIES else 'least_outstanding'
+        )
+        assigned = sorted((r for r in self.store if r.assignee is not None), key=lambda r: r.assigned_at)
+        for request_info in assigned:
+            self.assigner.restore(request_info.key, request_info.assignee, request_info.assigned_at)
+    
+    def _assignment_enabled(self) -> bool:
+        return self.config.assignment_strategy in ReviewerAssigner.STRATEGIES
+    
+    def _assign_reviewer(self, request_info: JoinRequest, exclude: Optional[str] = None) -> Optional[str]:
+        """为申请指派审核员并记录在申请上"""
+        now = int(self.clock.time())
+        reviewer = self.assigner.assign(request_info.key, now, exclude=exclude)
+        if reviewer is not None:
+            request_info.assignee = reviewer
+            request_info.assigned_at = now
+        return reviewer
+    
+    def _release_assignment(self, request_info: JoinRequest):
+        if request_info.assignee is not None:
+            self.assigner.release(request_info.key)
+    
+    async def _reassign_timed_out(self, now: Optional[int] = None) -> int:
+        """将超过 assignment_timeout 仍未处理的申请改派给其他审核员"""
+        if not self._assignment_enabled():
+            return 0
+        if now is None:
+            now = int(self.clock.time())
+        timeout = self.config.assignment_timeout
+        if timeout <= 0:
+            return 0
+        target_group_id = self.config.target_group_id
+        reassigned = 0
+        for key, previous in self.assigner.expired(now, timeout):
+            request_info = self.store.get(key)
+            if request_info is None:
+                self.assigner.release(key)
+                continue
+            # 暂存的申请（锁定期间、反复申请、导入）不提醒审核员
+            if request_info.status != 'pending' or request_info.held is not None:
+                continue
+            reviewer = self.assigner.assign(key, now, exclude=previous)
+            if reviewer is None:
+                # 没有其他审核员可改派，重新计时避免每次巡检都命中
+                reviewer = self.assigner.assign(key, now)
+            if reviewer is None:
+                self.assigner.release(key)
+            request_info.assignee = reviewer
+            request_info.assigned_at = now
+            if reviewer is None or reviewer == previous:
+                continue
+            reassigned += 1
+            self._debug_log(f"申请 {request_info} 超时未处理，由 {previous} 改派给 {reviewer}")
+            if target_group_id:
+                await self.send_message_to_group(target_group_id,
+                    f"⏰ {request_info.nickname} ({request_info.user_id}) 的申请 {timeout // 60} 分钟内未处理，"
+                    f"已改派给 [CQ:at,qq={reviewer}]"
+                )
+        if reassigned:
+            self.save_state()
+        return reassigned
+    
+    def _restore_auto_approve_timers(self):
+        """为恢复的待处理申请重新启动自动通过定时器"""
+        timeout = self.config.auto_approve_timeout
+        if timeout <= 0:
+            return
+        now = int(self.clock.time())
+        for request_info in self.store:
+            # 暂存的申请（锁定期间、反复申请、导入等）只能人工处理
+            if request_info.status != 'pending' or request_info.held is not None:
+                continue
+            remaining = max(0, request_info.timestamp + timeout - now)
+            self._schedule_auto_approve(request_info, delay=remaining)
+    
+    def _init_lease_store(self):
+        """配置了共享存储路径时启用多实例租约协调"""
+        lease_store_path = self.config.lease_store_path
+        if not lease_store_path:
+            return
+        try:
+            instance_id = self.config.instance_id or f"{socket.gethostname()}-{os.getpid()}"
+            self.lease_store = LeaseStore(lease_store_path, instance_id, self.config.lease_ttl)
+            self._lease_task = self._create_task(self._renew_leases_loop())
+            self._debug_log(f"已启用多实例协调: 实例 {instance_id}, 存储 {lease_store_path}", "INFO")
+        except Exception as e:
+            self.lease_store = None
+            logger.error(f"初始化多实例协调失败，按单实例运行: {e}")
+    
+    async def _hold_lease(self, resource: str) -> bool:
+        """判断本实例是否持有资源的租约，未持有时尝试获取"""
+        if self.lease_store is None:
+            return True
+        now = self.clock.time()
+        # 本地缓存的租约在剩余时间过半前直接使用，避免每个事件都访问存储
+        if self._owned_leases.get(resource, 0) - now > self.lease_store.ttl / 2:
+            return True
+        try:
+            acquired, previous_owner = await asyncio.to_thread(self.lease_store.try_acquire, resource)
+        except Exception as e:
+            self._debug_log(f"获取租约 {resource} 失败: {e}", "ERROR")
+            return False
+        if not acquired:
+            self._owned_leases.pop(resource, None)
+            return False
+        self._owned_leases[resource] = now + self.lease_store.ttl
+        if previous_owner and previous_owner != self.lease_store.owner and not resource.startswith('review:'):
+            # 接管其他实例的源群时，补录其离线期间可能遗漏的申请
+            self._debug_log(f"已从实例 {previous_owner} 接管 {resource}", "INFO")
+            self._spawn(self._reconcile_system_messages())
+        return True
+    
+    async def _renew_leases_loop(self):
+        """定期续约本实例持有的租约并清理过期的审核记录"""
+        interval = max(1, self.lease_store.ttl / 3)
+        while True:
+            await self.clock.sleep(interval)
+            for resource in list(self._owned_leases):
+                try:
+                    acquired, _ = await asyncio.to_thread(self.lease_store.try_acquire, resource)
+                except Exception as e:
+                    self._debug_log(f"续约 {resource} 失败: {e}", "WARNING")
+                    continue
+                if acquired:
+                    self._owned_leases[resource] = self.clock.time() + self.lease_store.ttl
+                else:
+                    self._owned_leases.pop(resource, None)
+                    self._debug_log(f"租约 {resource} 已被其他实例接管", "WARNING")
+            try:
+                await asyncio.to_thread(self.lease_store.prune_decisions, 7 * 86400)
+            except Exception as e:
+                self._debug_log(f"清理审核记录失败: {e}", "WARNING")
+    
+    @staticmethod
+    def _decision_key(request_info: JoinRequest) -> str:
+        return f"{request_info.group_id}:{request_info.user_id}:{request_info.flag}"
+    
+    async def _claim_decision(self, request_info: JoinRequest) -> bool:
+        """在共享存储中登记审核决定，保证多实例下每个申请只处理一次"""
+        if self.lease_store is None:
+            return True
+        return await asyncio.to_thread(self.lease_store.claim_decision, self._decision_key(request_info))
+    
+    async def _release_decision(self, request_info: JoinRequest):
+        if self.lease_store is not None:
+            await asyncio.to_thread(self.lease_store.release_decision, self._decision_key(request_info))
+    
+    async def _request_not_found(self, user_id: str, group_id: Optional[int] = None):
+        """未找到申请时的提示
+
+        多实例下申请可能登记在持有该源群租约的其他实例中，只有同时持有审核群
+        租约和该源群租约的实例才回复；无法确定源群时，其他实例持有任一源群
+        租约就不回复。
+        """
+        if self.lease_store is None:
+            return MessageEventResult().message(f"❌ 未找到用户 {user_id} 的申请")
+        if not await self._hold_lease(f"review:{self.config.target_group_id}"):
+            return None
+        if group_id is None:
+            token = str(user_id).replace('：', ':')
+            if ':' in token:
+                group_id = self._to_user_id(token.partition(':')[2])
+            elif self.config.source_group_id:
+                group_id = self._to_user_id(self.config.source_group_id)
+        if group_id is not None:
+            if not await self._hold_lease(f"group:{group_id}"):
+                return None
+        else:
+            try:
+                if await asyncio.to_thread(self.lease_store.held_by_others, 'group:'):
+                    return None
+            except Exception as e:
+                self._debug_log(f"查询源群租约失败: {e}", "ERROR")
+                return None
+        return MessageEventResult().message(f"❌ 未找到用户 {user_id} 的申请")
+    
+    def _create_task(self, coro) -> asyncio.Task:
+        """创建任务并登记到时钟，使用 VirtualClock 时 settle() 会等它静止"""
+        return self.clock.watch(asyncio.create_task(coro))
+    
+    def _spawn(self, coro) -> asyncio.Task:
+        """启动需要在终止前完成的后台任务"""
+        task = self._create_task(coro)
+        self._active_tasks.add(task)
+        task.add_done_callback(self._active_tasks.discard)
+        return task
     
-    def _init_debug_mode(self):
-        """初始化调试模式"""
-        self.debug_mode = self.config.get("debug_mode", True)
-        self.debug_log_events = self.config.get("debug_log_events", True)
-        self.debug_log_api_calls = self.config.get("debug_log_api_calls", True)
-        
-        if self.debug_mode:
-            logger.info("调试模式已启用")
-            logger.info(f"事件日志: {self.debug_log_events}")
-            logger.info(f"API调用日志: {self.debug_log_api_calls}")
+    def _schedule_auto_approve(self, request_info: JoinRequest, delay: Optional[float] = None):
+        """启动自动通过定时器，同一申请只保留最新的定时器"""
+        previous = self._timer_tasks.pop(request_info.key, None)
+        if previous is not None:
+            previous.cancel()
+        self._timer_tasks[request_info.key] = self._create_task(
+            self._auto_approve_after_timeout(request_info, delay=delay)
+        )
     
-    def _debug_log(self, message: str, level: str = "DEBUG"):
-        """调试日志"""
-        if self.debug_mode:
-            if level == "INFO":
-                logger.info(f"[入群审核] {message}")
-            elif level == "WARNING":
-                logger.warning(f"[入群审核] {message}")
-            elif level == "ERROR":
-                logger.error(f"[入群审核] {message}")
-            else:
-                logger.debug(f"[入群审核] {message}")
+    @staticmethod
+    def _compute_risk_score(comment: str, user_info: Optional[dict]) -> int:
+        """根据申请信息粗略估计风险分（0-100，越高越可疑）"""
+        score = 0
+        if not comment or not comment.strip():
+            score += 30
+        if not user_info:
+            score += 20
+            return score
+        level = user_info.get('level', user_info.get('qqLevel'))
+        if isinstance(level, int) and level < 10:
+            score += 30
+        login_days = user_info.get('login_days')
+        if isinstance(login_days, int) and login_days < 30:
+            score += 20
+        return min(score, 100)
     
-    def _debug_log_event(self, event_data: dict, action: str):
-        """调试事件日志"""
-        if self.debug_mode and self.debug_log_events:
-            logger.debug(f"[入群审核-事件] {action}: {event_data}")
+    def _index_message(self, message_id: Any, request_info: JoinRequest):
+        """记录审核卡片与申请的对应关系，超出上限时淘汰最早的卡片"""
+        if message_id is None:
+            return
+        self.store.message_index_max_size = self.config.message_index_max_size
+        for evicted_id, evicted_key in self.store.index_message(message_id, request_info):
+            self._debug_log(f"卡片索引已满，淘汰 {evicted_id} -> {evicted_key}")
     
-    def _debug_log_api_call(self, api_name: str, params: dict, result: Any = None, error: Exception = None):
-        """调试API调用日志"""
-        if self.debug_mode and self.debug_log_api_calls:
-            if error:
-                logger.error(f"[入群审核-API] {api_name} 失败: {error}, 参数: {params}")
-            else:
-                logger.debug(f"[入群审核-API] {api_name} 成功: 参数={params}, 结果={result}")
+    def _resolve_request(self, target: Any) -> Tuple[Optional[JoinRequest], List[JoinRequest]]:
+        """根据指令参数查找申请，返回 (申请, 候选申请)
+
+        参数可以是 JoinRequest、「QQ号:群号」或 QQ号。只给 QQ号 且该用户同时
+        申请了多个群时无法确定目标，返回 (None, 全部候选)。
+        """
+        if isinstance(target, JoinRequest):
+            current = self.store.get(target.key)
+            return (current, [current]) if current is target else (None, [])
+        token = str(target).strip()
+        if ':' in token or '：' in token:
+            user_part, _, group_part = token.replace('：', ':').partition(':')
+            user_id, group_id = self._to_user_id(user_part), self._to_user_id(group_part)
+            if user_id is None or group_id is None:
+                return None, []
+            request_info = self.store.get((group_id, user_id))
+            return request_info, [request_info] if request_info else []
+        user_id = self._to_user_id(token)
+        if user_id is None:
+            return None, []
+        candidates = self.store.by_user(user_id)
+        return (candidates[0] if len(candidates) == 1 else None), candidates
     
-    def save_config(self):
-        """保存配置"""
-        try:
-            config_path = os.path.join(os.path.dirname(__file__), "config.json")
-            with open(config_path, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"保存配置失败: {e}")
+    @staticmethod
+    def _extract_message_id(result: Any) -> Any:
+        """从 send_group_msg 的返回值中提取 message_id"""
+        if isinstance(result, dict):
+            if 'message_id' in result:
+                return normalize_id(result['message_id'])
+            data = result.get('data')
+            if isinstance(data, dict) and 'message_id' in data:
+                return normalize_id(data['message_id'])
+        message_id = getattr(result, 'message_id', None)
+        return normalize_id(message_id) if message_id is not None else None
+    
+    @staticmethod
+    def _get_reply_message_id(event: AstrMessageEvent) -> Any:
+        """获取消息中引用回复的 message_id"""
+        components = getattr(event.message_obj, 'message', None)
+        if not isinstance(components, list):
+            return None
+        for comp in components:
+            comp_type = getattr(comp, 'type', None)
+            type_name = getattr(comp_type, 'value', comp_type)
+            if type(comp).__name__ == 'Reply' or type_name in ('Reply', 'reply'):
+                reply_id = getattr(comp, 'id', None)
+                if reply_id is not None:
+                    return normalize_id(reply_id)
+        return None
     
     async def _handle_request_event(self, event_data: dict):
         """处理请求事件（新的事件监听器）"""
         self._debug_log_event(event_data, "收到请求事件")
+        self._record('request', event_data)
         
         try:
             if event_data.get('request_type') == 'group' and event_data.get('sub_type') == 'add':
-                await self._process_group_request_new(event_data)
+                self._enqueue_request(event_data)
         except Exception as e:
             self._debug_log(f"处理请求事件失败: {e}", "ERROR")
     
-    async def _process_group_request_new(self, event_data: dict):
-        """处理新的入群申请事件"""
+    async def _handle_notice_event(self, event_data: dict):
+        """处理入群/退群通知，增量维护群成员缓存"""
+        try:
+            notice_type = event_data.get('notice_type')
+            if notice_type not in ('group_increase', 'group_decrease'):
+                return
+            group_id = int(event_data.get('group_id', 0))
+            user_id = int(event_data.get('user_id', 0))
+            if notice_type == 'group_decrease' and event_data.get('sub_type') == 'kick_me':
+                # 机器人被移出群后该群的缓存不再可靠
+                self.member_sets.pop(group_id, None)
+                return
+            self._apply_member_notice(group_id, notice_type, user_id)
+            
+            # 已经入群（例如管理员在客户端直接通过）的申请无需继续审核
+            if notice_type == 'group_increase':
+                request_info = self.store.get((group_id, user_id))
+                if request_info is not None and request_info.status == 'pending':
+                    await self._cleanup_request(request_info)
+                    self._debug_log(f"用户 {user_id} 已加入群 {group_id}，移除其待处理申请")
+        except Exception as e:
+            self._debug_log(f"处理通知事件失败: {e}", "ERROR")
+    
+    def _apply_member_notice(self, group_id: int, notice_type: str, user_id: int):
+        if group_id in self._member_loads:
+            # 加载期间收到的通知在加载完成后按顺序补上
+            self._member_notices.setdefault(group_id, []).append((notice_type, user_id))
+            return
+        members = self.member_sets.get(group_id)
+        if members is None:
+            return
+        if notice_type == 'group_increase':
+            members.add(user_id)
+        else:
+            members.discard(user_id)
+    
+    async def _load_members(self, group_id: int) -> Optional[set]:
+        """加载群成员列表，同一群的并发加载只请求一次，失败时返回 None 以便下次重试"""
+        members = self.member_sets.get(group_id)
+        if members is not None:
+            return members
+        task = self._member_loads.get(group_id)
+        if task is None:
+            task = self._create_task(self._call_platform_api('get_group_member_list', group_id=group_id))
+            self._member_loads[group_id] = task
+        try:
+            result = await self.clock.shield(task)
+        except Exception as e:
+            self._member_notices.pop(group_id, None)
+            self._debug_log(f"加载群 {group_id} 成员列表失败: {e}", "WARNING")
+            return None
+        finally:
+            if self._member_loads.get(group_id) is task and task.done():
+                del self._member_loads[group_id]
+        if group_id not in self.member_sets:
+            if isinstance(result, dict):
+                result = result.get('data') or []
+            self.member_sets[group_id] = {int(m['user_id']) for m in result or [] if m.get('user_id')}
+            for notice_type, user_id in self._member_notices.pop(group_id, []):
+                self._apply_member_notice(group_id, notice_type, user_id)
+            self._debug_log(f"已缓存群 {group_id} 的 {len(self.member_sets[group_id])} 名成员")
+        return self.member_sets[group_id]
+    
+    async def _find_membership(self, user_id: int, group_id: int) -> Optional[int]:
+        """返回申请人已加入的群（申请的群或关联的姐妹群），都不在时返回 None"""
+        if not self.config.member_check:
+            return None
+        platform_adapter = self._get_platform_adapter()
+        if platform_adapter is None or not hasattr(platform_adapter, 'get_group_member_list'):
+            return None
+        groups = [group_id] + [int(g) for g in self.config.member_check_groups if int(g) != group_id]
+        for candidate in groups:
+            members = await self._load_members(candidate)
+            if members is not None and user_id in members:
+                return candidate
+        return None
+    
+    def _enqueue_request(self, event_data: dict):
+        """接收推送的入群申请并在后台处理，终止后不再接收"""
+        if not self._accepting:
+            self._debug_log(f"插件正在终止，忽略入群申请: {event_data.get('user_id')}", "WARNING")
+            return
+        self.intake_metrics['pushed'] += 1
+        try:
+            group_id = int(event_data.get('group_id', 0))
+            seq = SequenceTracker.parse_sequence(event_data)
+            if self.sequence_tracker.observe(group_id, seq, self.clock.monotonic()):
+                self._debug_log(f"群 {group_id} 的推送序号出现缺口 (seq={seq})，将对账补录", "WARNING")
+        except (TypeError, ValueError):
+            pass
+        self._spawn(self._process_group_request_new(event_data))
+    
+    async def _process_group_request_new(self, event_data: dict, live: bool = True):
+        """处理新的入群申请事件
+
+        live 为 False 表示对账或轮询补录的申请，它们的到达时间未知，
+        不计入突增检测和反复申请统计。
+        """
         try:
-            user_id = str(event_data.get('user_id', ''))
-            group_id = str(event_data.get('group_id', ''))
+            user_id = int(event_data.get('user_id', 0))
+            group_id = intern_group_id(event_data.get('group_id', 0))
             comment = event_data.get('comment', '')
             flag = event_data.get('flag', '')
             
             self._debug_log(f"处理入群申请: user_id={user_id}, group_id={group_id}, flag={flag}")
             
             # 检查是否是需要审核的群
-            source_group_id = self.config.get('source_group_id', '')
-            if source_group_id and group_id != source_group_id:
+            source_group_id = self.config.source_group_id
+            if source_group_id and str(group_id) != source_group_id:
                 self._debug_log(f"群 {group_id} 不在审核范围内，跳过")
                 return
             
+            # 多实例部署时只由持有该群租约的实例处理
+            if not await self._hold_lease(f"group:{group_id}"):
+                self._debug_log(f"群 {group_id} 由其他实例负责，跳过")
+                return
+            
+            # 短时间内反复申请的用户不再查询资料、发送卡片和启动定时器
+            if live and await self._suppress_reapplication(user_id, group_id, comment, flag, event_data):
+                return
+            
+            if live and self.raid_detector.observe(group_id, self.clock.monotonic()):
+                await self._enter_lockdown(group_id)
+            
+            member_of = await self._find_membership(user_id, group_id)
+            
             # 获取用户信息
-            # 获取第一个可用的平台适配器
-            platform_adapter = None
-            if self.context.platform_manager and self.context.platform_manager.platform_insts:
-                platform_adapter = self.context.platform_manager.platform_insts[0]
             user_info = None
             try:
-                user_info = await platform_adapter.get_stranger_info(user_id=int(user_id))
+                user_info = await self._call_platform_api('get_stranger_info', user_id=user_id)
             except Exception as e:
                 self._debug_log(f"获取用户信息失败: {e}", "WARNING")
             
-            nickname = user_info.get('nickname', f'用户{user_id}') if user_info else f'用户{user_id}'
-            
             # 存储申请信息
-            request_info = {
-                'user_id': user_id,
-                'group_id': group_id,
-                'nickname': nickname,
-                'comment': comment,
-                'flag': flag,
-                'timestamp': int(time.time()),
-                'status': 'pending'
-            }
+            request_info = JoinRequest(
+                user_id, group_id,
+                nickname=user_info.get('nickname', '') if user_info else '',
+                comment=comment,
+                flag=flag,
+                timestamp=int(self.clock.time()),
+                risk_score=self._compute_risk_score(comment, user_info),
+                raw=event_data if self.config.keep_raw_payload else None
+            )
+            nickname = request_info.nickname
             
-            self.pending_requests[user_id] = request_info
+            self.store.add(request_info)
             self._debug_log(f"已存储申请信息: {request_info}")
+            await self._enforce_store_budget()
+            if self.store.get(request_info.key) is not request_info:
+                return
+            self.save_state()
+            self._publish('new', request_info)
+            
+            # 已是本群或关联群成员的申请人按配置直接通过，不再发送审核卡片
+            if member_of is not None and self.config.member_action == 'approve':
+                outcome, _ = await self._decide(
+                    request_info, approve=True, operator='system', reason=f"已是群{member_of}成员", auto=True
+                )
+                self._debug_log(f"用户 {user_id} 已是群 {member_of} 成员，自动通过: {outcome}", "INFO")
+                return
+            
+            # 锁定期间暂存申请，不逐条发送卡片也不启动自动通过，解除时统一发送摘要
+            lockdown = self._lockdowns.get(group_id)
+            if lockdown is not None:
+                if self.config.raid_reject_new_accounts and self._is_new_account(user_info):
+                    outcome, _ = await self._decide(
+                        request_info, approve=False, operator='system',
+                        reason=self.config.raid_reject_reason
+                    )
+                    if outcome == 'rejected':
+                        lockdown['rejected'] += 1
+                    self._debug_log(f"锁定中拒绝新账号 {user_id}: {outcome}", "INFO")
+                else:
+                    request_info.held = 'raid'
+                    lockdown['held'].append(request_info.key)
+                    self.save_state()
+                return
             
             # 发送通知到审核群
-            target_group_id = self.config.get('target_group_id', '')
+            target_group_id = self.config.target_group_id
             if target_group_id:
-                template = self.config.get('notification_template', {}).get('new_request', '')
-                timeout = self.config.get('auto_approve_timeout', 300)
-                
-                message = self._safe_format(template,
-                    nickname=nickname,
-                    user_id=user_id,
-                    group_id=group_id,
-                    comment=comment or '无',
-                    timestamp=self._format_timestamp(),
-                    timeout=timeout
-                )
+                template = self.config.notification_template.get('new_request', '')
+                timeout = self.config.auto_approve_timeout
                 
-                await self.send_message_to_group(target_group_id, message)
-                self._debug_log(f"已发送通知到审核群 {target_group_id}")
+                if self._recent_applications(request_info):
+                    # 同一申请人在窗口内申请了多个群，稍后合并为一张卡片
+                    self._schedule_aggregate_card(user_id)
+                else:
+                    message = self._safe_format(template,
+                        nickname=nickname,
+                        user_id=user_id,
+                        group_id=group_id,
+                        comment=comment or '无',
+                        timestamp=self._format_timestamp(),
+                        timeout=timeout
+                    )
+                    if member_of is not None:
+                        message += f"\n\nℹ️ 申请人已是群 {member_of} 的成员"
+                    if self._assignment_enabled():
+                        reviewer = self._assign_reviewer(request_info)
+                        if reviewer is not None:
+                            message += f"\n\n👤 指派审核员: [CQ:at,qq={reviewer}]"
+                    
+                    result = await self.send_message_to_group(target_group_id, message)
+                    self._index_message(self._extract_message_id(result), request_info)
+                    self.save_state()
+                    self._debug_log(f"已发送通知到审核群 {target_group_id}")
                 
                 # 启动自动通过定时器
                 if timeout > 0:
-                    asyncio.create_task(self._auto_approve_after_timeout(
-                        user_id, int(group_id), nickname, flag
-                    ))
+                    self._schedule_auto_approve(request_info)
                     self._debug_log(f"已启动自动通过定时器，{timeout}秒后自动通过")
             
         except Exception as e:
             self._debug_log(f"处理入群申请失败: {e}", "ERROR")
     
+    async def _suppress_reapplication(self, user_id: int, group_id: int, comment: str, flag: str,
+                                      event_data: dict) -> bool:
+        """统计申请人最近对同一个群的申请次数，超过 reapply_limit 时按 reapply_action 处理并返回 True"""
+        limit = self.config.reapply_limit
+        if limit <= 0:
+            return False
+        count = self.reapply_counter.hit((group_id, user_id), self.clock.monotonic())
+        if count <= limit:
+            return False
+        
+        action = self.config.reapply_action
+        if action not in REAPPLY_ACTIONS:
+            action = 'queue'
+        request_info = JoinRequest(
+            user_id, group_id,
+            comment=comment,
+            flag=flag,
+            timestamp=int(self.clock.time()),
+            raw=event_data if self.config.keep_raw_payload else None
+        )
+        request_info.held = 'reapply'
+        previous = self.store.get(request_info.key)
+        if previous is not None:
+            # 被替换的上一条申请不再等待审核，归还指派并取消其自动通过定时器
+            self._release_assignment(previous)
+            timer = self._timer_tasks.pop(previous.key, None)
+            if timer is not None:
+                timer.cancel()
+        self.store.add(request_info)
+        await self._enforce_store_budget()
+        if self.store.get(request_info.key) is not request_info:
+            return True
+        self.save_state()
+        self._publish('new', request_info)
+        if action == 'reject':
+            reason = self.config.reapply_reject_reason
+            outcome, _ = await self._decide(request_info, approve=False, operator='system', reason=reason)
+            if outcome == 'rejected':
+                self.reapply_metrics['rejected'] += 1
+            self._debug_log(f"用户 {user_id} 窗口内第 {count} 次申请，自动拒绝: {outcome}", "INFO")
+        else:
+            # 保留在待处理列表中，审核员仍可通过 /列表 查看和处理
+            self.reapply_metrics['queued'] += 1
+            self._debug_log(f"用户 {user_id} 窗口内第 {count} 次申请，静默保存", "INFO")
+        return True
+    
+    @staticmethod
+    def _is_new_account(user_info: Optional[dict]) -> bool:
+        """等级或活跃天数低于风险分阈值的账号，查不到资料时视为新账号"""
+        if not user_info:
+            return True
+        level = user_info.get('level', user_info.get('qqLevel'))
+        login_days = user_info.get('login_days')
+        return (isinstance(level, int) and level < 10) or (isinstance(login_days, int) and login_days < 30)
+    
+    async def _enter_lockdown(self, group_id: int):
+        """申请突增时锁定群并通知审核群"""
+        count = self.raid_detector.counter.count(group_id, self.clock.monotonic())
+        self._lockdowns[group_id] = {'count': count, 'held': [], 'rejected': 0}
+        self._debug_log(f"群 {group_id} 申请突增（{count} 个），进入锁定模式", "WARNING")
+        target_group_id = self.config.target_group_id
+        if not target_group_id:
+            return
+        message = (
+            f"🛡️ 群 {group_id} 在 {self.raid_detector.window} 秒内收到 {count} 个入群申请，已进入锁定模式\n"
+            f"锁定期间暂停逐条通知和自动通过，申请速率回落后发送汇总"
+        )
+        if self.config.raid_reject_new_accounts:
+            message += "，新账号的申请将被自动拒绝"
+        try:
+            await self.send_message_to_group(target_group_id, message)
+        except Exception as e:
+            self._debug_log(f"发送锁定通知失败: {e}", "ERROR")
+    
+    async def _release_lockdowns(self, now: float) -> List[int]:
+        """解除申请速率已回落的群的锁定，并发送锁定期间的申请汇总
+
+        锁定期间暂存的申请不会在解除后自动通过，需审核员逐个处理，
+        无人处理时在 pending_max_age 后被淘汰。
+        """
+        released = []
+        for group_id in self.raid_detector.calmed(now):
+            lockdown = self._lockdowns.pop(group_id, None)
+            if lockdown is None:
+                continue
+            released.append(group_id)
+            held = [self.store.get(key) for key in lockdown['held']]
+            held = [r for r in held if r is not None and r.status == 'pending']
+            self._debug_log(f"群 {group_id} 解除锁定，暂存 {len(held)} 个申请", "INFO")
+            target_group_id = self.config.target_group_id
+            if not target_group_id:
+                continue
+            lines = [
+                f"✅ 群 {group_id} 申请速率已回落，解除锁定",
+                f"📋 锁定期间暂存 {len(held)} 个待审核申请，自动拒绝 {lockdown['rejected']} 个新账号",
+            ]
+            for request_info in held[:10]:
+                lines.append(f"• {request_info.nickname or '未知'} ({request_info.user_id}) 风险分 {request_info.risk_score}")
+            if len(held) > 10:
+                lines.append(f"… 另有 {len(held) - 10} 个")
+            if held:
+                lines.append(f"💡 暂存的申请不会自动通过，使用 /列表 群 查看，/通过 或 /拒绝 <用户ID>:{group_id} 处理")
+            try:
+                await self.send_message_to_group(target_group_id, "\n".join(lines))
+            except Exception as e:
+                self._debug_log(f"发送锁定汇总失败: {e}", "ERROR")
+        return released
+    
+    def _recent_applications(self, request_info: JoinRequest) -> List[JoinRequest]:
+        """同一申请人在 aggregate_window 秒内对其他群提交的待处理申请"""
+        window = self.config.aggregate_window
+        if window <= 0:
+            return []
+        return [
+            other for other in self.store.by_user(request_info.user_id)
+            if other is not request_info and other.status == 'pending'
+            and request_info.timestamp - other.timestamp <= window
+        ]
+    
+    def _schedule_aggregate_card(self, user_id: int):
+        """申请人停止提交新申请 aggregate_quiet 秒后发送合并卡片，期间的新申请会推迟发送"""
+        previous = self._aggregate_tasks.pop(user_id, None)
+        if previous is not None:
+            previous.cancel()
+        self._aggregate_tasks[user_id] = self._spawn(self._send_aggregate_card(user_id))
+    
+    async def _send_aggregate_card(self, user_id: int):
+        """发送列出申请人全部待处理申请的合并卡片"""
+        try:
+            await self.clock.sleep(self.config.aggregate_quiet)
+        except asyncio.CancelledError:
+            return
+        if self._aggregate_tasks.get(user_id) is asyncio.current_task():
+            del self._aggregate_tasks[user_id]
+        try:
+            requests = sorted(
+                (r for r in self.store.by_user(user_id) if r.status == 'pending'), key=lambda r: r.timestamp
+            )
+            target_group_id = self.config.target_group_id
+            if len(requests) < 2 or not target_group_id:
+                return
+            template = (self.config.notification_template.get('aggregated')
+                        or DEFAULT_AGGREGATED_TEMPLATE)
+            latest = requests[-1]
+            message = self._safe_format(template,
+                nickname=latest.nickname,
+                user_id=user_id,
+                count=len(requests),
+                groups=', '.join(str(r.group_id) for r in requests),
+                comment=latest.comment or '无',
+                timestamp=self._format_timestamp()
+            )
+            if self._assignment_enabled():
+                # 合并卡片的全部申请指派给同一审核员，优先沿用单独卡片已指派的审核员
+                reviewer = next((r.assignee for r in requests if r.assignee is not None), None)
+                if reviewer is None:
+                    reviewer = self._assign_reviewer(latest)
+                if reviewer is not None:
+                    now = int(self.clock.time())
+                    for request_info in requests:
+                        if request_info.assignee != reviewer:
+                            self.assigner.release(request_info.key)
+                            self.assigner.restore(request_info.key, reviewer, now)
+                            request_info.assignee = reviewer
+                            request_info.assigned_at = now
+                    message += f"\n\n👤 指派审核员: [CQ:at,qq={reviewer}]"
+            superseded = {r.message_id for r in requests if r.message_id is not None}
+            result = await self.send_message_to_group(target_group_id, message)
+            message_id = self._extract_message_id(result)
+            # 全部申请记录同一卡片，索引指向最新的申请；其中的申请被处理后索引改指向
+            # 其余申请，回复卡片时一并处理
+            for request_info in requests:
+                request_info.message_id = message_id
+            self._index_message(message_id, latest)
+            superseded.discard(message_id)
+            for old_id in superseded:
+                self.store.unindex_message(old_id)
+            self.save_state()
+            # 撤回被合并卡片取代的单独卡片（或更早的合并卡片），审核群中只保留一张
+            for old_id in superseded:
+                try:
+                    await self._call_platform_api('delete_msg', message_id=old_id)
+                except Exception as e:
+                    self._debug_log(f"撤回被取代的审核卡片 {old_id} 失败: {e}", "WARNING")
+            self._debug_log(f"已发送用户 {user_id} 的 {len(requests)} 个申请的合并卡片")
+        except Exception as e:
+            self._debug_log(f"发送合并卡片失败: {e}", "ERROR")
+    
+    def _card_requests(self, request_info: JoinRequest) -> List[JoinRequest]:
+        """与该申请共用同一张审核卡片的全部申请"""
+        if request_info.message_id is None:
+            return [request_info]
+        return [
+            r for r in self.store.by_user(request_info.user_id) if r.message_id == request_info.message_id
+        ] or [request_info]
+    
+    async def _decide_all(self, requests: List[JoinRequest], approve: bool, operator: str, reason: str = ""):
+        """并发决定同一申请人的多个申请，返回结果文本"""
+        outcomes = await self.clock.gather(*(
+            self._decide(request_info, approve=approve, operator=operator, reason=reason)
+            for request_info in requests
+        ))
+        expected = 'approved' if approve else 'rejected'
+        done = [str(r.group_id) for r, (outcome, _) in zip(requests, outcomes) if outcome == expected]
+        failed = [f"{r.group_id}({outcome})" for r, (outcome, _) in zip(requests, outcomes) if outcome != expected]
+        action = "通过" if approve else "拒绝"
+        text = f"{'✅' if approve else '❌'} 已{action}用户 {requests[0].user_id} 的 {len(done)} 个申请"
+        if done:
+            text += f": 群 {', '.join(done)}"
+        if failed:
+            text += f"\n⚠️ 未能{action}: {', '.join(failed)}"
+        if not approve and reason:
+            text += f"\n📝 理由: {reason}"
+        return MessageEventResult().message(text)
+    
+    @staticmethod
+    def _parse_join_requests(result: Any) -> List[dict]:
+        """将 get_group_system_msg 的返回值统一为入群申请事件格式"""
+        if isinstance(result, dict) and isinstance(result.get('data'), (dict, list)):
+            result = result['data']
+        if isinstance(result, dict):
+            entries = result.get('join_requests') or []
+        elif isinstance(result, list):
+            # 旧版返回的平铺列表，type=1/sub_type=1 为入群申请
+            entries = [m for m in result if m.get('type') == 1 and m.get('sub_type') == 1]
+        else:
+            entries = []
+        
+        requests = []
+        for entry in entries:
+            user_id = entry.get('requester_uin', entry.get('user_id'))
+            if not user_id or not entry.get('group_id'):
+                continue
+            flag = entry.get('flag', entry.get('request_id', entry.get('seq', '')))
+            requests.append({
+                'request_type': 'group',
+                'sub_type': 'add',
+                'user_id': int(user_id),
+                'group_id': int(entry['group_id']),
+                'comment': entry.get('message', entry.get('comment', '')),
+                'flag': str(flag),
+                'checked': bool(entry.get('checked', False))
+            })
+        return requests
+    
+    async def _reconcile_system_messages(self, groups: Optional[set] = None) -> int:
+        """与平台的群系统消息对账，补录未收到的申请并移除平台侧已处理的申请
+
+        用于启动对账、接管群租约后的对账以及轮询接收，指定 groups 时只处理
+        这些群的申请，返回补录的申请数。
+        """
+        try:
+            platform_adapter = self._get_platform_adapter()
+            if not platform_adapter or not hasattr(platform_adapter, 'get_group_system_msg'):
+                self._debug_log("平台适配器不支持 get_group_system_msg，跳过对账", "WARNING")
+                return 0
+            
+            result = await self._call_platform_api('get_group_system_msg')
+            self._debug_log_api_call("get_group_system_msg", {}, result)
+            self._record('poll', result)
+            
+            requests = [
+                request for request in self._parse_join_requests(result)
+                if groups is None or request['group_id'] in groups
+            ]
+            polled_flags = {request['flag'] for request in requests if request['flag']}
+            missing = []
+            dropped = 0
+            for request in requests:
+                key = (request['group_id'], request['user_id'])
+                pending = self.store.by_flag(request['flag']) if request['flag'] else None
+                if request['checked']:
+                    if pending is None:
+                        # 推送与轮询的 flag 格式可能不同，此时退回按 (群号, 用户ID) 匹配；
+                        # 待处理申请的 flag 也出现在本次结果中时，它是同一用户的另一条申请
+                        pending = self.store.get(key)
+                        if pending is not None and pending.flag in polled_flags:
+                            pending = None
+                    # 已在平台侧处理过的申请不再保留
+                    if pending is not None:
+                        await self._cleanup_request(pending)
+                        dropped += 1
+                elif pending is None and key not in self.store:
+                    missing.append(request)
+            
+            # 对账期间可能已经通过推送收到了同一申请，补录前再检查一次
+            missing = [
+                request for request in missing
+                if self._accepting and (request['group_id'], request['user_id']) not in self.store
+                and not (request['flag'] and self.store.by_flag(request['flag']))
+            ]
+            await self.clock.gather(*(self._process_group_request_new(request, live=False) for request in missing))
+            level = "INFO" if missing or dropped else "DEBUG"
+            self._debug_log(f"对账完成: 补录 {len(missing)} 条, 移除已处理 {dropped} 条", level)
+            return len(missing)
+        except Exception as e:
+            self._debug_log(f"对账失败: {e}", "ERROR")
+            return 0
+    
+    def _intake_mode(self) -> str:
+        """读取申请接收方式，配置无效时按 push 处理"""
+        intake_mode = self.config.intake_mode
+        if intake_mode not in INTAKE_MODES:
+            self._debug_log(f"无效的申请接收方式 {intake_mode}，使用 push", "WARNING")
+            return 'push'
+        return intake_mode
+    
+    async def _poll_once(self, groups: Optional[set] = None):
+        """执行一次对账轮询并更新统计"""
+        # 作为后台任务执行，终止时等待本轮处理完成而不是随轮询任务一起取消
+        task = self._spawn(self._reconcile_system_messages(groups))
+        recovered = await self.clock.shield(task)
+        self.intake_metrics['polls'] += 1
+        self.intake_metrics['poll_recovered'] += recovered
+        self.sequence_tracker.resolve(groups)
+    
+    async def _poll_loop(self, intake_mode: str):
+        """轮询群系统消息接收申请
+
+        poll 模式按 poll_interval 固定轮询。hybrid 模式每 gap_check_interval
+        秒检查一次推送序号缺口和异常静默，只在发现可疑的群时对这些群对账，
+        并至少每 hybrid_poll_interval 秒全量对账一次，以限制最坏情况下的发现延迟。
+        """
+        last_full_poll = float('-inf')
+        while self._accepting:
+            if intake_mode == 'poll':
+                await self._poll_once()
+                await self.clock.sleep(max(1, self.config.poll_interval))
+                continue
+            
+            now = self.clock.monotonic()
+            if now - last_full_poll >= self.config.hybrid_poll_interval:
+                last_full_poll = now
+                await self._poll_once()
+            else:
+                suspects = self.sequence_tracker.suspects(now)
+                if suspects:
+                    for group_id, reason in suspects.items():
+                        self.intake_metrics[f'{reason}_checks'] += 1
+                        self._debug_log(f"群 {group_id} 推送异常 ({reason})，对账补录")
+                    await self._poll_once(set(suspects))
+            await self.clock.sleep(max(1, self.config.gap_check_interval))
+    
     @filter.command("设置源群")
     async def set_source_group(self, event: AstrMessageEvent, group_id: str):
         """设置需要审核的源群"""
         try:
-            self.config['source_group_id'] = group_id
-            self.save_config()
+            self.config = self.config.replace(source_group_id=group_id)
+            self.save_config('source_group_id')
             return MessageEventResult().message(f"✅ 已设置源群为: {group_id}")
         except Exception as e:
             logger.error(f"设置源群失败: {e}")
@@ -210,8 +3055,8 @@ class EntryReviewPluginFixed(Star):
     async def set_target_group(self, event: AstrMessageEvent, group_id: str):
         """设置审核群"""
         try:
-            self.config['target_group_id'] = group_id
-            self.save_config()
+            self.config = self.config.replace(target_group_id=group_id)
+            self.save_config('target_group_id')
             return MessageEventResult().message(f"✅ 已设置审核群为: {group_id}")
         except Exception as e:
             logger.error(f"设置审核群失败: {e}")
@@ -221,11 +3066,10 @@ class EntryReviewPluginFixed(Star):
     async def add_reviewer(self, event: AstrMessageEvent, user_id: str):
         """添加审核员"""
         try:
-            reviewers = self.config.get('reviewers', [])
-            if user_id not in reviewers:
-                reviewers.append(user_id)
-                self.config['reviewers'] = reviewers
-                self.save_config()
+            if user_id not in self.config.reviewers:
+                self.config = self.config.replace(reviewers=self.config.reviewers + (user_id,))
+                self.assigner.set_reviewers(self.config.reviewers)
+                self.save_config('reviewers')
                 return MessageEventResult().message(f"✅ 已添加审核员: {user_id}")
             else:
                 return MessageEventResult().message(f"ℹ️ 用户 {user_id} 已经是审核员")
@@ -238,16 +3082,29 @@ class EntryReviewPluginFixed(Star):
         """查看当前配置"""
         try:
             config_text = f"📋 当前配置:\n\n"
-            config_text += f"🏠 源群ID: {self.config.get('source_group_id', '未设置')}\n"
-            config_text += f"🎯 审核群ID: {self.config.get('target_group_id', '未设置')}\n"
-            config_text += f"👥 审核员: {', '.join(self.config.get('reviewers', []))}\n"
-            config_text += f"⏰ 自动通过时间: {self.config.get('auto_approve_timeout', 300)}秒\n"
-            config_text += f"🐛 调试模式: {'开启' if self.config.get('debug_mode', True) else '关闭'}\n"
+            config_text += f"🏠 源群ID: {self.config.source_group_id or '未设置'}\n"
+            config_text += f"🎯 审核群ID: {self.config.target_group_id or '未设置'}\n"
+            config_text += f"👥 审核员: {', '.join(self.config.reviewers)}\n"
+            config_text += f"⏰ 自动通过时间: {self.config.auto_approve_timeout}秒\n"
+            config_text += f"🐛 调试模式: {'开启' if self.config.debug_mode else '关闭'}\n"
             return MessageEventResult().message(config_text)
         except Exception as e:
             logger.error(f"查看配置失败: {e}")
             return MessageEventResult().message(f"❌ 查看配置失败: {e}")
     
+    @filter.command("重载配置")
+    async def reload_config_command(self, event: AstrMessageEvent):
+        """重新加载配置文件"""
+        try:
+            await self.reload_config()
+            text = "✅ 配置已重新加载"
+            if self.config.warnings:
+                text += "\n⚠️ 以下配置项无效，已使用默认值: " + ', '.join(self.config.warnings)
+            return MessageEventResult().message(text)
+        except Exception as e:
+            logger.error(f"重载配置失败: {e}")
+            return MessageEventResult().message(f"❌ 重载配置失败: {e}")
+    
     def _safe_format(self, template: str, **kwargs) -> str:
         """安全的字符串格式化"""
         try:
@@ -259,30 +3116,44 @@ class EntryReviewPluginFixed(Star):
     def _format_timestamp(self, timestamp: Optional[int] = None) -> str:
         """格式化时间戳"""
         if timestamp is None:
-            timestamp = int(time.time())
+            timestamp = int(self.clock.time())
         return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
     
     @filter.event_message_type(filter.EventMessageType.GROUP_MESSAGE)
     async def handle_group_request_events(self, event: AstrMessageEvent, *args, **kwargs):
-        """处理群消息事件（备用方案）"""
+        """处理群消息事件（备用方案）
+
+        机器人所在各群的每条消息都会经过这里，非审核群的消息只做一次集合查找即返回。
+        """
         try:
-            # 检查是否是审核群的消息
-            target_group_id = self.config.get('target_group_id', '')
-            if not target_group_id or str(event.message_obj.group_id) != target_group_id:
+            # 检查是否是审核群的消息，审核群号集合在配置替换时预先算好
+            if event.message_obj.group_id not in self._review_group_ids:
                 return
             
-            # 检查是否是审核指令
+            # 检查是否是审核指令，先比较首字符
             message_text = event.message_str.strip()
-            if message_text.startswith(('/通过', '/拒绝', '/查看')):
+            if message_text[:1] == '/' and message_text.startswith(REVIEW_COMMAND_PREFIXES):
+                self._record_command(event, message_text)
                 return await self._process_review_command(event)
             
+            # 检查是否是对审核卡片的回复
+            reply_id = self._get_reply_message_id(event)
+            if reply_id is not None:
+                request_info = self.store.by_message(reply_id)
+                if request_info is not None:
+                    self._record_command(event, message_text, request_info)
+                    return await self._process_reply_command(event, request_info)
+            
             # 检查是否是入群申请的原始事件数据（作为备用方案）
+            if not self._raw_request_fallback:
+                return
             raw_message = getattr(event, 'raw_message', {})
             if (raw_message.get('post_type') == 'request' and 
                 raw_message.get('request_type') == 'group' and 
                 raw_message.get('sub_type') == 'add'):
                 
-                await self._process_group_request_new(raw_message)
+                self._record('request', raw_message)
+                self._enqueue_request(raw_message)
                 
         except Exception as e:
             self._debug_log(f"处理群消息事件失败: {e}", "ERROR")
@@ -290,11 +3161,7 @@ class EntryReviewPluginFixed(Star):
     async def send_message_to_group(self, group_id: str, message: str):
         """发送消息到群"""
         try:
-            # 获取第一个可用的平台适配器
-            platform_adapter = None
-            if self.context.platform_manager and self.context.platform_manager.platform_insts:
-                platform_adapter = self.context.platform_manager.platform_insts[0]
-            result = await platform_adapter.send_group_msg(
+            result = await self._call_platform_api('send_group_msg',
                 group_id=int(group_id),
                 message=message
             )
@@ -321,7 +3188,7 @@ class EntryReviewPluginFixed(Star):
                 'user_id': int(user_id),
                 'group_id': int(group_id),
                 'comment': comment,
-                'flag': f'test_flag_{int(time.time())}'
+                'flag': f'test_flag_{int(self.clock.time())}'
             }
             
             await self._process_group_request_new(test_event)
@@ -337,7 +3204,7 @@ class EntryReviewPluginFixed(Star):
             operator = str(event.message_obj.sender.user_id)
             
             # 检查是否是审核员
-            reviewers = self.config.get('reviewers', [])
+            reviewers = self.config.reviewers
             if reviewers and operator not in reviewers:
                 return MessageEventResult().message("❌ 您没有审核权限")
             
@@ -347,7 +3214,7 @@ class EntryReviewPluginFixed(Star):
                     user_id = parts[1].strip()
                     return await self._approve_request(event, user_id, operator, context)
                 else:
-                    return MessageEventResult().message("❌ 请指定用户ID: /通过 <用户ID>")
+                    return MessageEventResult().message("❌ 请指定用户ID: /通过 <用户ID>[:群号]")
             
             elif message_text.startswith('/拒绝'):
                 parts = message_text.split(' ', 2)
@@ -356,7 +3223,19 @@ class EntryReviewPluginFixed(Star):
                     reason = parts[2].strip() if len(parts) >= 3 else "申请被拒绝"
                     return await self._reject_request(event, user_id, operator, reason, context)
                 else:
-                    return MessageEventResult().message("❌ 请指定用户ID: /拒绝 <用户ID> [理由]")
+                    return MessageEventResult().message("❌ 请指定用户ID: /拒绝 <用户ID>[:群号] [理由]")
+            
+            elif message_text.startswith(('/全部通过', '/全部拒绝')):
+                approve = message_text.startswith('/全部通过')
+                parts = message_text.split(None, 2)
+                user_id = self._to_user_id(parts[1]) if len(parts) >= 2 else None
+                if user_id is None:
+                    return MessageEventResult().message("❌ 请指定用户ID: /全部通过 <用户ID> 或 /全部拒绝 <用户ID> [理由]")
+                requests = [r for r in self.store.by_user(user_id) if r.status in ('pending', 'failed')]
+                if not requests:
+                    return await self._request_not_found(str(user_id))
+                reason = parts[2].strip() if len(parts) >= 3 else ("" if approve else "申请被拒绝")
+                return await self._decide_all(requests, approve, operator, reason)
             
             elif message_text.startswith('/查看'):
                 parts = message_text.split(' ', 1)
@@ -364,99 +3243,197 @@ class EntryReviewPluginFixed(Star):
                     user_id = parts[1].strip()
                     return await self._show_request_info(event, user_id)
                 else:
-                    return MessageEventResult().message("❌ 请指定用户ID: /查看 <用户ID>")
+                    return MessageEventResult().message("❌ 请指定用户ID: /查看 <用户ID>[:群号]")
+            
+            elif message_text.startswith('/列表'):
+                return await self._list_requests(event, message_text.split()[1:])
+            
+            elif message_text.startswith('/审核状态'):
+                return self._show_status()
+            
+            elif message_text.startswith('/导出'):
+                return await self._export_command(message_text.split()[1:])
+            
+            elif message_text.startswith('/导入'):
+                return await self._import_command(message_text.split()[1:])
                     
         except Exception as e:
             logger.error(f"处理审核指令失败: {e}")
             return MessageEventResult().message(f"❌ 处理指令失败: {e}")
     
-    async def _approve_request(self, event: AstrMessageEvent, user_id: str, operator: str, context=None):
-        """通过申请"""
+    async def _process_reply_command(self, event: AstrMessageEvent, request_info: JoinRequest):
+        """处理回复审核卡片的指令，如「通过」或「拒绝 理由」"""
         try:
-            if user_id not in self.pending_requests:
-                return MessageEventResult().message(f"❌ 未找到用户 {user_id} 的申请")
+            message_text = event.message_str.strip().lstrip('/')
+            operator = str(event.message_obj.sender.user_id)
             
-            request_info = self.pending_requests[user_id]
+            if not message_text.startswith(('通过', '拒绝')):
+                return
             
-            # 调用API通过申请
-            success = await self._call_set_group_add_request(request_info, approve=True)
+            reviewers = self.config.reviewers
+            if reviewers and operator not in reviewers:
+                return MessageEventResult().message("❌ 您没有审核权限")
             
-            if success:
-                # 更新状态
-                request_info['status'] = 'approved'
-                request_info['operator'] = operator
-                request_info['processed_time'] = int(time.time())
-                
-                # 发送通知
-                template = self.config.get('notification_template', {}).get('approved', '')
-                message = self._safe_format(template,
-                    nickname=request_info['nickname'],
-                    user_id=user_id,
-                    group_id=request_info['group_id'],
-                    operator=operator,
-                    timestamp=self._format_timestamp()
-                )
-                
-                # 清理申请
-                await self._cleanup_request(user_id)
+            approve = message_text.startswith('通过')
+            parts = message_text.split(None, 1)
+            reason = parts[1].strip() if len(parts) >= 2 else ("" if approve else "申请被拒绝")
+            # 合并卡片对应多个申请时一并处理
+            requests = self._card_requests(request_info)
+            if len(requests) > 1:
+                return await self._decide_all(requests, approve, operator, reason)
+            if approve:
+                return await self._approve_request(event, request_info, operator)
+            return await self._reject_request(event, request_info, operator, reason)
                 
-                return MessageEventResult().message(message)
-            else:
-                return MessageEventResult().message(f"❌ 通过申请失败，请检查日志")
+        except Exception as e:
+            logger.error(f"处理回复审核失败: {e}")
+            return MessageEventResult().message(f"❌ 处理指令失败: {e}")
+    
+    async def _approve_request(self, event: AstrMessageEvent, target: Any, operator: str, context=None):
+        """通过申请，target 为指令中的用户ID或回复卡片对应的申请"""
+        try:
+            outcome, request_info = await self._decide(target, approve=True, operator=operator)
+            if outcome != 'approved':
+                return await self._decision_failure_reply(outcome, target, "通过")
+            
+            # 发送通知
+            template = self.config.notification_template.get('approved', '')
+            message = self._safe_format(template,
+                nickname=request_info.nickname,
+                user_id=request_info.user_id,
+                group_id=request_info.group_id,
+                operator=operator,
+                timestamp=self._format_timestamp()
+            )
+            return MessageEventResult().message(message)
                 
         except Exception as e:
             logger.error(f"通过申请失败: {e}")
             return MessageEventResult().message(f"❌ 通过申请失败: {e}")
     
-    async def _reject_request(self, event: AstrMessageEvent, user_id: str, operator: str, reason: str = "", context=None):
-        """拒绝申请"""
+    async def _reject_request(self, event: AstrMessageEvent, target: Any, operator: str, reason: str = "", context=None):
+        """拒绝申请，target 为指令中的用户ID或回复卡片对应的申请"""
         try:
-            if user_id not in self.pending_requests:
-                return MessageEventResult().message(f"❌ 未找到用户 {user_id} 的申请")
-            
-            request_info = self.pending_requests[user_id]
+            outcome, request_info = await self._decide(target, approve=False, operator=operator, reason=reason)
+            if outcome != 'rejected':
+                return await self._decision_failure_reply(outcome, target, "拒绝")
             
-            # 调用API拒绝申请
-            success = await self._call_set_group_add_request(request_info, approve=False, reason=reason)
-            
-            if success:
-                # 更新状态
-                request_info['status'] = 'rejected'
-                request_info['operator'] = operator
-                request_info['reject_reason'] = reason
-                request_info['processed_time'] = int(time.time())
-                
-                # 发送通知
-                template = self.config.get('notification_template', {}).get('rejected', '')
-                message = self._safe_format(template,
-                    nickname=request_info['nickname'],
-                    user_id=user_id,
-                    group_id=request_info['group_id'],
-                    operator=operator,
-                    reason=reason or '无',
-                    timestamp=self._format_timestamp()
-                )
-                
-                # 清理申请
-                await self._cleanup_request(user_id)
-                
-                return MessageEventResult().message(message)
-            else:
-                return MessageEventResult().message(f"❌ 拒绝申请失败，请检查日志")
+            # 发送通知
+            template = self.config.notification_template.get('rejected', '')
+            message = self._safe_format(template,
+                nickname=request_info.nickname,
+                user_id=request_info.user_id,
+                group_id=request_info.group_id,
+                operator=operator,
+                reason=reason or '无',
+                timestamp=self._format_timestamp()
+            )
+            return MessageEventResult().message(message)
                 
         except Exception as e:
             logger.error(f"拒绝申请失败: {e}")
             return MessageEventResult().message(f"❌ 拒绝申请失败: {e}")
     
-    async def _call_set_group_add_request(self, request_info: dict, approve: bool, reason: str = "") -> bool:
+    async def _decision_failure_reply(self, outcome: str, target: Any, action: str):
+        """审核未生效时给审核员的提示"""
+        user_id = target.user_id if isinstance(target, JoinRequest) else str(target).strip()
+        if outcome == 'not_found':
+            group_id = target.group_id if isinstance(target, JoinRequest) else None
+            return await self._request_not_found(user_id, group_id)
+        if outcome == 'ambiguous':
+            return self._ambiguous_reply(user_id)
+        if outcome == 'busy':
+            return MessageEventResult().message(f"ℹ️ 用户 {user_id} 的申请正在处理中或已处理")
+        if outcome == 'claimed_elsewhere':
+            return MessageEventResult().message(f"ℹ️ 用户 {user_id} 的申请已由其他实例处理")
+        return MessageEventResult().message(f"❌ {action}申请失败，请检查日志")
+    
+    def _ambiguous_reply(self, user_id: Any):
+        """同一用户申请了多个群时提示审核员指定群号"""
+        groups = '、'.join(str(r.group_id) for r in self.store.by_user(self._to_user_id(user_id)))
+        return MessageEventResult().message(
+            f"ℹ️ 用户 {user_id} 同时申请了多个群（{groups}），请使用「{user_id}:群号」指定"
+        )
+    
+    @staticmethod
+    def _transition(request_info: JoinRequest, expected: Tuple[str, ...], new_status: str) -> bool:
+        """比较并设置申请状态，只有当前状态属于 expected 时才会切换
+
+        检查与赋值之间没有 await，在事件循环中是原子的。
+        """
+        if request_info.status not in expected:
+            return False
+        if new_status not in REQUEST_TRANSITIONS[request_info.status]:
+            logger.error(f"申请 {request_info} 不允许从 {request_info.status} 切换到 {new_status}")
+            return False
+        request_info.status = new_status
+        return True
+    
+    @staticmethod
+    def _to_user_id(value: Any) -> Optional[int]:
+        """将指令中的用户ID转换为整数，无效时返回 None"""
+        try:
+            return int(str(value).strip())
+        except ValueError:
+            return None
+    
+    async def _decide(self, target: Any, approve: bool, operator: str = "", reason: str = "",
+                      auto: bool = False) -> Tuple[str, Optional[JoinRequest]]:
+        """审核决定的唯一入口，保证每个申请只被决定一次
+
+        target 的格式见 _resolve_request。返回 (结果, 申请信息)，结果为
+        approved / rejected / auto_approved / failed / not_found / ambiguous /
+        busy / claimed_elsewhere 之一。并发的决定者在状态切换失败后直接返回
+        busy，不会调用平台接口。
+        """
+        request_info, candidates = self._resolve_request(target)
+        if request_info is None:
+            return ('ambiguous' if len(candidates) > 1 else 'not_found'), None
+        # 自动通过只处理仍在等待的申请，人工审核可以重试失败的申请
+        allowed_from = ('pending',) if auto else ('pending', 'failed')
+        if not self._transition(request_info, allowed_from, 'deciding'):
+            return 'busy', request_info
+        
+        try:
+            if not await self._claim_decision(request_info):
+                self._transition(request_info, ('deciding',), 'failed')
+                await self._cleanup_request(request_info)
+                return 'claimed_elsewhere', request_info
+            
+            success = await self._call_set_group_add_request(request_info, approve=approve, reason=reason)
+        except BaseException:
+            # 包括取消在内的任何中断都回到可重试的失败状态，并撤销共享存储中的登记，
+            # 否则重试时会被当作其他实例已处理；撤销不随当前任务一起被取消
+            self._transition(request_info, ('deciding',), 'failed')
+            try:
+                await asyncio.shield(self._release_decision(request_info))
+            except Exception as e:
+                logger.error(f"撤销审核登记失败: {e}")
+            raise
+        
+        if not success:
+            self._transition(request_info, ('deciding',), 'failed')
+            await self._release_decision(request_info)
+            return 'failed', request_info
+        
+        final_status = 'auto_approved' if auto else ('approved' if approve else 'rejected')
+        self._transition(request_info, ('deciding',), final_status)
+        request_info.operator = operator
+        if not approve:
+            request_info.reject_reason = reason
+        request_info.processed_time = int(self.clock.time())
+        if request_info.message_id is not None and self.config.card_cleanup in ('recall', 'summary'):
+            self._stale_cards.append(request_info)
+        await self._cleanup_request(request_info)
+        self._record_decision(request_info)
+        self._publish('decided', request_info)
+        return final_status, request_info
+    
+    async def _call_set_group_add_request(self, request_info: JoinRequest, approve: bool, reason: str = "") -> bool:
         """调用设置群添加请求API - 尝试多种方式"""
-        # 获取第一个可用的平台适配器
-        platform_adapter = None
-        if self.context.platform_manager and self.context.platform_manager.platform_insts:
-            platform_adapter = self.context.platform_manager.platform_insts[0]
-        flag = request_info.get('flag', '')
-        user_id = int(request_info['user_id'])
-        group_id = int(request_info['group_id'])
+        flag = request_info.flag
+        user_id = request_info.user_id
+        group_id = request_info.group_id
         
         # 尝试多种API调用方式
         api_attempts = [
@@ -499,7 +3476,7 @@ class EntryReviewPluginFixed(Star):
             try:
                 self._debug_log(f"尝试API调用方式 {i}: {params}")
                 
-                result = await platform_adapter.set_group_add_request(**params)
+                result = await self._call_platform_api('set_group_add_request', **params)
                 
                 self._debug_log_api_call(f"set_group_add_request_attempt_{i}", params, result)
                 
@@ -507,6 +3484,10 @@ class EntryReviewPluginFixed(Star):
                     self._debug_log(f"API调用方式 {i} 成功")
                     return True
                     
+            except CircuitOpenError as e:
+                # 平台不可用时换用其他参数也不会成功
+                self._debug_log(f"API调用方式 {i} 被熔断，停止尝试: {e}", "WARNING")
+                return False
             except Exception as e:
                 self._debug_log_api_call(f"set_group_add_request_attempt_{i}", params, error=e)
                 self._debug_log(f"API调用方式 {i} 失败: {e}", "WARNING")
@@ -519,18 +3500,21 @@ class EntryReviewPluginFixed(Star):
     async def _show_request_info(self, event: AstrMessageEvent, user_id: str):
         """显示申请信息"""
         try:
-            if user_id not in self.pending_requests:
-                return MessageEventResult().message(f"❌ 未找到用户 {user_id} 的申请")
-            
-            request_info = self.pending_requests[user_id]
+            request_info, candidates = self._resolve_request(user_id)
+            if request_info is None:
+                if len(candidates) > 1:
+                    return self._ambiguous_reply(user_id)
+                return await self._request_not_found(user_id)
             
             info_text = f"📋 申请信息\n\n"
-            info_text += f"👤 申请人: {request_info['nickname']} ({user_id})\n"
-            info_text += f"🏠 申请群: {request_info['group_id']}\n"
-            info_text += f"💬 申请理由: {request_info.get('comment', '无')}\n"
-            info_text += f"🏷️ Flag: {request_info.get('flag', '无')}\n"
-            info_text += f"📅 申请时间: {self._format_timestamp(request_info['timestamp'])}\n"
-            info_text += f"📊 状态: {request_info['status']}\n"
+            info_text += f"👤 申请人: {request_info.nickname} ({request_info.user_id})\n"
+            info_text += f"🏠 申请群: {request_info.group_id}\n"
+            info_text += f"💬 申请理由: {request_info.comment or '无'}\n"
+            info_text += f"🏷️ Flag: {request_info.flag or '无'}\n"
+            info_text += f"📅 申请时间: {self._format_timestamp(request_info.timestamp)}\n"
+            info_text += f"📊 状态: {request_info.status}\n"
+            if request_info.assignee is not None:
+                info_text += f"👤 指派审核员: {request_info.assignee}\n"
             
             return MessageEventResult().message(info_text)
             
@@ -538,58 +3522,373 @@ class EntryReviewPluginFixed(Star):
             logger.error(f"显示申请信息失败: {e}")
             return MessageEventResult().message(f"❌ 显示申请信息失败: {e}")
     
-    async def _auto_approve_after_timeout(self, user_id: str, group_id: int, nickname: str, flag: str):
+    async def _list_requests(self, event: AstrMessageEvent, args: List[str]):
+        """分页列出待处理申请，参数为 [页码] [排序方式]"""
+        try:
+            page = 1
+            sort_by = 'age'
+            for arg in args:
+                if arg.isdigit():
+                    page = max(1, int(arg))
+                elif arg in LIST_SORT_ALIASES:
+                    sort_by = LIST_SORT_ALIASES[arg]
+                else:
+                    return MessageEventResult().message("❌ 用法: /列表 [页码] [时间|群|风险]")
+            
+            index = self.store.sorted_indexes[sort_by]
+            total = len(index)
+            if total == 0:
+                return MessageEventResult().message("📝 当前没有待处理的申请")
+            
+            page_size = max(1, self.config.list_page_size)
+            total_pages = (total + page_size - 1) // page_size
+            page = min(page, total_pages)
+            offset = (page - 1) * page_size
+            now = int(self.clock.time())
+            
+            lines = [f"📝 待处理申请 第 {page}/{total_pages} 页（共 {total} 条，按{LIST_SORT_LABELS[sort_by]}排序）"]
+            for i, key in enumerate(index.page(offset, page_size), offset + 1):
+                request_info = self.store.get(key[-1])
+                waited = (now - request_info.timestamp) // 60
+                lines.append(
+                    f"{i}. {request_info.nickname} ({request_info.user_id}) "
+                    f"群{request_info.group_id} 风险{request_info.risk_score} 已等待{waited}分钟"
+                )
+            
+            chunks = self._split_message(lines, self.config.max_message_length)
+            if len(chunks) == 1:
+                return MessageEventResult().message(chunks[0])
+            # 超出单条消息长度时按顺序逐条发送
+            for chunk in chunks:
+                await self.send_message_to_group(str(event.message_obj.group_id), chunk)
+            
+        except Exception as e:
+            logger.error(f"列出申请失败: {e}")
+            return MessageEventResult().message(f"❌ 列出申请失败: {e}")
+    
+    def _show_status(self):
+        """显示待处理数量和平台接口调用统计"""
+        status_text = f"📊 审核状态\n\n"
+        status_text += f"📝 待处理申请: {len(self.store)}\n"
+        oldest = self.store.oldest()
+        if oldest is not None:
+            status_text += f"⏱️ 最早待审: {(int(self.clock.time()) - oldest.timestamp) // 60} 分钟 ({oldest.user_id})\n"
+        breaches = self._check_slo()
+        if breaches:
+            status_text += "⚠️ 超出 SLO: " + ', '.join(
+                f"群{group_id} {depth}条/{waited // 60}分钟" for group_id, depth, waited in breaches
+            ) + f"（累计告警 {self.slo_metrics['escalations']} 次）\n"
+        max_count = self.config.pending_max_count
+        max_bytes = self.config.pending_max_bytes
+        status_text += (
+            f"🗄️ 存储占用: {len(self.store)}/{max_count or '不限'} 条, "
+            f"约 {self.store.total_bytes / 1024:.1f}/{f'{max_bytes / 1024:.0f}' if max_bytes else '不限'} KB\n"
+        )
+        status_text += (
+            f"🧹 淘汰: 过期 {self.store_metrics['evicted_expired']} / "
+            f"超出容量 {self.store_metrics['evicted_over_budget']} 条, 近1小时 {self._recent_evictions()} 条\n"
+        )
+        status_text += (
+            f"📥 接收方式: {self._intake_mode()}，推送 {self.intake_metrics['pushed']} 条 / "
+            f"轮询 {self.intake_metrics['polls']} 次补录 {self.intake_metrics['poll_recovered']} 条 "
+            f"(缺口触发 {self.intake_metrics['gap_checks']} / 静默触发 {self.intake_metrics['silence_checks']})\n"
+        )
+        for group_id, lockdown in self._lockdowns.items():
+            status_text += (
+                f"🛡️ 群 {group_id} 锁定中: 暂存 {len(lockdown['held'])} 个 / 自动拒绝 {lockdown['rejected']} 个\n"
+            )
+        if self.reapply_metrics['queued'] or self.reapply_metrics['rejected']:
+            status_text += (
+                f"🔂 反复申请: 静默保存 {self.reapply_metrics['queued']} / 自动拒绝 {self.reapply_metrics['rejected']}，"
+                f"统计中 {len(self.reapply_counter)} 个申请人/群\n"
+            )
+        if self.member_sets:
+            status_text += (
+                f"👥 成员缓存: {len(self.member_sets)} 个群 / "
+                f"{sum(len(members) for members in self.member_sets.values())} 人\n"
+            )
+        if self._assignment_enabled() and self.assigner.outstanding:
+            status_text += "👥 审核员待处理: " + ', '.join(
+                f"{reviewer} {count}条" for reviewer, count in self.assigner.outstanding.items()
+            ) + "\n"
+        for platform_adapter_id, breaker in self._circuit_breakers.items():
+            status_text += f"🔌 适配器 {platform_adapter_id} 熔断器: {breaker.state}\n"
+        status_text += f"🔁 接口重试: {self.api_metrics['retries']} 次\n"
+        status_text += f"❔ 结果不确定未重试的发送: {self.api_metrics['ambiguous_failures']} 次\n"
+        status_text += f"📤 出站限流等待: {self.api_metrics['throttled']} 次\n"
+        if self.config.card_cleanup in ('recall', 'summary'):
+            status_text += (
+                f"🗑️ 审核卡片: 已撤回 {self.card_metrics['recalled']} / 撤回失败 {self.card_metrics['recall_failed']} / "
+                f"已汇总 {self.card_metrics['summarized']}，待处理 {len(self._stale_cards)}\n"
+            )
+        status_text += f"⛔ 熔断快速失败: {self.api_metrics['fast_failures']} 次\n"
+        status_text += (
+            f"🔀 熔断状态变化: 打开 {self.api_metrics['circuit_open']} / "
+            f"半开 {self.api_metrics['circuit_half_open']} / 关闭 {self.api_metrics['circuit_closed']}\n"
+        )
+        return MessageEventResult().message(status_text)
+    
+    @staticmethod
+    def _split_message(lines: List[str], max_length: int) -> List[str]:
+        """按行将文本拆分为不超过 max_length 的多条消息"""
+        chunks = []
+        current = ''
+        for line in lines:
+            while len(line) > max_length:
+                if current:
+                    chunks.append(current)
+                    current = ''
+                chunks.append(line[:max_length])
+                line = line[max_length:]
+            candidate = f"{current}\n{line}" if current else line
+            if len(candidate) > max_length:
+                chunks.append(current)
+                candidate = line
+            current = candidate
+        if current:
+            chunks.append(current)
+        return chunks
+    
+    async def _auto_approve_after_timeout(self, request_info: JoinRequest, delay: Optional[float] = None):
         """超时后自动通过申请"""
+        user_id = request_info.user_id
         try:
-            timeout = self.config.get('auto_approve_timeout', 300)
-            await asyncio.sleep(timeout)
+            if delay is None:
+                delay = self.config.auto_approve_timeout
+            await self.clock.sleep(delay)
+            
+            # 定时器已触发，转为必须完成的任务，终止时等待其结束而不是取消
+            task = asyncio.current_task()
+            if self._timer_tasks.get(request_info.key) is task:
+                del self._timer_tasks[request_info.key]
+            self._active_tasks.add(task)
+            task.add_done_callback(self._active_tasks.discard)
             
-            # 检查申请是否还在待处理状态
-            if user_id in self.pending_requests and self.pending_requests[user_id]['status'] == 'pending':
-                request_info = self.pending_requests[user_id]
+            if request_info.group_id in self._lockdowns:
+                self._debug_log(f"群 {request_info.group_id} 锁定中，用户 {user_id} 的申请暂不自动通过")
+                return
+            
+            outcome, _ = await self._decide(request_info, approve=True, reason="超时自动通过", auto=True)
+            if outcome == 'auto_approved':
+                # 发送通知
+                template = self.config.notification_template.get('auto_approved', '')
+                message = self._safe_format(template,
+                    nickname=request_info.nickname,
+                    user_id=user_id,
+                    group_id=request_info.group_id,
+                    timestamp=self._format_timestamp()
+                )
                 
-                # 自动通过申请
-                success = await self._call_set_group_add_request(request_info, approve=True, reason="超时自动通过")
+                target_group_id = self.config.target_group_id
+                if target_group_id:
+                    await self.send_message_to_group(target_group_id, message)
                 
-                if success:
-                    # 更新状态
-                    request_info['status'] = 'auto_approved'
-                    request_info['processed_time'] = int(time.time())
-                    
-                    # 发送通知
-                    template = self.config.get('notification_template', {}).get('auto_approved', '')
-                    message = self._safe_format(template,
-                        nickname=nickname,
-                        user_id=user_id,
-                        group_id=group_id,
-                        timestamp=self._format_timestamp()
-                    )
-                    
-                    target_group_id = self.config.get('target_group_id', '')
-                    if target_group_id:
-                        await self.send_message_to_group(target_group_id, message)
-                    
-                    # 清理申请
-                    await self._cleanup_request(user_id)
-                    
-                    self._debug_log(f"用户 {user_id} 的申请已自动通过")
-                else:
-                    self._debug_log(f"用户 {user_id} 的申请自动通过失败", "ERROR")
+                self._debug_log(f"用户 {user_id} 的申请已自动通过")
+            elif outcome == 'failed':
+                self._debug_log(f"用户 {user_id} 的申请自动通过失败", "ERROR")
+            else:
+                self._debug_log(f"用户 {user_id} 的申请无需自动通过: {outcome}")
                     
         except asyncio.CancelledError:
             self._debug_log(f"用户 {user_id} 的自动通过定时器被取消")
         except Exception as e:
             self._debug_log(f"自动通过申请失败: {e}", "ERROR")
     
-    async def _cleanup_request(self, user_id: str):
-        """清理申请记录"""
+    async def _cleanup_request(self, request_info: JoinRequest):
+        """清理申请记录，仅当其仍是当前登记的申请时才清理"""
         try:
-            if user_id in self.pending_requests:
-                del self.pending_requests[user_id]
-                self._debug_log(f"已清理用户 {user_id} 的申请记录")
+            if self.store.remove(request_info):
+                self._release_assignment(request_info)
+                timer = self._timer_tasks.pop(request_info.key, None)
+                if timer is not None and timer is not asyncio.current_task():
+                    timer.cancel()
+                self.save_state()
+                self._debug_log(f"已清理用户 {request_info.user_id} 在群 {request_info.group_id} 的申请记录")
         except Exception as e:
             self._debug_log(f"清理申请记录失败: {e}", "ERROR")
     
+    async def _enforce_store_budget(self) -> List[Tuple[JoinRequest, str]]:
+        """淘汰过期或超出数量/内存预算的待处理申请，按申请时间从旧到新"""
+        try:
+            evicted = self.store.eviction_candidates(
+                int(self.clock.time()),
+                max_age=self.config.pending_max_age,
+                max_count=self.config.pending_max_count,
+                max_bytes=self.config.pending_max_bytes
+            )
+            if not evicted:
+                return evicted
+            
+            now = self.clock.monotonic()
+            for request_info, reason in evicted:
+                self.store.remove(request_info)
+                self._release_assignment(request_info)
+                timer = self._timer_tasks.pop(request_info.key, None)
+                if timer is not None:
+                    timer.cancel()
+                self.store_metrics[f'evicted_{reason}'] += 1
+                self._eviction_times.append(now)
+                self._debug_log(f"淘汰待处理申请 {request_info} ({reason})")
+            self.save_state()
+            
+            target_group_id = self.config.target_group_id
+            if self.config.evict_notify and target_group_id:
+                reason_labels = {'expired': '已过期', 'over_budget': '超出存储容量'}
+                lines = [f"🧹 以下 {len(evicted)} 条申请已从待处理列表移除，如仍需处理请到QQ群通知中操作:"]
+                lines.extend(
+                    f"• {request_info.nickname} ({request_info.user_id}) 群{request_info.group_id} - {reason_labels[reason]}"
+                    for request_info, reason in evicted
+                )
+                for chunk in self._split_message(lines, self.config.max_message_length):
+                    await self.send_message_to_group(target_group_id, chunk)
+            return evicted
+        except Exception as e:
+            self._debug_log(f"淘汰待处理申请失败: {e}", "ERROR")
+            return []
+    
+    def _check_slo(self, now: Optional[int] = None) -> List[Tuple[int, int, int]]:
+        """检查各源群的审核积压，返回超出 SLO 的 (群号, 待处理数, 最早等待秒数)
+
+        只读取按群索引的大小并在排序索引中二分查找各群最早的申请，不扫描全部申请。
+        """
+        if now is None:
+            now = int(self.clock.time())
+        max_wait = self.config.slo_max_wait
+        max_depth = self.config.slo_max_depth
+        breaches = []
+        for group_id, depth in self.store.group_sizes().items():
+            oldest = self.store.oldest(group_id)
+            waited = now - oldest.timestamp if oldest else 0
+            if (max_wait and waited > max_wait) or (max_depth and depth > max_depth):
+                breaches.append((group_id, depth, waited))
+        return breaches
+    
+    async def _escalate_slo_breaches(self, breaches: List[Tuple[int, int, int]], now: float):
+        """审核积压告警：首次超出时发送汇总，冷却期后仍未恢复则 @ 审核员"""
+        breached_groups = {group_id for group_id, _, _ in breaches}
+        for group_id in list(self._slo_state):
+            if group_id not in breached_groups:
+                del self._slo_state[group_id]
+                self._debug_log(f"群 {group_id} 的审核积压已恢复")
+        
+        cooldown = self.config.slo_escalation_cooldown
+        due = []
+        for group_id, depth, waited in breaches:
+            state = self._slo_state.get(group_id)
+            if state is None:
+                self.slo_metrics['breaches'] += 1
+                state = self._slo_state[group_id] = [0, float('-inf')]
+            if now - state[1] >= cooldown:
+                state[0] += 1
+                state[1] = now
+                due.append((group_id, depth, waited, state[0]))
+        
+        target_group_id = self.config.target_group_id
+        if not due or not target_group_id:
+            return
+        lines = ["⚠️ 审核积压告警"]
+        lines.extend(
+            f"🏠 群{group_id}: 待处理 {depth} 条，最早已等待 {waited // 60} 分钟"
+            for group_id, depth, waited, _ in due
+        )
+        # 告警后仍未恢复的再次告警时提醒审核员
+        if any(level > 1 for _, _, _, level in due):
+            mentions = ' '.join(f"[CQ:at,qq={reviewer}]" for reviewer in self.config.reviewers)
+            if mentions:
+                lines.append(f"请尽快处理 {mentions}")
+        self.slo_metrics['escalations'] += 1
+        for chunk in self._split_message(lines, self.config.max_message_length):
+            await self.send_message_to_group(target_group_id, chunk)
+    
+    async def _slo_watchdog_loop(self):
+        """定期检查审核积压是否超出 SLO，改派超时未处理的申请，并解除已平息的突增锁定"""
+        while True:
+            await self.clock.sleep(max(1, self.config.slo_check_interval))
+            try:
+                await self._reassign_timed_out()
+                await self._escalate_slo_breaches(self._check_slo(), self.clock.monotonic())
+                await self._release_lockdowns(self.clock.monotonic())
+            except Exception as e:
+                self._debug_log(f"审核积压巡检失败: {e}", "ERROR")
+    
+    async def _flush_stale_cards(self) -> int:
+        """在出站限流的剩余预算内处理已决定申请的审核卡片，返回处理的卡片数
+
+        recall 模式逐条撤回卡片，合并卡片等其全部申请处理完后只撤回一次；
+        summary 模式把这一批的处理结果合并为一条不超过 max_message_length 的
+        状态消息。始终为新申请的通知保留一个令牌，预算不足或超出长度时剩余的
+        卡片留到下一轮处理。
+        """
+        mode = self.config.card_cleanup
+        limiter = self._get_outbound_limiter()
+        handled = 0
+        if mode == 'recall':
+            while self._stale_cards and limiter.available() >= 2:
+                request_info = self._stale_cards.popleft()
+                message_id = request_info.message_id
+                # 合并卡片的其他申请仍待处理时保留卡片，最后一个申请处理后再撤回
+                if any(r.message_id == message_id for r in self.store.by_user(request_info.user_id)):
+                    continue
+                # 同一张卡片只撤回一次
+                if any(r.message_id == message_id for r in self._stale_cards):
+                    self._stale_cards = deque(r for r in self._stale_cards if r.message_id != message_id)
+                try:
+                    await self._call_platform_api('delete_msg', message_id=request_info.message_id)
+                    self.card_metrics['recalled'] += 1
+                except Exception as e:
+                    self.card_metrics['recall_failed'] += 1
+                    self._debug_log(f"撤回审核卡片 {request_info.message_id} 失败: {e}", "WARNING")
+                handled += 1
+        elif mode == 'summary' and self._stale_cards and limiter.available() >= 2:
+            target_group_id = self.config.target_group_id
+            status_labels = {'approved': '✅ 通过', 'rejected': '❌ 拒绝', 'auto_approved': '⏰ 自动通过'}
+            header = "📋 已处理 {} 条申请，以上对应的审核卡片无需再处理:"
+            max_length = self.config.max_message_length
+            # 合并消息只占用一次预算，放不下的卡片留到下一轮汇总
+            length = len(header.format(len(self._stale_cards)))
+            entries = []
+            while self._stale_cards:
+                request_info = self._stale_cards[0]
+                operator = f" ({request_info.operator})" if request_info.operator else ''
+                line = (
+                    f"• {request_info.nickname} ({request_info.user_id}) 群{request_info.group_id} "
+                    f"{status_labels.get(request_info.status, request_info.status)}{operator}"
+                )
+                if entries and length + 1 + len(line) > max_length:
+                    break
+                self._stale_cards.popleft()
+                entries.append(line)
+                length += 1 + len(line)
+                handled += 1
+            message = self._split_message([header.format(len(entries))] + entries, max_length)[0]
+            if target_group_id:
+                await self.send_message_to_group(target_group_id, message)
+            self.card_metrics['summarized'] += handled
+        return handled
+    
+    async def _card_cleanup_loop(self):
+        """定期撤回或汇总已处理申请的审核卡片"""
+        while True:
+            await self.clock.sleep(max(1, self.config.card_cleanup_interval))
+            try:
+                await self._flush_stale_cards()
+            except Exception as e:
+                self._debug_log(f"清理审核卡片失败: {e}", "ERROR")
+    
+    async def _store_sweep_loop(self):
+        """定期清理过期的待处理申请，没有新申请时也能按时淘汰"""
+        while True:
+            await self.clock.sleep(max(1, self.config.pending_sweep_interval))
+            await self._enforce_store_budget()
+            self.reapply_counter.prune(self.clock.monotonic())
+    
+    def _recent_evictions(self, window: float = 3600) -> int:
+        """最近 window 秒内淘汰的申请数"""
+        cutoff = self.clock.monotonic() - window
+        while self._eviction_times and self._eviction_times[0] < cutoff:
+            self._eviction_times.popleft()
+        return len(self._eviction_times)
+    
     @filter.command("帮助")
     async def help_command(self, event: AstrMessageEvent):
         """显示帮助信息"""
@@ -600,27 +3899,110 @@ class EntryReviewPluginFixed(Star):
 • /设置审核群 <群号> - 设置审核消息发送的群
 • /添加审核员 <用户ID> - 添加审核员
 • /查看配置 - 查看当前配置
+• /重载配置 - 重新加载配置文件
 
 🔍 审核指令:
-• /通过 <用户ID> - 通过入群申请
-• /拒绝 <用户ID> [理由] - 拒绝入群申请
-• /查看 <用户ID> - 查看申请详情
+• /通过 <用户ID>[:群号] - 通过入群申请
+• /拒绝 <用户ID>[:群号] [理由] - 拒绝入群申请
+• /全部通过 <用户ID> - 通过该用户的全部申请
+• /全部拒绝 <用户ID> [理由] - 拒绝该用户的全部申请
+• /查看 <用户ID>[:群号] - 查看申请详情
+• /列表 [页码] [时间|群|风险] - 分页查看待处理申请
+• /审核状态 - 查看待处理数量和接口调用统计
+• /导出 [待处理|记录|全部] [csv|jsonl] - 导出申请和审核记录
+• /导入 <文件名> - 从 exports 目录导入申请和审核记录
+• 回复审核卡片「通过」或「拒绝 [理由]」- 无需输入QQ号
 
 🧪 测试指令:
 • /测试申请 [用户ID] [群号] [理由] - 发送测试申请
 
 💡 说明:
 - 申请会在设定时间后自动通过
+- 同一用户申请了多个群时，需用「用户ID:群号」指定
 - 支持多种flag格式以解决NapCatQQ兼容性问题
 - 调试模式下会输出详细日志"""
         
         return MessageEventResult().message(help_text)
     
+    async def _drain(self, deadline: float) -> Dict[str, int]:
+        """停止接收申请，在期限内等待进行中的任务完成并持久化剩余状态"""
+        started = asyncio.get_running_loop().time()
+        self._accepting = False
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        if self.review_api is not None:
+            await self.review_api.stop()
+            self.review_api = None
+        background = [
+            task for task in (self._sweep_task, self._poll_task, self._slo_task, self._card_cleanup_task)
+            if task is not None
+        ]
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        
+        unfinished = 0
+        if self._active_tasks:
+            _, not_done = await asyncio.wait(set(self._active_tasks), timeout=deadline)
+            for task in not_done:
+                task.cancel()
+            unfinished = len(not_done)
+            if not_done:
+                await asyncio.gather(*not_done, return_exceptions=True)
+        
+        # 已处理申请的审核卡片在剩余期限和出站预算内撤回或汇总，其余计入未处理卡片
+        remaining = deadline - (asyncio.get_running_loop().time() - started)
+        if self._stale_cards and remaining > 0:
+            async def flush():
+                while self._stale_cards and await self._flush_stale_cards():
+                    pass
+            try:
+                await asyncio.wait_for(flush(), remaining)
+            except asyncio.TimeoutError:
+                pass
+            except Exception as e:
+                self._debug_log(f"清理审核卡片失败: {e}", "ERROR")
+        
+        # 未触发的定时器只需取消，截止时间可由持久化的申请时间重新计算
+        timers = list(self._timer_tasks.values())
+        self._timer_tasks.clear()
+        for task in timers:
+            task.cancel()
+        if timers:
+            await asyncio.gather(*timers, return_exceptions=True)
+        
+        self.save_state()
+        
+        # 主动释放租约，其他实例无需等待租约过期即可接管
+        if self._lease_task is not None:
+            self._lease_task.cancel()
+        if self.lease_store is not None:
+            try:
+                self.lease_store.release_all()
+                self.lease_store.close()
+            except Exception as e:
+                logger.error(f"释放租约失败: {e}")
+            self.lease_store = None
+            self._owned_leases.clear()
+        
+        return {
+            'unfinished_tasks': unfinished,
+            'cancelled_timers': len(timers),
+            'pending_requests': len(self.store),
+            'unsent_cards': len(self._stale_cards)
+        }
+    
     async def terminate(self):
         """插件终止时的清理工作"""
         try:
             self._debug_log("插件正在终止...")
-            # 这里可以添加清理逻辑
-            logger.info("入群申请审核插件已终止")
+            report = await self._drain(self.config.shutdown_drain_timeout)
+            logger.info(
+                f"入群申请审核插件已终止: 未完成任务 {report['unfinished_tasks']} 个, "
+                f"取消定时器 {report['cancelled_timers']} 个（已随申请持久化，重启后恢复）, "
+                f"待处理申请 {report['pending_requests']} 条, "
+                f"未撤回或汇总的审核卡片 {report['unsent_cards']} 张"
+            )
         except Exception as e:
             logger.error(f"插件终止时发生错误: {e}")
\ No newline at end of file
@@ -0,0 +1,1481 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+入群申请审核插件 - 审核流程测试
+使用模拟的平台适配器驱动 main.py 的完整审核流程
+"""
+
+import sys
+import os
+import asyncio
+import io
+import json
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+# 添加插件路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# 模拟AstrBot相关类
+class MockMessageEventResult:
+    def __init__(self):
+        self.chain = []
+
+    def message(self, text):
+        self.chain.append({"type": "text", "data": {"text": text}})
+        return self
+
+class MockLogger:
+    def info(self, msg):
+        pass
+
+    def debug(self, msg):
+        pass
+
+    def warning(self, msg):
+        pass
+
+    def error(self, msg):
+        print(f"[ERROR] {msg}")
+
+class MockStar:
+    def __init__(self, context):
+        self.context = context
+
+class MockEventMessageType:
+    GROUP_MESSAGE = "group_message"
+    PRIVATE_MESSAGE = "private_message"
+
+class MockFilter:
+    EventMessageType = MockEventMessageType
+
+    def command(self, command_name):
+        def decorator(func):
+            return func
+        return decorator
+
+    def event_message_type(self, message_type):
+        def decorator(func):
+            return func
+        return decorator
+
+class MockModule:
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+def mock_register(*args, **kwargs):
+    def decorator(cls):
+        return cls
+    return decorator
+
+# 模拟导入 - 必须在导入main之前设置
+sys.modules['astrbot'] = MockModule()
+sys.modules['astrbot.api'] = MockModule(logger=MockLogger())
+sys.modules['astrbot.api.event'] = MockModule(
+    AstrMessageEvent=object,
+    MessageEventResult=MockMessageEventResult,
+    filter=MockFilter()
+)
+sys.modules['astrbot.api.star'] = MockModule(
+    Context=object,
+    Star=MockStar,
+    register=mock_register
+)
+
+# 其他测试脚本可能已用不同的模拟对象导入过 main，这里强制重新导入
+sys.modules.pop('main', None)
+import main
+
+SOURCE_GROUP = "123456789"
+REVIEW_GROUP = "987654321"
+REVIEWER = "111111"
+
+class MockPlatformAdapter:
+    """模拟平台适配器，记录所有API调用"""
+
+    def __init__(self):
+        self.sent_messages = []
+        self.decisions = []
+        self.next_message_id = 1000
+        self.system_messages = {'join_requests': []}
+        self.recalled = []
+
+    async def get_stranger_info(self, user_id):
+        return {'nickname': f'昵称{user_id}'}
+
+    async def send_group_msg(self, group_id, message):
+        self.next_message_id += 1
+        self.sent_messages.append({'group_id': group_id, 'message': message, 'message_id': self.next_message_id})
+        return {'message_id': self.next_message_id}
+
+    async def get_group_system_msg(self):
+        return {'status': 'ok', 'data': self.system_messages}
+
+    async def set_group_add_request(self, **params):
+        self.decisions.append(params)
+        return {'status': 'ok'}
+
+    async def delete_msg(self, message_id):
+        self.recalled.append(message_id)
+        return {'status': 'ok'}
+
+class MockReply:
+    def __init__(self, message_id):
+        self.id = message_id
+        self.type = "Reply"
+
+def make_plugin(tmp_dir, **config):
+    """创建一个使用模拟适配器和临时状态文件的插件实例"""
+    adapter = MockPlatformAdapter()
+    context = SimpleNamespace(platform_manager=SimpleNamespace(platform_insts=[adapter]))
+    plugin = main.EntryReviewPluginFixed(context)
+    plugin.config = main.ConfigSnapshot.build({
+        'source_group_id': SOURCE_GROUP,
+        'target_group_id': REVIEW_GROUP,
+        'reviewers': [REVIEWER],
+        'auto_approve_timeout': 0,
+        'message_index_max_size': 1000,
+        'debug_mode': False,
+        'notification_template': {
+            'new_request': '新申请 {user_id}',
+            'approved': '已通过 {user_id}',
+            'rejected': '已拒绝 {user_id} {reason}',
+            'auto_approved': '自动通过 {user_id}'
+        }
+    }, config)
+    plugin.state_path = os.path.join(tmp_dir, "pending_requests.json")
+    return plugin, adapter
+
+def make_event(text, sender=REVIEWER, group_id=REVIEW_GROUP, reply_to=None):
+    """构造审核群中的消息事件"""
+    components = [MockReply(reply_to)] if reply_to is not None else []
+    message_obj = SimpleNamespace(
+        group_id=group_id,
+        sender=SimpleNamespace(user_id=sender),
+        message=components
+    )
+    return SimpleNamespace(message_str=text, message_obj=message_obj, raw_message={})
+
+def make_request(user_id, group_id=SOURCE_GROUP, flag=None):
+    """构造入群申请事件"""
+    return {
+        'request_type': 'group',
+        'sub_type': 'add',
+        'user_id': int(user_id),
+        'group_id': int(group_id),
+        'comment': '申请加群',
+        'flag': flag or f'flag_{user_id}'
+    }
+
+def pending_users(plugin):
+    """待处理申请的用户ID集合"""
+    return {request_info.user_id for request_info in plugin.store}
+
+def get_result_text(result):
+    """从结果对象中提取文本消息"""
+    if result is None:
+        return ""
+    return '\n'.join(item['data']['text'] for item in result.chain)
+
+def test_reply_to_card_review():
+    """回复审核卡片即可通过或拒绝申请"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(tmp_dir)
+            await plugin._process_group_request_new(make_request("10001"))
+            await plugin._process_group_request_new(make_request("10002"))
+            first_card, second_card = [m['message_id'] for m in adapter.sent_messages]
+
+            result = await plugin.handle_group_request_events(make_event("通过", reply_to=first_card))
+            assert "已通过 10001" in get_result_text(result)
+
+            result = await plugin.handle_group_request_events(make_event("拒绝 资料不全", reply_to=second_card))
+            assert "已拒绝 10002 资料不全" in get_result_text(result)
+
+            assert [d['approve'] for d in adapter.decisions] == [True, False]
+            assert not len(plugin.store)
+            assert not plugin.store.message_index_items()
+
+    asyncio.run(run())
+
+def test_reply_from_non_reviewer_is_rejected():
+    """非审核员回复卡片不会触发审核"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(tmp_dir)
+            await plugin._process_group_request_new(make_request("10001"))
+            card = adapter.sent_messages[0]['message_id']
+
+            result = await plugin.handle_group_request_events(make_event("通过", sender="999", reply_to=card))
+            assert "没有审核权限" in get_result_text(result)
+            assert not adapter.decisions
+            assert pending_users(plugin) == {10001}
+
+    asyncio.run(run())
+
+def test_message_index_persisted_and_bounded():
+    """卡片索引随申请持久化，并按最早优先淘汰"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(tmp_dir, message_index_max_size=2)
+            for user_id in ("10001", "10002", "10003"):
+                await plugin._process_group_request_new(make_request(user_id))
+            assert [key[1] for _, key in plugin.store.message_index_items()] == [10002, 10003]
+
+            restored, _ = make_plugin(tmp_dir)
+            restored.load_state()
+            assert pending_users(restored) == {10001, 10002, 10003}
+            assert restored.store.message_index_items() == plugin.store.message_index_items()
+
+    asyncio.run(run())
+
+def test_paginated_sorted_listing():
+    """/列表 按页返回，并支持按群号和风险分排序"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(tmp_dir, list_page_size=2, source_group_id="")
+            for user_id, group_id in (("10001", "300"), ("10002", "100"), ("10003", "200")):
+                await plugin._process_group_request_new(make_request(user_id, group_id=group_id))
+            request_info = plugin.store.get((200, 10003))
+            plugin.store.remove(request_info)
+            request_info.risk_score = 90
+            plugin.store.add(request_info)
+
+            text = get_result_text(await plugin.handle_group_request_events(make_event("/列表")))
+            assert "第 1/2 页" in text and "(10001)" in text and "(10003)" not in text
+
+            text = get_result_text(await plugin.handle_group_request_events(make_event("/列表 1 群")))
+            assert text.index("(10002)") < text.index("(10003)")
+
+            text = get_result_text(await plugin.handle_group_request_events(make_event("/列表 风险")))
+            assert text.index("(10003)") < text.index("(10001)")
+
+            text = get_result_text(await plugin.handle_group_request_events(make_event("/列表 2 风险")))
+            assert "第 2/2 页" in text and "(10002)" in text
+
+            await plugin._cleanup_request(plugin.store.get((300, 10001)))
+            assert all(len(index) == 2 for index in plugin.store.sorted_indexes.values())
+
+    asyncio.run(run())
+
+def test_split_message_respects_length_limit():
+    """长列表被拆分为多条不超过长度限制的消息"""
+    lines = [f"第{i}行" + "x" * 20 for i in range(100)]
+    chunks = main.EntryReviewPluginFixed._split_message(lines, 100)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert "\n".join(chunks).split("\n") == lines
+
+def test_startup_reconciliation():
+    """启动对账补录离线期间的申请，并移除平台侧已处理的申请"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(tmp_dir)
+            await plugin._process_group_request_new(make_request("10001"))
+            await plugin._process_group_request_new(make_request("10002"))
+            await plugin._process_group_request_new(make_request("10005", flag="new5"))
+            adapter.system_messages['join_requests'] = [
+                # 10005 之前被处理过的旧申请按 flag 区分，不影响其新申请
+                {'flag': 'old5', 'requester_uin': 10005, 'group_id': int(SOURCE_GROUP), 'message': '', 'checked': True},
+                {'flag': 'new5', 'requester_uin': 10005, 'group_id': int(SOURCE_GROUP), 'message': '', 'checked': False},
+                {'request_id': 1, 'requester_uin': 10001, 'group_id': int(SOURCE_GROUP), 'message': '', 'checked': True},
+                {'request_id': 2, 'requester_uin': 10002, 'group_id': int(SOURCE_GROUP), 'message': '', 'checked': False},
+                {'request_id': 3, 'requester_uin': 10003, 'group_id': int(SOURCE_GROUP), 'message': '离线期间', 'checked': False},
+                {'request_id': 4, 'requester_uin': 10004, 'group_id': 555, 'message': '', 'checked': False},
+            ]
+            sent_before = len(adapter.sent_messages)
+
+            await plugin._reconcile_system_messages()
+
+            assert pending_users(plugin) == {10002, 10003, 10005}
+            assert plugin.store.get((int(SOURCE_GROUP), 10003)).flag == "3"
+            assert len(adapter.sent_messages) == sent_before + 1
+
+    asyncio.run(run())
+
+def test_cancelled_decision_releases_claim():
+    """被取消的审核决定撤销共享存储中的登记，重试时能正常审核"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(
+                tmp_dir, lease_store_path=os.path.join(tmp_dir, "leases.db"), instance_id="a", source_group_id=""
+            )
+            plugin._init_lease_store()
+            plugin.store.add(main.JoinRequest(10001, SOURCE_GROUP, flag='f1'))
+            original = adapter.set_group_add_request
+
+            async def hanging_decision(**params):
+                await asyncio.sleep(60)
+            adapter.set_group_add_request = hanging_decision
+
+            task = asyncio.create_task(plugin._decide("10001", approve=True, operator=REVIEWER))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            assert plugin.store.get((int(SOURCE_GROUP), 10001)).status == 'failed'
+
+            adapter.set_group_add_request = original
+            outcome, _ = await plugin._decide("10001", approve=True, operator=REVIEWER)
+            assert outcome == 'approved' and len(adapter.decisions) == 1
+            plugin._lease_task.cancel()
+
+    asyncio.run(run())
+
+def test_terminate_drains_in_flight_work():
+    """终止时等待进行中的申请处理，取消未触发的定时器并持久化状态"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(tmp_dir, auto_approve_timeout=3600, shutdown_drain_timeout=5)
+            original_lookup = adapter.get_stranger_info
+
+            async def slow_lookup(user_id):
+                await asyncio.sleep(0.05)
+                return await original_lookup(user_id)
+            adapter.get_stranger_info = slow_lookup
+
+            await plugin._handle_request_event(make_request("10001"))
+            await plugin._handle_request_event(make_request("10002"))
+            assert not len(plugin.store)
+
+            report = await plugin._drain(5)
+            assert report == {'unfinished_tasks': 0, 'cancelled_timers': 2, 'pending_requests': 2, 'unsent_cards': 0}
+            assert len(adapter.sent_messages) == 2
+
+            # 终止后不再接收新的申请
+            await plugin._handle_request_event(make_request("10003"))
+            await asyncio.sleep(0)
+            assert 10003 not in pending_users(plugin)
+
+            restored, _ = make_plugin(tmp_dir)
+            restored.load_state()
+            assert pending_users(restored) == {10001, 10002}
+
+    asyncio.run(run())
+
+def test_terminate_reports_work_past_deadline():
+    """超过期限仍未完成的任务会被取消并计入报告"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(tmp_dir)
+
+            async def hanging_lookup(user_id):
+                await asyncio.sleep(60)
+            adapter.get_stranger_info = hanging_lookup
+
+            await plugin._handle_request_event(make_request("10001"))
+            report = await plugin._drain(0.05)
+            assert report['unfinished_tasks'] == 1
+            assert not adapter.sent_messages
+
+    asyncio.run(run())
+
+def test_multi_instance_lease_ownership():
+    """两个实例共享租约存储时，同一申请只由持有源群租约的实例处理"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            lease_path = os.path.join(tmp_dir, "leases.db")
+            instances = []
+            for name in ("a", "b"):
+                instance_dir = os.path.join(tmp_dir, name)
+                os.makedirs(instance_dir)
+                plugin, adapter = make_plugin(instance_dir, lease_store_path=lease_path, instance_id=name, lease_ttl=30)
+                plugin._init_lease_store()
+                instances.append((plugin, adapter))
+            (plugin_a, adapter_a), (plugin_b, adapter_b) = instances
+
+            await plugin_a._process_group_request_new(make_request("10001"))
+            await plugin_b._process_group_request_new(make_request("10001"))
+            assert pending_users(plugin_a) == {10001} and not len(plugin_b.store)
+            assert len(adapter_a.sent_messages) == 1 and not adapter_b.sent_messages
+
+            # 实例 a 正常终止后释放租约，实例 b 立即接管并对账
+            await plugin_a._drain(1)
+            adapter_b.system_messages['join_requests'] = [
+                {'request_id': 7, 'requester_uin': 10002, 'group_id': int(SOURCE_GROUP), 'message': '', 'checked': False}
+            ]
+            await plugin_b._process_group_request_new(make_request("10003"))
+            await asyncio.gather(*plugin_b._active_tasks)
+            assert pending_users(plugin_b) == {10002, 10003}
+            await plugin_b._drain(1)
+
+    asyncio.run(run())
+
+def test_multi_instance_decision_claimed_once():
+    """两个实例同时审核同一申请时只调用一次审核接口"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            lease_path = os.path.join(tmp_dir, "leases.db")
+            plugins = []
+            for name in ("a", "b"):
+                instance_dir = os.path.join(tmp_dir, name)
+                os.makedirs(instance_dir)
+                plugin, adapter = make_plugin(instance_dir, lease_store_path=lease_path, instance_id=name, source_group_id="")
+                plugin._init_lease_store()
+                # 模拟租约切换前两个实例都登记了同一申请
+                plugin.store.add(main.JoinRequest(10001, SOURCE_GROUP, flag='f1'))
+                plugins.append((plugin, adapter))
+
+            results = await asyncio.gather(*(
+                plugin._approve_request(None, "10001", REVIEWER) for plugin, _ in plugins
+            ))
+            texts = [get_result_text(result) for result in results]
+            assert sum(len(adapter.decisions) > 0 for _, adapter in plugins) == 1
+            assert any("其他实例" in text for text in texts)
+            for plugin, _ in plugins:
+                await plugin._drain(1)
+
+    asyncio.run(run())
+
+def test_multi_instance_not_found_replied_by_group_owner():
+    """申请登记在其他实例时，持有审核群租约的实例不回复未找到"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            lease_path = os.path.join(tmp_dir, "leases.db")
+            instances = []
+            for name in ("a", "b"):
+                instance_dir = os.path.join(tmp_dir, name)
+                os.makedirs(instance_dir)
+                plugin, adapter = make_plugin(instance_dir, lease_store_path=lease_path, instance_id=name, lease_ttl=30)
+                plugin._init_lease_store()
+                instances.append((plugin, adapter))
+            (plugin_a, _), (plugin_b, _) = instances
+
+            # 实例 a 持有审核群租约，实例 b 持有源群租约并登记了申请
+            assert await plugin_a._hold_lease(f"review:{REVIEW_GROUP}")
+            await plugin_b._process_group_request_new(make_request("10001"))
+            assert get_result_text(await plugin_a.handle_group_request_events(make_event("/查看 10001"))) == ""
+            assert "10001" in get_result_text(await plugin_b.handle_group_request_events(make_event("/查看 10001")))
+
+            # 无人负责的群由实例 a 回复；未限定源群时只要其他实例持有源群就不回复
+            assert "未找到" in get_result_text(await plugin_a.handle_group_request_events(make_event("/查看 10002:555")))
+            plugin_a.config = plugin_a.config.replace(source_group_id="")
+            assert get_result_text(await plugin_a.handle_group_request_events(make_event("/查看 10002"))) == ""
+            for plugin, _ in instances:
+                await plugin._drain(1)
+
+    asyncio.run(run())
+
+FAST_RETRY = {'max_attempts': 3, 'base_delay': 0.001, 'max_delay': 0.001}
+
+def test_platform_call_retries_transient_errors():
+    """连接类故障按退避策略重试，业务错误不重试"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(tmp_dir, retry_policies={'send_group_msg': FAST_RETRY})
+            original_send = adapter.send_group_msg
+            calls = []
+
+            async def flaky_send(group_id, message):
+                calls.append(message)
+                if len(calls) < 3:
+                    raise ConnectionRefusedError("NapCat 重启中")
+                return await original_send(group_id, message)
+            adapter.send_group_msg = flaky_send
+
+            await plugin.send_message_to_group(REVIEW_GROUP, "hello")
+            assert len(calls) == 3 and plugin.api_metrics['retries'] == 2
+
+            # 超时后消息可能已经发出，发送消息不重试；审核决定可以安全重试
+            async def timed_out(**params):
+                calls.append(params)
+                raise asyncio.TimeoutError()
+            adapter.send_group_msg = timed_out
+            calls.clear()
+            try:
+                await plugin._call_platform_api('send_group_msg', group_id=REVIEW_GROUP, message="hello")
+            except asyncio.TimeoutError:
+                pass
+            assert len(calls) == 1 and plugin.api_metrics['ambiguous_failures'] == 1
+            adapter.set_group_add_request = timed_out
+            calls.clear()
+            plugin.config = plugin.config.replace(retry_policies={'set_group_add_request': FAST_RETRY})
+            try:
+                await plugin._call_platform_api('set_group_add_request', flag='f', approve=True)
+            except asyncio.TimeoutError:
+                pass
+            assert len(calls) == FAST_RETRY['max_attempts']
+
+            async def invalid_request(**params):
+                calls.append(params)
+                raise ValueError("invalid flag")
+            adapter.send_group_msg = invalid_request
+            calls.clear()
+            try:
+                await plugin.send_message_to_group(REVIEW_GROUP, "hello")
+            except ValueError:
+                pass
+            assert len(calls) == 1
+
+    asyncio.run(run())
+
+def test_circuit_breaker_fails_fast_and_recovers():
+    """熔断器打开后快速失败，半开探测成功后关闭"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(
+                tmp_dir, circuit_failure_threshold=2, circuit_reset_timeout=0.05,
+                retry_policies={'set_group_add_request': FAST_RETRY}
+            )
+            healthy_decide = adapter.set_group_add_request
+            calls = []
+
+            async def down(**params):
+                calls.append(params)
+                raise ConnectionError("NapCat 重启中")
+            adapter.set_group_add_request = down
+
+            request_info = main.JoinRequest(10001, SOURCE_GROUP, flag='f1')
+            assert not await plugin._call_set_group_add_request(request_info, approve=True)
+            assert len(calls) == 2
+            assert plugin.api_metrics['circuit_open'] == 1
+
+            # 熔断期间不会再访问平台
+            assert not await plugin._call_set_group_add_request(request_info, approve=True)
+            assert len(calls) == 2 and plugin.api_metrics['fast_failures'] >= 1
+
+            await asyncio.sleep(0.06)
+            # 半开探测被取消后，下一次调用仍可作为探测放行
+            async def hang(**params):
+                await asyncio.sleep(10)
+            adapter.set_group_add_request = hang
+            probe = asyncio.create_task(plugin._call_set_group_add_request(request_info, approve=True))
+            await asyncio.sleep(0.01)
+            probe.cancel()
+            await asyncio.gather(probe, return_exceptions=True)
+            adapter.set_group_add_request = healthy_decide
+            assert await plugin._call_set_group_add_request(request_info, approve=True)
+            assert plugin.api_metrics['circuit_half_open'] == 1
+            assert plugin.api_metrics['circuit_closed'] == 1
+
+    asyncio.run(run())
+
+def test_concurrent_decisions_are_exactly_once():
+    """压力测试：大量并发的通过/拒绝/自动通过只会产生一次审核决定"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(tmp_dir, source_group_id="")
+            plugin.save_state = lambda: None
+            original_decide = adapter.set_group_add_request
+
+            async def slow_decide(**params):
+                await asyncio.sleep(random.random() * 0.002)
+                return await original_decide(**params)
+            adapter.set_group_add_request = slow_decide
+
+            request_count, deciders_per_request = 500, 8
+            for i in range(request_count):
+                plugin.store.add(main.JoinRequest(20000 + i, SOURCE_GROUP, flag=f'flag_{i}'))
+
+            async def decider(user_id, kind):
+                await asyncio.sleep(random.random() * 0.002)
+                if kind == 0:
+                    return (await plugin._decide(user_id, approve=True, operator=REVIEWER))[0]
+                if kind == 1:
+                    return (await plugin._decide(user_id, approve=False, operator=REVIEWER))[0]
+                return (await plugin._decide(user_id, approve=True, auto=True))[0]
+
+            outcomes = await asyncio.gather(*(
+                decider(20000 + i, k % 3)
+                for i in range(request_count) for k in range(deciders_per_request)
+            ))
+
+            decided = Counter(outcome for outcome in outcomes if outcome in ('approved', 'rejected', 'auto_approved'))
+            assert sum(decided.values()) == request_count
+
+            # 状态机不允许的切换不生效（不依赖 assert，python -O 下同样成立）
+            request_info = main.JoinRequest(30000, SOURCE_GROUP, flag='flag_x')
+            assert not plugin._transition(request_info, ('pending',), 'approved')
+            assert request_info.status == 'pending'
+            assert set(outcomes) <= {'approved', 'rejected', 'auto_approved', 'busy', 'not_found'}
+            calls_per_flag = Counter(call['flag'] for call in adapter.decisions)
+            assert len(calls_per_flag) == request_count and set(calls_per_flag.values()) == {1}
+            assert not len(plugin.store)
+
+    asyncio.run(run())
+
+def test_legacy_state_loads_into_compact_records():
+    """旧版以字符串字典保存的状态可以恢复为紧凑记录"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        plugin, _ = make_plugin(tmp_dir)
+        with open(plugin.state_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'pending_requests': {"10001": {
+                    'user_id': "10001", 'group_id': SOURCE_GROUP, 'nickname': '用户10001', 'comment': '',
+                    'flag': 'f1', 'timestamp': 1700000000, 'status': 'deciding', 'message_id': "555"
+                }},
+                'message_index': [["555", "10001"]]
+            }, f)
+        plugin.load_state()
+        record = plugin.store.get((int(SOURCE_GROUP), 10001))
+        assert isinstance(record, main.JoinRequest) and not hasattr(record, '__dict__')
+        assert record.group_id == int(SOURCE_GROUP) and record.status == 'pending'
+        assert record.nickname == '用户10001' and record.to_dict()['nickname'] == ''
+        assert plugin.store.by_message(555) is record
+
+def test_same_user_in_multiple_groups():
+    """同一用户申请多个群时各自独立保存，按 QQ号:群号 指定审核目标"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(tmp_dir, source_group_id="")
+            await plugin._process_group_request_new(make_request("10001", group_id="100", flag="fa"))
+            await plugin._process_group_request_new(make_request("10001", group_id="200", flag="fb"))
+            assert len(plugin.store) == 2
+            assert {r.group_id for r in plugin.store.by_user(10001)} == {100, 200}
+            assert plugin.store.by_flag("fb").group_id == 200
+            assert plugin.store.by_message(adapter.sent_messages[0]['message_id']).group_id == 100
+
+            text = get_result_text(await plugin.handle_group_request_events(make_event("/通过 10001")))
+            assert "多个群" in text and not adapter.decisions
+
+            text = get_result_text(await plugin.handle_group_request_events(make_event("/通过 10001:200")))
+            assert "已通过 10001" in text and adapter.decisions[0]['flag'] == "fb"
+            assert [r.group_id for r in plugin.store.by_user(10001)] == [100]
+            assert plugin.store.by_flag("fb") is None and plugin.store.group_sizes() == {100: 1}
+
+            # 只剩一个申请时可以直接使用 QQ号
+            text = get_result_text(await plugin.handle_group_request_events(make_event("/拒绝 10001")))
+            assert "已拒绝 10001" in text and not len(plugin.store)
+
+    asyncio.run(run())
+
+def test_pending_store_evicts_expired_and_over_budget():
+    """待处理存储按申请时间淘汰过期和超出数量预算的申请，并通知审核群"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(
+                tmp_dir, pending_max_count=3, pending_max_age=3600, evict_notify=True, auto_approve_timeout=3600
+            )
+            now = int(time.time())
+            stale = main.JoinRequest(10000, SOURCE_GROUP, flag='old', timestamp=now - 7200)
+            plugin.store.add(stale)
+            busy = main.JoinRequest(10009, SOURCE_GROUP, flag='busy', timestamp=now - 7200, status='deciding')
+            plugin.store.add(busy)
+            for user_id in ("10001", "10002", "10003"):
+                await plugin._process_group_request_new(make_request(user_id))
+
+            # 过期的申请最先淘汰，决定中的申请保留，其余按最早优先淘汰到数量预算以内
+            assert pending_users(plugin) == {10009, 10002, 10003}
+            assert plugin.store_metrics == {'evicted_expired': 1, 'evicted_over_budget': 1}
+            assert (int(SOURCE_GROUP), 10001) not in plugin._timer_tasks
+            assert plugin.store.total_bytes == sum(r.approx_size() for r in plugin.store)
+            notices = [m['message'] for m in adapter.sent_messages if '已从待处理列表移除' in m['message']]
+            assert len(notices) == 2 and "(10000)" in notices[0] and "(10001)" in notices[1]
+
+            text = get_result_text(await plugin.handle_group_request_events(make_event("/审核状态")))
+            assert "3/3 条" in text and "近1小时 2 条" in text
+            await plugin._drain(1)
+
+    asyncio.run(run())
+
+def test_intake_modes_share_one_engine():
+    """poll 模式只依赖轮询，hybrid 模式下轮询只补录推送遗漏的申请"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(tmp_dir, intake_mode="poll", poll_interval=1)
+            plugin.load_config = lambda: None
+            registered = []
+
+            async def register_event_handler(event_type, handler):
+                registered.append(event_type)
+            adapter.register_event_handler = register_event_handler
+            adapter.system_messages['join_requests'] = [
+                {'request_id': 1, 'requester_uin': 10001, 'group_id': int(SOURCE_GROUP), 'message': '', 'checked': False}
+            ]
+            await plugin.initialize()
+            await asyncio.sleep(0.01)
+            assert 'request' not in registered and pending_users(plugin) == {10001}
+            assert (plugin.intake_metrics['polls'], plugin.intake_metrics['poll_recovered']) == (1, 1)
+            await plugin._drain(1)
+            assert plugin._poll_task.cancelled()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(tmp_dir, intake_mode="hybrid")
+            plugin.load_config = lambda: None
+            adapter.register_event_handler = register_event_handler
+            registered.clear()
+            await plugin.initialize()
+            assert registered == ['request', 'notice']
+            await plugin._handle_request_event(make_request("10002"))
+            await asyncio.gather(*plugin._active_tasks)
+
+            # 10002 已通过推送收到，轮询只补录推送丢失的 10003
+            adapter.system_messages['join_requests'] = [
+                {'request_id': 2, 'requester_uin': 10002, 'group_id': int(SOURCE_GROUP), 'message': '', 'checked': False},
+                {'request_id': 3, 'requester_uin': 10003, 'group_id': int(SOURCE_GROUP), 'message': '', 'checked': False},
+            ]
+            assert await plugin._reconcile_system_messages() == 1
+            assert pending_users(plugin) == {10002, 10003}
+            assert plugin.intake_metrics['pushed'] == 1
+            assert len(adapter.sent_messages) == 2
+            await plugin._drain(1)
+
+    asyncio.run(run())
+
+def test_sequence_tracker_detects_gaps_and_silence():
+    """序号跳跃记为缺口，超过平均间隔数倍的静默只报告一次"""
+    tracker = main.SequenceTracker(seq_step=1, silence_factor=4, min_silence=10)
+    assert main.SequenceTracker.parse_sequence({'seq': '1005'}) == 1005
+    # flag 是全局的，不作为按群序号
+    assert main.SequenceTracker.parse_sequence({'flag': '1005_abc'}) is None
+    assert not tracker.observe(100, 1, now=0)
+    assert not tracker.observe(100, 2, now=5)
+    assert tracker.observe(100, 4, now=10)
+    assert not tracker.observe(100, 3, now=11)  # 迟到的事件不回退序号
+    assert tracker.suspects(now=12) == {100: 'gap'}
+    tracker.resolve({100})
+    assert tracker.suspects(now=12) == {}
+    assert tracker.suspects(now=40) == {100: 'silence'}
+    assert tracker.suspects(now=50) == {}
+
+def test_hybrid_reconciles_only_groups_with_gaps():
+    """hybrid 模式下推送序号出现缺口时，只对该群对账补录"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(
+                tmp_dir, intake_mode="hybrid", source_group_id="", hybrid_poll_interval=3600, gap_check_interval=1,
+                gap_seq_step=1
+            )
+            plugin.load_config = lambda: None
+            await plugin.initialize()
+            await asyncio.sleep(0.05)
+            assert plugin.intake_metrics['polls'] == 1
+
+            adapter.system_messages['join_requests'] = [
+                {'request_id': 2, 'requester_uin': 10002, 'group_id': 100, 'message': '', 'checked': False},
+                {'request_id': 9, 'requester_uin': 10009, 'group_id': 200, 'message': '', 'checked': False},
+            ]
+            await plugin._handle_request_event(dict(make_request("10001", group_id="100", flag="1"), seq=1))
+            await plugin._handle_request_event(dict(make_request("10003", group_id="100", flag="3"), seq=3))
+            # 缺口检查每秒一次，等待它触发的对账完成而不是固定睡眠
+            for _ in range(100):
+                if plugin.intake_metrics['polls'] == 2:
+                    break
+                await asyncio.sleep(0.05)
+
+            assert plugin.intake_metrics['gap_checks'] == 1 and plugin.intake_metrics['polls'] == 2
+            assert pending_users(plugin) == {10001, 10002, 10003}
+            await plugin._drain(1)
+
+    asyncio.run(run())
+
+def test_slo_watchdog_escalates_backlog():
+    """积压超出 SLO 时先发送汇总，冷却期后仍未恢复则 @ 审核员"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(tmp_dir, slo_max_wait=600, slo_max_depth=2, slo_escalation_cooldown=60)
+            now = int(time.time())
+            for user_id in (10001, 10002, 10003):
+                plugin.store.add(main.JoinRequest(user_id, 100, timestamp=now))
+            stale = main.JoinRequest(10004, 200, timestamp=now - 1200)
+            plugin.store.add(stale)
+            plugin.store.add(main.JoinRequest(10005, 300, timestamp=now))
+
+            assert plugin.store.oldest() is stale
+            # 按群查找最早的申请按申请时间而不是登记顺序
+            restored = main.JoinRequest(10006, 100, timestamp=now - 60)
+            plugin.store.add(restored)
+            assert plugin.store.oldest(100) is restored and plugin.store.oldest(999) is None
+            plugin.store.remove(restored)
+            assert sorted(plugin._check_slo(now)) == [(100, 3, 0), (200, 1, 1200)]
+
+            await plugin._escalate_slo_breaches(plugin._check_slo(now), now=0)
+            assert len(adapter.sent_messages) == 1
+            alert = adapter.sent_messages[0]['message']
+            assert "群100: 待处理 3 条" in alert and "群200" in alert and "群300" not in alert
+            assert "CQ:at" not in alert
+
+            # 冷却期内不重复告警，之后仍未恢复则提醒审核员
+            await plugin._escalate_slo_breaches(plugin._check_slo(now), now=30)
+            assert len(adapter.sent_messages) == 1
+            await plugin._cleanup_request(stale)
+            await plugin._escalate_slo_breaches(plugin._check_slo(now), now=90)
+            assert len(adapter.sent_messages) == 2
+            assert f"[CQ:at,qq={REVIEWER}]" in adapter.sent_messages[1]['message']
+            assert set(plugin._slo_state) == {100}
+            assert plugin.slo_metrics == {'breaches': 2, 'escalations': 2}
+
+    asyncio.run(run())
+
+def test_reviewer_assignment_balances_and_reassigns():
+    """新申请按最少未处理数指派给审核员，超时后改派给其他审核员"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(
+                tmp_dir, reviewers=["a", "b", "c"], assignment_strategy="least_outstanding", assignment_timeout=60
+            )
+            plugin._init_assigner()
+            for user_id in ("10001", "10002", "10003", "10004"):
+                await plugin._process_group_request_new(make_request(user_id))
+            assert plugin.assigner.outstanding == {'a': 2, 'b': 1, 'c': 1}
+            assert "[CQ:at,qq=a]" in adapter.sent_messages[0]['message']
+
+            # a 的申请处理后，下一条申请指派给未处理数最少的审核员
+            await plugin._cleanup_request(plugin.store.get((int(SOURCE_GROUP), 10001)))
+            await plugin._cleanup_request(plugin.store.get((int(SOURCE_GROUP), 10004)))
+            await plugin._process_group_request_new(make_request("10005"))
+            assert plugin.store.get((int(SOURCE_GROUP), 10005)).assignee == "a"
+
+            # 超时未处理的指派改派给其他审核员，并在审核群提醒
+            first = plugin.store.get((int(SOURCE_GROUP), 10002))
+            assert await plugin._reassign_timed_out(now=first.assigned_at + 61) == 3
+            assert first.assignee != "b"
+            assert sum(plugin.assigner.outstanding.values()) == 3
+            assert "已改派给" in adapter.sent_messages[-1]['message']
+
+            # 暂存的申请不改派
+            sent = len(adapter.sent_messages)
+            for request_info in plugin.store:
+                request_info.held = 'import'
+            assert await plugin._reassign_timed_out(now=first.assigned_at + 3600) == 0
+            assert len(adapter.sent_messages) == sent
+            for request_info in plugin.store:
+                request_info.held = None
+
+            # 指派随申请持久化，重启后恢复计数
+            restored, _ = make_plugin(tmp_dir, reviewers=["a", "b", "c"], assignment_strategy="least_outstanding")
+            restored.load_state()
+            restored._init_assigner()
+            assert restored.assigner.outstanding == plugin.assigner.outstanding
+
+    asyncio.run(run())
+
+def test_stale_cards_recalled_within_outbound_budget():
+    """决定后的审核卡片在出站限流预算内撤回，预算不足时留到下一轮"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(tmp_dir, card_cleanup="recall", outbound_rate=0.001, outbound_burst=4)
+            await plugin._process_group_request_new(make_request("10001"))
+            await plugin._process_group_request_new(make_request("10002"))
+            cards = [m['message_id'] for m in adapter.sent_messages]
+            await plugin.handle_group_request_events(make_event("/通过 10001"))
+            await plugin.handle_group_request_events(make_event("/拒绝 10002"))
+
+            # 两条通知用掉两个令牌，撤回时始终保留一个令牌给新申请
+            assert await plugin._flush_stale_cards() == 1
+            assert adapter.recalled == cards[:1] and len(plugin._stale_cards) == 1
+            plugin._outbound_limiter.tokens = 4
+            assert await plugin._flush_stale_cards() == 1
+            assert adapter.recalled == cards and plugin.card_metrics['recalled'] == 2
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # 终止时在期限内处理剩余卡片，预算不足的计入未处理卡片
+            plugin, adapter = make_plugin(tmp_dir, card_cleanup="recall", outbound_rate=0.001, outbound_burst=5)
+            for user_id in ("10001", "10002", "10003"):
+                await plugin._process_group_request_new(make_request(user_id))
+                await plugin.handle_group_request_events(make_event(f"/通过 {user_id}"))
+            report = await plugin._drain(1)
+            assert len(adapter.recalled) == 1 and report['unsent_cards'] == 2
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(tmp_dir, card_cleanup="summary")
+            for user_id in ("10001", "10002", "10003"):
+                await plugin._process_group_request_new(make_request(user_id))
+                await plugin.handle_group_request_events(make_event(f"/通过 {user_id}"))
+            assert await plugin._flush_stale_cards() == 3
+            summary = adapter.sent_messages[-1]['message']
+            assert len(adapter.sent_messages) == 4 and "已处理 3 条申请" in summary and "(10003)" in summary
+
+            # 超出消息长度的条目留到下一轮汇总，不会丢失
+            plugin.config = plugin.config.replace(max_message_length=120)
+            for user_id in ("10004", "10005", "10006"):
+                await plugin._process_group_request_new(make_request(user_id))
+                await plugin.handle_group_request_events(make_event(f"/通过 {user_id}"))
+            sent_before = len(adapter.sent_messages)
+            assert await plugin._flush_stale_cards() == 2 and len(plugin._stale_cards) == 1
+            assert await plugin._flush_stale_cards() == 1
+            summaries = '\n'.join(m['message'] for m in adapter.sent_messages[sent_before:])
+            assert all(len(m['message']) <= 120 for m in adapter.sent_messages[sent_before:])
+            assert all(f"({user_id})" in summaries for user_id in ("10004", "10005", "10006"))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # 合并卡片在全部申请处理完后只撤回一次
+            plugin, adapter = make_plugin(tmp_dir, card_cleanup="recall", source_group_id="", aggregate_quiet=0.02)
+            for group_id in ("100", "200", "300"):
+                await plugin._process_group_request_new(make_request("10001", group_id=group_id, flag=f"f{group_id}"))
+            await asyncio.sleep(0.05)
+            card = adapter.sent_messages[-1]['message_id']
+            await plugin.handle_group_request_events(make_event("/通过 10001:100"))
+            await plugin._flush_stale_cards()
+            assert card not in adapter.recalled
+            await plugin.handle_group_request_events(make_event("/全部通过 10001"))
+            await plugin._flush_stale_cards()
+            assert adapter.recalled.count(card) == 1 and not plugin._stale_cards
+
+    asyncio.run(run())
+
+def test_member_cache_skips_existing_members():
+    """成员列表只加载一次并由入群/退群通知维护，已是成员的申请人被标注或直接通过"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(tmp_dir, member_check_groups=[555])
+            loads = []
+
+            async def get_group_member_list(group_id):
+                loads.append(group_id)
+                await asyncio.sleep(0.01)
+                members = {int(SOURCE_GROUP): [10001], 555: [10002]}[group_id]
+                return [{'user_id': user_id} for user_id in members]
+            adapter.get_group_member_list = get_group_member_list
+
+            # 并发的首次加载只请求一次，加载期间收到的通知在加载后补上
+            async def notice_during_load():
+                await asyncio.sleep(0)
+                await plugin._handle_notice_event({'notice_type': 'group_increase', 'group_id': 555, 'user_id': 10003})
+            await asyncio.gather(
+                plugin._find_membership(10009, int(SOURCE_GROUP)),
+                plugin._find_membership(10009, int(SOURCE_GROUP)),
+                plugin._load_members(555),
+                notice_during_load(),
+            )
+            assert sorted(loads) == [555, int(SOURCE_GROUP)]
+            assert plugin.member_sets[555] == {10002, 10003}
+
+            await plugin._process_group_request_new(make_request("10002"))
+            assert "已是群 555 的成员" in adapter.sent_messages[-1]['message']
+
+            await plugin._handle_notice_event({'notice_type': 'group_decrease', 'group_id': 555, 'user_id': 10002})
+            await plugin._process_group_request_new(make_request("10004"))
+            assert "成员" not in adapter.sent_messages[-1]['message']
+            assert 10002 not in plugin.member_sets[555]
+
+            # 通过客户端直接入群后待处理申请被移除
+            await plugin._handle_notice_event({'notice_type': 'group_increase', 'group_id': int(SOURCE_GROUP), 'user_id': 10004})
+            assert (int(SOURCE_GROUP), 10004) not in plugin.store
+
+            plugin.config = plugin.config.replace(member_action='approve')
+            sent_before = len(adapter.sent_messages)
+            await plugin._process_group_request_new(make_request("10001"))
+            assert len(adapter.sent_messages) == sent_before
+            assert adapter.decisions[-1]['approve'] and (int(SOURCE_GROUP), 10001) not in plugin.store
+            assert len(loads) == 2
+
+    asyncio.run(run())
+
+def test_multi_group_applications_aggregate_into_one_card():
+    """同一申请人短时间内申请多个群时合并为一张卡片，一条命令或一次回复处理全部申请"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(tmp_dir, source_group_id="", aggregate_quiet=0.02)
+            for group_id in ("100", "200", "300"):
+                await plugin._process_group_request_new(make_request("10001", group_id=group_id, flag=f"f{group_id}"))
+            # 第一个申请立即发卡，之后的申请等待申请人停止提交后合并发送一次
+            assert len(adapter.sent_messages) == 1
+            first_card = adapter.sent_messages[0]['message_id']
+            await asyncio.sleep(0.05)
+            assert len(adapter.sent_messages) == 2
+            card = adapter.sent_messages[-1]
+            assert "3 个群" in card['message'] and "100, 200, 300" in card['message']
+            assert {r.message_id for r in plugin.store.by_user(10001)} == {card['message_id']}
+            # 被合并卡片取代的单独卡片被撤回，不再指向申请
+            assert adapter.recalled == [first_card] and plugin.store.by_message(first_card) is None
+
+            # 单独处理索引所指的最新申请后，回复合并卡片仍处理其余申请
+            await plugin.handle_group_request_events(make_event("/通过 10001:300"))
+            assert plugin.store.by_message(card['message_id']) is not None
+            text = get_result_text(await plugin.handle_group_request_events(
+                make_event("通过", reply_to=card['message_id'])))
+            assert "2 个申请" in text and not len(plugin.store)
+            adapter.decisions.clear()
+
+            for group_id in ("100", "200", "300"):
+                await plugin._process_group_request_new(make_request("10004", group_id=group_id, flag=f"f{group_id}"))
+            await asyncio.sleep(0.05)
+            card = adapter.sent_messages[-1]
+
+            # 回复合并卡片并发处理全部申请
+            text = get_result_text(await plugin.handle_group_request_events(
+                make_event("拒绝 重复申请", reply_to=card['message_id'])))
+            assert "3 个申请" in text and not len(plugin.store)
+            assert sorted(d['flag'] for d in adapter.decisions) == ["f100", "f200", "f300"]
+            assert all(not d['approve'] and d['reason'] == "重复申请" for d in adapter.decisions)
+
+            await plugin._process_group_request_new(make_request("10002", group_id="100"))
+            await plugin._process_group_request_new(make_request("10002", group_id="200"))
+            text = get_result_text(await plugin.handle_group_request_events(make_event("/全部通过 10002")))
+            assert "2 个申请" in text and not len(plugin.store)
+
+            plugin.config = plugin.config.replace(aggregate_window=0)
+            await plugin._process_group_request_new(make_request("10003", group_id="100"))
+            await plugin._process_group_request_new(make_request("10003", group_id="200"))
+            await asyncio.sleep(0.05)
+            assert sum("10003" in m['message'] for m in adapter.sent_messages) == 2
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # 合并卡片沿用单独卡片已指派的审核员，全部申请指派给同一人
+            plugin, adapter = make_plugin(tmp_dir, source_group_id="", aggregate_quiet=0.02,
+                                          reviewers=["a", "b"], assignment_strategy="least_outstanding")
+            plugin._init_assigner()
+            for group_id in ("100", "200"):
+                await plugin._process_group_request_new(make_request("10001", group_id=group_id))
+            await asyncio.sleep(0.05)
+            assert "[CQ:at,qq=a]" in adapter.sent_messages[-1]['message']
+            assert {r.assignee for r in plugin.store.by_user(10001)} == {"a"}
+            assert plugin.assigner.outstanding == {"a": 2, "b": 0}
+
+    asyncio.run(run())
+
+def test_sliding_window_counter_expires_buckets():
+    """滑动窗口计数按桶过期，空闲的键被清理"""
+    counter = main.SlidingWindowCounter(60, buckets=6)
+    assert [counter.hit(1, t) for t in (0, 5, 15)] == [1, 2, 3]
+    assert counter.count(1, 59) == 3
+    assert counter.count(1, 65) == 1
+    assert counter.hit(1, 80) == 1
+    assert counter.prune(200) == 1 and len(counter) == 0
+
+def test_repeated_applications_are_suppressed():
+    """窗口内超过次数上限的申请不再发送卡片，按配置静默保存或直接拒绝"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(tmp_dir, reapply_limit=2, aggregate_window=0)
+            lookups = []
+            get_stranger_info = adapter.get_stranger_info
+
+            async def counting_stranger_info(**params):
+                lookups.append(params['user_id'])
+                return await get_stranger_info(**params)
+            adapter.get_stranger_info = counting_stranger_info
+
+            for _ in range(2):
+                await plugin._process_group_request_new(make_request("10001"))
+            assert len(adapter.sent_messages) == 2 and len(lookups) == 2
+
+            await plugin._process_group_request_new(make_request("10001", flag="again"))
+            assert len(adapter.sent_messages) == 2 and len(lookups) == 2
+            assert plugin.store.by_flag("again").status == 'pending'
+            assert plugin.reapply_metrics['queued'] == 1
+
+            plugin.config = plugin.config.replace(reapply_action='reject')
+            await plugin._process_group_request_new(make_request("10001", flag="spam"))
+            assert adapter.decisions[-1]['flag'] == "spam" and not adapter.decisions[-1]['approve']
+            assert (int(SOURCE_GROUP), 10001) not in plugin.store
+            assert len(adapter.sent_messages) == 2
+
+            # 其他申请人不受影响
+            await plugin._process_group_request_new(make_request("10002"))
+            assert len(adapter.sent_messages) == 3
+
+            # 同一申请人申请多个不同的群不计为反复申请
+            plugin.config = plugin.config.replace(source_group_id="")
+            for group_id in range(100, 106):
+                await plugin._process_group_request_new(make_request("10003", group_id=str(group_id)))
+            assert len(plugin.store.by_user(10003)) == 6 and len(adapter.sent_messages) == 9
+            assert not any(d['flag'] == "flag_10003" for d in adapter.decisions)
+
+            # 静默保存的申请替换已指派的上一条申请时归还指派，超时后也不会改派提醒
+            assigned, assigned_adapter = make_plugin(
+                tmp_dir, reviewers=["a", "b"], reapply_limit=1, aggregate_window=0, assignment_strategy="least_outstanding",
+                auto_approve_timeout=600, assignment_timeout=60
+            )
+            assigned._init_assigner()
+            await assigned._process_group_request_new(make_request("10004"))
+            first = assigned.store.get((int(SOURCE_GROUP), 10004))
+            assert assigned.assigner.outstanding == {'a': 1, 'b': 0} and first.key in assigned._timer_tasks
+            await assigned._process_group_request_new(make_request("10004", flag="queued"))
+            assert assigned.store.get(first.key).held == 'reapply'
+            assert assigned.assigner.outstanding == {'a': 0, 'b': 0} and first.key not in assigned._timer_tasks
+            assert await assigned._reassign_timed_out(now=first.assigned_at + 61) == 0
+            assert len(assigned_adapter.sent_messages) == 1
+
+    asyncio.run(run())
+
+def test_raid_detector_uses_rate_baseline():
+    """窗口计数达到阈值且远超长期到达率时判定突增，回落后解除"""
+    detector = main.RaidDetector(window=60, threshold=5, ratio=3.0, baseline_period=3600)
+    # 每分钟一个申请的稳定流量不会触发
+    assert not any(detector.observe(1, t * 60.0) for t in range(100))
+    started = [detector.observe(1, 6000 + t) for t in range(5)]
+    assert started == [False, False, False, False, True] and 1 in detector.active
+    assert detector.calmed(6030) == []
+    assert detector.calmed(6200) == [1] and not detector.active
+
+def test_raid_lockdown_holds_applications_and_sends_digest():
+    """突增时锁定群：暂存申请、暂停自动通过、可拒绝新账号，回落后发送一条汇总"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(tmp_dir, aggregate_window=0, raid_reject_new_accounts=True)
+            plugin.raid_detector = main.RaidDetector(window=60, threshold=3)
+
+            async def get_stranger_info(user_id):
+                return {'nickname': f'昵称{user_id}', 'level': 5 if user_id == 10005 else 30}
+            adapter.get_stranger_info = get_stranger_info
+
+            for user_id in ("10001", "10002"):
+                await plugin._process_group_request_new(make_request(user_id))
+            assert len(adapter.sent_messages) == 2 and not plugin._lockdowns
+
+            for user_id in ("10003", "10004", "10005"):
+                await plugin._process_group_request_new(make_request(user_id))
+            group_id = int(SOURCE_GROUP)
+            assert group_id in plugin._lockdowns
+            assert len(adapter.sent_messages) == 3 and "锁定模式" in adapter.sent_messages[-1]['message']
+            assert adapter.decisions[-1]['flag'] == "flag_10005" and not adapter.decisions[-1]['approve']
+            assert pending_users(plugin) == {10001, 10002, 10003, 10004}
+
+            # 锁定期间触发的自动通过定时器不通过申请
+            await plugin._auto_approve_after_timeout(plugin.store.get((group_id, 10001)), delay=0)
+            assert (group_id, 10001) in plugin.store and len(adapter.decisions) == 1
+
+            assert await plugin._release_lockdowns(time.monotonic()) == []
+            assert await plugin._release_lockdowns(time.monotonic() + 120) == [group_id]
+            digest = adapter.sent_messages[-1]['message']
+            assert "解除锁定" in digest and "暂存 2 个" in digest and "自动拒绝 1 个" in digest
+            assert "10003" in digest and "10004" in digest and not plugin._lockdowns
+
+            # 暂存标记随状态持久化，重启后不为暂存的申请恢复自动通过定时器
+            restored, restored_adapter = make_plugin(tmp_dir, auto_approve_timeout=60)
+            restored.load_state()
+            assert restored.store.get((group_id, 10003)).held == 'raid'
+            restored._restore_auto_approve_timers()
+            assert set(restored._timer_tasks) == {(group_id, 10001), (group_id, 10002)}
+            for timer in restored._timer_tasks.values():
+                timer.cancel()
+
+            # 停机期间到达、启动对账补录的申请不计入突增检测和反复申请统计
+            other_dir = os.path.join(tmp_dir, "backfill")
+            os.makedirs(other_dir)
+            backfill, backfill_adapter = make_plugin(other_dir, aggregate_window=0, reapply_limit=1)
+            backfill.raid_detector = main.RaidDetector(window=60, threshold=3)
+            backfill_adapter.system_messages = {'join_requests': [
+                {'requester_uin': 20000 + i, 'group_id': group_id, 'flag': f'b{i}', 'checked': False} for i in range(6)
+            ]}
+            assert await backfill._reconcile_system_messages() == 6
+            assert not backfill._lockdowns and all(r.held is None for r in backfill.store)
+            assert len(backfill_adapter.sent_messages) == 6
+            assert backfill.reapply_counter.count((group_id, 20000), backfill.clock.monotonic()) == 0
+
+    asyncio.run(run())
+
+def test_config_snapshot_migrates_and_validates():
+    """配置快照迁移 _conf_schema.json 的键名、校验类型，且只读"""
+    schema = main.load_config_schema()
+    astrbot_config = {
+        'source_group': '111', 'target_group': 222, 'auto_approve_timeout': '600',
+        'approve_message_template': '通过 {user_id}',
+        'reject_message_template': schema['reject_message_template']['default'],
+        'command_permission_check': True,
+    }
+    file_config = {'target_group_id': '333', 'reviewers': [10001], 'intake_mode': 'webhook', 'poll_interval': 'soon'}
+    config = main.ConfigSnapshot.build(astrbot_config, file_config, schema=schema)
+    assert config.source_group_id == '111' and config.target_group_id == '333'
+    assert config.auto_approve_timeout == 600 and config.reviewers == ('10001',)
+    assert config.notification_template['approved'] == '通过 {user_id}'
+    # 未修改的 schema 默认模板不覆盖插件自带的模板
+    assert config.notification_template['rejected'] == main.DEFAULT_CONFIG['notification_template']['rejected']
+    assert config.intake_mode == 'push' and config.poll_interval == 30
+    assert sorted(config.warnings) == ["intake_mode='webhook'", "poll_interval='soon'"]
+    assert config.extra['command_permission_check'] is True
+
+    try:
+        config.target_group_id = '1'
+        assert False, "快照应当只读"
+    except AttributeError:
+        pass
+    updated = config.replace(target_group_id='444')
+    assert updated.target_group_id == '444' and config.target_group_id == '333'
+    saved = updated.to_dict()
+    assert saved['reviewers'] == ['10001'] and 'source_group' not in saved
+    assert main.ConfigSnapshot.build(json.loads(json.dumps(saved))).to_dict() == saved
+
+def test_config_file_keeps_only_command_set_keys():
+    """config.json 只保存指令修改的配置项，管理界面的修改在重载后生效"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(tmp_dir)
+            plugin.config_path = os.path.join(tmp_dir, "config.json")
+            plugin._astrbot_config = {'source_group': '111', 'auto_approve_timeout': 600}
+            plugin.load_config()
+            assert not os.path.exists(plugin.config_path)
+            assert plugin.config.source_group_id == '111' and plugin.config.auto_approve_timeout == 600
+
+            await plugin.set_source_group(make_event("/设置源群 222"), "222")
+            with open(plugin.config_path, encoding='utf-8') as f:
+                assert json.load(f) == {'source_group_id': '222'}
+
+            plugin._astrbot_config = {'source_group': '555', 'auto_approve_timeout': 900, 'card_cleanup': 'recall'}
+            await plugin.reload_config()
+            assert plugin.config.source_group_id == '222' and plugin.config.auto_approve_timeout == 900
+            assert plugin._card_cleanup_task is not None
+
+            plugin._astrbot_config = {'source_group': '555'}
+            await plugin.reload_config()
+            assert plugin._card_cleanup_task is None
+
+    asyncio.run(run())
+
+def test_review_api_shares_store_and_decision_path():
+    """HTTP 审核接口的分页、详情、批量决定和事件推送与聊天指令共用存储和决定路径"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(tmp_dir, source_group_id="", aggregate_window=0)
+            api = main.ReviewApi(plugin)
+            plugin.review_api = api
+            events = api.subscribe()
+            for user_id, group_id in (("10001", "100"), ("10002", "100"), ("10003", "200"), ("10003", "300")):
+                await plugin._process_group_request_new(make_request(user_id, group_id=group_id, flag=f"f{user_id}{group_id}"))
+            assert [events.get_nowait()[0] for _ in range(4)] == ['new'] * 4
+
+            page = api.pending_page(page=2, size=3, sort='群')
+            assert page['total'] == 4 and page['sort'] == 'group'
+            assert [(item['user_id'], item['group_id']) for item in page['items']] == [(10003, 300)]
+            assert api.request_detail("10001")[0] == 200
+            status, body = api.request_detail("10003")
+            assert status == 409 and len(body['candidates']) == 2
+            assert api.request_detail("10009")[0] == 404
+
+            result = await api.decide_many(False, ["10001", "10003:200", "10009"], operator="web")
+            assert [r['outcome'] for r in result['results']] == ['rejected', 'rejected', 'not_found']
+            assert [r.group_id for r in plugin.store.by_user(10003)] == [300]
+            assert pending_users(plugin) == {10002, 10003}
+            decided = [events.get_nowait() for _ in range(2)]
+            assert {(event_type, data['user_id'], data['status']) for event_type, data in decided} == {
+                ('decided', 10001, 'rejected'), ('decided', 10003, 'rejected')
+            }
+
+            # 跟不上的订阅者被断开并收到结束标记
+            slow = api.subscribe()
+            for _ in range(api.SUBSCRIBER_QUEUE_SIZE + 1):
+                api.publish('new', plugin.store.get((100, 10002)))
+            assert slow.get_nowait() is None and slow not in api._subscribers
+
+    asyncio.run(run())
+
+def test_review_api_rejects_cross_site_requests():
+    """审核接口要求令牌和 JSON 请求体，监听本机时校验 Host 和 Origin"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(tmp_dir, review_api_enabled=True)
+            plugin.config_path = os.path.join(tmp_dir, "config.json")
+            await plugin._start_review_api()
+            token = plugin.config.review_api_token
+            assert len(token) >= 32
+            with open(plugin.config_path, encoding='utf-8') as f:
+                assert json.load(f) == {'review_api_token': token}
+
+            api = main.ReviewApi(plugin, token)
+            headers = {'Host': '127.0.0.1:8765', 'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+            assert api.check_request('POST', headers) is None
+            assert api.check_request('GET', dict(headers, Host='[::1]:8765')) is None
+            assert api.check_request('POST', dict(headers, Origin='http://localhost:3000')) is None
+            assert api.check_request('POST', dict(headers, **{'Content-Type': 'text/plain'}))[0] == 415
+            assert api.check_request('POST', dict(headers, Host='evil.example:8765'))[0] == 403
+            assert api.check_request('POST', dict(headers, Origin='http://evil.example'))[0] == 403
+            assert api.check_request('POST', dict(headers, Origin='null'))[0] == 403
+            assert api.check_request('GET', dict(headers, Authorization='Bearer wrong'))[0] == 401
+            assert main.ReviewApi(plugin).check_request('GET', dict(headers, Authorization='Bearer '))[0] == 401
+            # 监听所有地址时无法校验主机名，只依靠令牌
+            assert main.ReviewApi(plugin, token, '0.0.0.0').check_request('GET', dict(headers, Host='10.0.0.2')) is None
+
+    asyncio.run(run())
+
+def test_export_and_import_stream_records():
+    """待处理申请和审核记录按块流式导出，导入到另一实例后内容一致"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(tmp_dir, source_group_id="", aggregate_window=0)
+            for user_id in range(10001, 10006):
+                await plugin._process_group_request_new(make_request(str(user_id), group_id="100"))
+            await plugin.handle_group_request_events(make_event("/拒绝 10001 广告, \"引号\""))
+            await plugin.handle_group_request_events(make_event("/通过 10002"))
+
+            records = list(plugin.iter_records())
+            assert [r['kind'] for r in records] == ['pending'] * 3 + ['decision'] * 2
+            assert records[3]['status'] == 'rejected' and records[3]['reason'] == '广告, "引号"'
+
+            for fmt in main.EXPORT_FORMATS:
+                chunks = list(main.iter_export_chunks(iter(records), fmt, chunk_size=2))
+                assert len(chunks) == 3
+                lines = io.StringIO(''.join(chunks))
+                assert list(main.iter_import_records(lines, fmt)) == records
+
+            text = get_result_text(await plugin.handle_group_request_events(make_event("/导出 全部 jsonl")))
+            assert "已导出 5 条" in text
+            name = os.listdir(plugin.exports_dir)[0]
+
+            other_dir = os.path.join(tmp_dir, "other")
+            os.makedirs(os.path.join(other_dir, "exports"))
+            shutil.copy(os.path.join(plugin.exports_dir, name), os.path.join(other_dir, "exports", name))
+            other, _ = make_plugin(other_dir)
+            other.store.add(main.JoinRequest(10003, 100, comment="已存在"))
+            text = get_result_text(await other.handle_group_request_events(make_event(f"/导入 {name}")))
+            assert "待处理申请 2 条" in text and "审核记录 2 条" in text and "跳过 1 条" in text
+            assert pending_users(other) == {10003, 10004, 10005}
+            assert other.store.get((100, 10003)).comment == "已存在"
+            assert [r['user_id'] for r in other.iter_records('decision')] == [10001, 10002]
+            # 导入的申请暂存待人工审核，重启后不会恢复自动通过定时器
+            assert other.store.get((100, 10004)).held == 'import'
+            restarted, restarted_adapter = make_plugin(other_dir, auto_approve_timeout=1)
+            restarted.load_state()
+            assert restarted.store.get((100, 10004)).held == 'import'
+            restarted._restore_auto_approve_timers()
+            assert set(restarted._timer_tasks) == {(100, 10003)}
+            for task in restarted._timer_tasks.values():
+                task.cancel()
+
+            text = get_result_text(await other.handle_group_request_events(make_event("/导入 ../pending_requests.json")))
+            assert "找不到" in text
+
+    asyncio.run(run())
+
+def test_offline_tool_exports_state_file():
+    """离线工具不依赖 AstrBot 即可导出状态文件"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        plugin, _ = make_plugin(tmp_dir)
+        plugin.store.add(main.JoinRequest(10001, 100, nickname="昵称", comment="申请"))
+        plugin.save_state()
+        tool = os.path.join(os.path.dirname(os.path.abspath(__file__)), "entry_review_tool.py")
+        output = subprocess.run(
+            [sys.executable, tool, "export", "--state", plugin.state_path, "--format", "jsonl"],
+            capture_output=True, text=True, check=True
+        ).stdout
+        assert json.loads(output)['user_id'] == 10001 and json.loads(output)['nickname'] == "昵称"
+
+def test_recorded_session_replays_in_virtual_time():
+    """录制申请事件和审核指令后在虚拟时钟上回放，长超时的自动通过无需真实等待"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        async def record():
+            plugin, adapter = make_plugin(
+                tmp_dir, source_group_id="", aggregate_window=0, auto_approve_timeout=600, record_path="session.jsonl"
+            )
+            plugin.load_config = lambda: None
+            await plugin.initialize()
+            for user_id in ("10001", "10002", "10003"):
+                await plugin._handle_request_event(make_request(user_id, group_id="100"))
+                await asyncio.sleep(0.05)
+            card = adapter.sent_messages[1]['message_id']
+            await plugin.handle_group_request_events(make_event("拒绝 广告", reply_to=card))
+            await plugin.handle_group_request_events(make_event("/通过 10001"))
+            await plugin.handle_group_request_events(make_event("闲聊"))
+            await plugin._drain(1)
+            return os.path.join(tmp_dir, "session.jsonl")
+
+        path = asyncio.run(record())
+        # 启动对账的轮询结果也被录制
+        kinds = [kind for _, kind, _ in main.iter_recording(path)]
+        assert kinds.count('poll') == 1
+        assert [kind for kind in kinds if kind != 'poll'] == ['meta', 'request', 'request', 'request', 'command', 'command']
+
+        import entry_review_replay
+        stats = entry_review_replay.replay(path)
+        assert stats['virtual_seconds'] == 600 + 5
+        assert stats['cards'] == 3 + 1 and stats['command_skipped'] == 0
+        # 10003 在回放中超时自动通过
+        assert (stats['approved'], stats['rejected'], stats['pending']) == (2, 1, 0)
+        # 按倍速等待真实时间只影响回放节奏，不影响结果
+        assert entry_review_replay.replay(path, tail=5, speed=1000) == entry_review_replay.replay(path, tail=5)
+
+def test_poll_mode_replay_exceeds_outbound_burst():
+    """轮询一次补录的申请多于出站突发额度时，回放仍在虚拟时间中完成"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "poll.jsonl")
+        config = {
+            'source_group_id': '', 'target_group_id': REVIEW_GROUP, 'intake_mode': 'poll', 'poll_interval': 30,
+            'aggregate_window': 0, 'auto_approve_timeout': 0, 'outbound_burst': 10, 'debug_mode': False,
+        }
+        poll = {'join_requests': [
+            {'requester_uin': 20000 + i, 'group_id': 100, 'flag': f'p{i}', 'message': '', 'checked': False}
+            for i in range(15)
+        ]}
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps([0, 'meta', config]) + '\n')
+            f.write(json.dumps([1, 'poll', poll]) + '\n')
+
+        import entry_review_replay
+        stats = entry_review_replay.replay(path, tail=65)
+        assert stats['virtual_seconds'] == 66
+        assert stats['cards'] == 15 and stats['pending'] == 15
+
+def test_virtual_clock_fires_hour_long_deadlines_in_order():
+    """使用虚拟时钟时一小时的自动通过超时无需真实等待，并严格按到期时间先后触发"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(tmp_dir, source_group_id="", auto_approve_timeout=3600, aggregate_window=0)
+            clock = plugin.clock = main.VirtualClock()
+            plugin.save_state = lambda: None
+            user_ids = [30000 + i for i in range(1000)]
+            for user_id in user_ids:
+                await plugin._process_group_request_new(make_request(str(user_id), group_id="100"))
+                await clock.advance(5)
+            assert plugin.store.get((100, user_ids[-1])).timestamp == int(clock.time()) - 5
+            # 前 5000 秒内到达、已满一小时的 281 个申请已自动通过
+            assert [d['flag'] for d in adapter.decisions] == [f'flag_{u}' for u in user_ids[:281]]
+            assert len(plugin.store) == 719
+
+            assert await clock.advance(3599) > 0
+            assert [d['flag'] for d in adapter.decisions] == [f'flag_{u}' for u in user_ids]
+            assert len(plugin.store) == 0 and not plugin._timer_tasks
+            assert clock.monotonic() == 1000 * 5 + 3599
+
+            # 取消的定时器不会被唤醒
+            await plugin._process_group_request_new(make_request("40000", group_id="100"))
+            await plugin.handle_group_request_events(make_event("/拒绝 40000"))
+            assert await clock.advance(3600) == 0
+
+    asyncio.run(run())
+
+def test_virtual_clock_settle_waits_for_tracked_tasks():
+    """settle() 等登记的任务挂起在虚拟时钟上或结束，包括在线程中执行的工作和等待其他任务的任务"""
+    async def run():
+        clock = main.VirtualClock()
+        seen = []
+
+        async def worker():
+            await asyncio.to_thread(time.sleep, 0.05)
+            seen.append(clock.monotonic())
+            await clock.sleep(10)
+            await asyncio.to_thread(time.sleep, 0.05)
+            seen.append(clock.monotonic())
+
+        async def waiter(task):
+            await clock.shield(task)
+            seen.append('joined')
+
+        task = clock.watch(asyncio.create_task(worker()))
+        joined = clock.watch(asyncio.create_task(waiter(task)))
+        await clock.settle()
+        assert seen == [0]
+        assert await clock.advance(10) == 1
+        assert seen == [0, 10, 'joined'] and task.done() and joined.done()
+
+    asyncio.run(run())
+
+def test_group_message_prefilter_follows_config():
+    """群消息预过滤按当前配置的审核群号放行，群号为 int 或 str 均可"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plugin, adapter = make_plugin(tmp_dir)
+            await plugin._process_group_request_new(make_request("10001"))
+            await plugin._process_group_request_new(make_request("10002"))
+            assert await plugin.handle_group_request_events(make_event("/通过 10001", group_id="555")) is None
+            result = await plugin.handle_group_request_events(make_event("/通过 10001", group_id=int(REVIEW_GROUP)))
+            assert "已通过 10001" in get_result_text(result)
+
+            plugin.config = plugin.config.replace(target_group_id="555")
+            assert await plugin.handle_group_request_events(make_event("/通过 10002")) is None
+            result = await plugin.handle_group_request_events(make_event(" /通过 10002", group_id=555))
+            assert "已通过 10002" in get_result_text(result)
+
+            plugin.config = plugin.config.replace(target_group_id="")
+            assert await plugin.handle_group_request_events(make_event("/列表", group_id="")) is None
+            assert len(adapter.decisions) == 2
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_") and callable(value)]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    print(f"\n总体结果: {len(tests) - failed}/{len(tests)} 项测试通过")
+    sys.exit(1 if failed else 0)